@@ -1,12 +1,10 @@
 import json
-import boto3
 import os
 import time
 from botocore.exceptions import ClientError
+from aws_clients import get_client, get_resource
 
-cognito = boto3.client('cognito-idp')
-dynamodb = boto3.resource('dynamodb')
-user_table = dynamodb.Table(os.environ['USER_TABLE_NAME'])
+USER_TABLE_NAME = os.environ.get('USER_TABLE_NAME')
 
 def lambda_handler(event, context):
     try:
@@ -75,7 +73,7 @@ def handle_register(body):
         client_id = body['clientId']
         
         # Create user in Cognito
-        response = cognito.sign_up(
+        response = get_client('cognito-idp').sign_up(
             ClientId=client_id,
             Username=email,
             Password=password,
@@ -88,7 +86,7 @@ def handle_register(body):
         )
         
         # Create user entry in DynamoDB
-        user_table.put_item(
+        get_resource('dynamodb').Table(USER_TABLE_NAME).put_item(
             Item={
                 'user_id': email,
                 'email': email,
@@ -120,7 +118,7 @@ def handle_login(body):
         client_id = body['clientId']
         
         # Authenticate user
-        response = cognito.initiate_auth(
+        response = get_client('cognito-idp').initiate_auth(
             ClientId=client_id,
             AuthFlow='USER_PASSWORD_AUTH',
             AuthParameters={
@@ -158,7 +156,7 @@ def handle_verify(body):
         client_id = body['clientId']
         
         # Verify email
-        cognito.confirm_sign_up(
+        get_client('cognito-idp').confirm_sign_up(
             ClientId=client_id,
             Username=email,
             ConfirmationCode=code
@@ -187,7 +185,7 @@ def handle_resend_code(body):
         email = body['email']
         client_id = body['clientId']
         
-        cognito.resend_confirmation_code(
+        get_client('cognito-idp').resend_confirmation_code(
             ClientId=client_id,
             Username=email
         )
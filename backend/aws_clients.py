@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from logger import logger
+
+# Lazily built, per-container boto3 clients. Nothing here imports boto3 until
+# the first client is requested, so OPTIONS and other cheap paths don't pay
+# for botocore on a cold start. Clients are thread-safe and reused across
+# warm invocations.
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '16'))
+
+# Per-service overrides on top of the defaults above
+SERVICE_CONFIG = {
+    # bedrock_gateway does its own throttling-aware retries
+    'bedrock-runtime': {'read_timeout': 60, 'retries': {'mode': 'standard', 'max_attempts': 1}},
+    'transcribe': {'read_timeout': 30},
+    's3': {'signature_version': 's3v4'} # Presigned upload URLs need SigV4
+}
+
+_clients = {}
+_resources = {}
+_lock = threading.Lock()
+
+def build_config(service_name):
+    """Tuned botocore Config for a service"""
+    from botocore.config import Config
+
+    settings = {
+        'connect_timeout': AWS_CONNECT_TIMEOUT,
+        'read_timeout': AWS_READ_TIMEOUT,
+        'max_pool_connections': AWS_MAX_POOL_CONNECTIONS,
+        'tcp_keepalive': True,
+        'retries': {'mode': 'standard', 'max_attempts': 3}
+    }
+    settings.update(SERVICE_CONFIG.get(service_name, {}))
+    return Config(region_name=AWS_REGION, **settings)
+
+def get_client(service_name):
+    """Return the shared boto3 client for a service, creating it on first use"""
+    client = _clients.get(service_name)
+    if client is None:
+        with _lock:
+            client = _clients.get(service_name)
+            if client is None:
+                import boto3
+
+                start = time.time()
+                client = boto3.client(service_name, config=build_config(service_name))
+                _clients[service_name] = client
+                logger.info(f"Created {service_name} client in {(time.time() - start) * 1000:.0f}ms")
+    return client
+
+def get_resource(service_name):
+    """Return the shared boto3 resource for a service, creating it on first use"""
+    resource = _resources.get(service_name)
+    if resource is None:
+        with _lock:
+            resource = _resources.get(service_name)
+            if resource is None:
+                import boto3
+
+                start = time.time()
+                resource = boto3.resource(service_name, config=build_config(service_name))
+                _resources[service_name] = resource
+                logger.info(f"Created {service_name} resource in {(time.time() - start) * 1000:.0f}ms")
+    return resource
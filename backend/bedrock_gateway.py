@@ -0,0 +1,290 @@
+import json
+import os
+import random
+import threading
+import time
+from logger import logger
+
+# All Bedrock calls from a container go through one gateway that
+# - paces requests with token buckets for requests/minute and tokens/minute,
+#   halving the token rate on every throttle and growing it back on success,
+# - retries throttling and transient errors with full-jitter backoff but fails
+#   fast on validation/permission errors,
+# - opens a circuit breaker after repeated failures so callers fall back
+#   immediately instead of queueing behind a struggling endpoint,
+# - counts queue wait, retries, throttles and fallbacks.
+# The limiter is per container, not shared: each Lambda container has its own
+# buckets, so the account's Bedrock quota is only respected if the limits are
+# set to roughly quota / concurrent containers. Beyond that, Bedrock's own
+# throttling slows every container down through the adaptive rate.
+# Unless set explicitly, the limits follow BEDROCK_CONCURRENCY, the number of
+# calls a container keeps in flight (the summarize map fan-out uses it too):
+# one call per second per slot, each of up to BEDROCK_TOKENS_PER_CALL tokens.
+BEDROCK_CONCURRENCY = int(os.environ.get('BEDROCK_CONCURRENCY', 16))
+BEDROCK_TOKENS_PER_CALL = 2500 # A full summarize map call, prompt and completion
+BEDROCK_REQUESTS_PER_MINUTE = float(os.environ.get('BEDROCK_REQUESTS_PER_MINUTE', BEDROCK_CONCURRENCY * 60))
+BEDROCK_TOKENS_PER_MINUTE = float(os.environ.get('BEDROCK_TOKENS_PER_MINUTE', BEDROCK_CONCURRENCY * 60 * BEDROCK_TOKENS_PER_CALL))
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', 4))
+BEDROCK_QUEUE_TIMEOUT = float(os.environ.get('BEDROCK_QUEUE_TIMEOUT', 10))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+MIN_RATE_FRACTION = 0.1 # Adaptive throttling never goes below this share of the configured rate
+
+THROTTLING_ERRORS = {'ThrottlingException', 'TooManyRequestsException', 'ServiceQuotaExceededException'}
+TRANSIENT_ERRORS = {'ModelNotReadyException', 'ServiceUnavailableException', 'InternalServerException', 'ModelTimeoutException'}
+CONNECTION_ERRORS = {'EndpointConnectionError', 'ConnectTimeoutError', 'ReadTimeoutError', 'ConnectionClosedError'}
+
+class BedrockUnavailable(Exception):
+    """The circuit is open or no capacity became free in time"""
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute, with AIMD rate adaptation"""
+
+    def __init__(self, rate_per_minute, clock=time.monotonic):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.capacity = rate_per_minute / 60.0 * 10 # Up to 10 seconds of burst
+        self.available = self.capacity
+        self.clock = clock
+        self.updated = clock()
+        self.condition = threading.Condition()
+
+    def _refill(self):
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount, timeout):
+        """Take amount tokens, waiting up to timeout seconds. Returns the time waited"""
+        # A single request larger than the whole bucket still has to be let through eventually
+        amount = min(amount, self.capacity)
+        started = self.clock()
+        with self.condition:
+            while True:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return self.clock() - started
+                wait = (amount - self.available) / self.rate
+                if self.clock() - started + wait > timeout:
+                    raise BedrockUnavailable(f"No Bedrock capacity within {timeout}s")
+                self.condition.wait(wait)
+
+    def admits(self, amount, within=0):
+        """How many acquisitions of amount tokens fit in the next within seconds"""
+        amount = max(1e-9, min(amount, self.capacity))
+        with self.condition:
+            self._refill()
+            return int((self.available + self.rate * within) // amount)
+
+    def slow_down(self):
+        with self.condition:
+            self._refill()
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+
+    def speed_up(self):
+        with self.condition:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+class CircuitBreaker:
+    """Opens after threshold consecutive failures, lets one trial call through after reset_seconds"""
+
+    def __init__(self, threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at >= self.reset_seconds and not self.trial_in_flight:
+                self.trial_in_flight = True # Half-open
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Bedrock circuit opened after {self.failures} failures")
+                self.opened_at = self.clock()
+
+    def cancel_trial(self):
+        """The half-open trial never reached Bedrock, let the next call try"""
+        with self.lock:
+            self.trial_in_flight = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            return 'half-open' if self.clock() - self.opened_at >= self.reset_seconds else 'open'
+
+class GatewayMetrics:
+    """Per-container counters for Bedrock traffic"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'retries': 0, 'throttles': 0, 'failures': 0, 'rejected': 0, 'fallbacks': 0}
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_queue_wait(self, seconds):
+        with self.lock:
+            self.queue_wait_total += seconds
+            self.queue_wait_max = max(self.queue_wait_max, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            requests = self.counters['requests']
+            return dict(
+                self.counters,
+                queue_wait_avg_ms=round(self.queue_wait_total / requests * 1000, 1) if requests else 0.0,
+                queue_wait_max_ms=round(self.queue_wait_max * 1000, 1)
+            )
+
+def error_code(error):
+    """Bedrock error code of a botocore ClientError, or the exception class name"""
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code') or type(error).__name__
+    return type(error).__name__
+
+def is_retryable(code):
+    return code in THROTTLING_ERRORS or code in TRANSIENT_ERRORS or code in CONNECTION_ERRORS
+
+class BedrockGateway:
+    """Rate-limited, retrying, circuit-broken access to bedrock-runtime"""
+
+    def __init__(self, client=None, requests_per_minute=BEDROCK_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=BEDROCK_TOKENS_PER_MINUTE, max_attempts=BEDROCK_MAX_ATTEMPTS,
+                 queue_timeout=BEDROCK_QUEUE_TIMEOUT, sleep=time.sleep):
+        self._client = client
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.breaker = CircuitBreaker()
+        self.metrics = GatewayMetrics()
+        self.max_attempts = max_attempts
+        self.queue_timeout = queue_timeout
+        self.sleep = sleep
+
+    @property
+    def client(self):
+        if self._client is None:
+            from aws_clients import get_client
+
+            self._client = get_client('bedrock-runtime')
+        return self._client
+
+    def capacity(self, estimated_tokens, within=0):
+        """How many calls of estimated_tokens the buckets can admit in the next within seconds"""
+        if self.breaker.state == 'open':
+            return 0
+        return min(self.request_bucket.admits(1, within), self.token_bucket.admits(estimated_tokens, within))
+
+    def _call(self, operation, estimated_tokens, deadline=None):
+        # With a deadline (time.time()) the call gives up instead of taking capacity
+        # or retrying past it, so abandoned work doesn't hold the buckets
+        queue_timeout = self.queue_timeout if deadline is None else min(self.queue_timeout, deadline - time.time())
+        if queue_timeout <= 0:
+            self.metrics.increment('rejected')
+            raise BedrockUnavailable("Deadline passed before the Bedrock call")
+        if not self.breaker.allow():
+            self.metrics.increment('rejected')
+            raise BedrockUnavailable("Bedrock circuit is open")
+
+        try:
+            waited = self.request_bucket.acquire(1, queue_timeout)
+            waited += self.token_bucket.acquire(estimated_tokens, queue_timeout - waited)
+        except BedrockUnavailable:
+            self.metrics.increment('rejected')
+            self.breaker.cancel_trial()
+            raise
+        self.metrics.increment('requests')
+        self.metrics.record_queue_wait(waited)
+
+        for attempt in range(self.max_attempts):
+            try:
+                result = operation()
+                self.breaker.record_success()
+                self.token_bucket.speed_up()
+                return result
+            except Exception as e:
+                code = error_code(e)
+                if not is_retryable(code):
+                    # Bad request or permissions: retrying won't help, but Bedrock did answer
+                    self.breaker.record_success()
+                    raise
+                if code in THROTTLING_ERRORS:
+                    self.metrics.increment('throttles')
+                    self.token_bucket.slow_down()
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+                if attempt == self.max_attempts - 1 or (deadline is not None and time.time() + delay >= deadline):
+                    self.metrics.increment('failures')
+                    self.breaker.record_failure()
+                    raise
+                self.metrics.increment('retries')
+                logger.warning(f"Bedrock {code}, retrying in {delay:.2f}s (attempt {attempt + 1}/{self.max_attempts})")
+                self.sleep(delay)
+
+    def invoke(self, model_id, body, estimated_tokens, deadline=None):
+        """invoke_model, returning the decoded JSON response body"""
+        def operation():
+            response = self.client.invoke_model(modelId=model_id, body=body)
+            return json.loads(response.get('body').read())
+        return self._call(operation, estimated_tokens, deadline)
+
+    def invoke_stream(self, model_id, body, estimated_tokens):
+        """invoke_model_with_response_stream; only opening the stream is retried"""
+        return self._call(lambda: self.client.invoke_model_with_response_stream(modelId=model_id, body=body), estimated_tokens)
+
+    def record_fallback(self, reason):
+        """Count a request that was answered without Bedrock"""
+        self.metrics.increment('fallbacks')
+        logger.warning(f"Bedrock fallback used: {reason}")
+
+    def log_metrics(self):
+        logger.info(f"Bedrock gateway metrics: {json.dumps(dict(self.metrics.snapshot(), circuit=self.breaker.state))}")
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_bedrock_gateway():
+    """The container's gateway, so its rate limits and breaker see all of the container's traffic"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = BedrockGateway()
+    return _gateway
+
+def log_bedrock_metrics():
+    """Log the gateway's counters if this container has used Bedrock"""
+    if _gateway is not None:
+        _gateway.log_metrics()
+
+def set_bedrock_gateway(gateway):
+    """Swap the gateway, e.g. for one wrapping a stubbed client"""
+    global _gateway
+    _gateway = gateway
@@ -0,0 +1,60 @@
+import argparse
+import random
+import re
+import time
+import tracemalloc
+from clean_text import clean_text, iter_clean_text
+
+# Microbenchmark for clean_text: the original two-regex version against the
+# single-pass normaliser and its streaming form, on synthetic page bodies.
+SIZES = [1024, 16 * 1024, 256 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+WORDS = ['the', 'summary', 'of', 'a', 'page', 'Kendra', 'indexes', 'chunks', 'quickly.']
+SEPARATORS = [' '] * 12 + ['  ', '\t', '\n', ' \n ', '\n\n', '\n   \n\t']
+
+def legacy_clean_text(text):
+    """clean_text before the single-pass rewrite"""
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def make_text(size, seed=0):
+    """Page-like text of roughly size characters"""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        part = rng.choice(WORDS) + rng.choice(SEPARATORS)
+        parts.append(part)
+        length += len(part)
+    return ''.join(parts)[:size]
+
+def measure(func, text, repeat):
+    """Return (best seconds per call, peak traced bytes)"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark clean_text implementations")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    variants = [
+        ('legacy', legacy_clean_text),
+        ('single-pass', clean_text),
+        ('paragraphs', lambda text: clean_text(text, preserve_paragraphs=True)),
+        ('streaming', lambda text: sum(len(piece) for piece in iter_clean_text(text, preserve_paragraphs=True)))
+    ]
+    print(f"{'size':>10}  {'variant':<12} {'MB/s':>8} {'peak KB':>10}")
+    for size in SIZES:
+        text = make_text(size)
+        for name, func in variants:
+            seconds, peak = measure(func, text, args.repeat)
+            print(f"{size:>10}  {name:<12} {size / seconds / 1e6:8.1f} {peak / 1024:10.0f}")
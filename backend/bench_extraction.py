@@ -0,0 +1,94 @@
+import argparse
+import glob
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+# Corpus benchmark for html_extraction engines. Each engine runs in its own
+# interpreter so peak RSS (which includes libxml2's C allocations) isn't
+# shared between engines. Point --corpus at a directory of saved .html pages;
+# without one a synthetic corpus is generated.
+SYNTHETIC_PAGES = 200
+
+def synthetic_page(index):
+    """A news-like page with boilerplate around the article"""
+    paragraphs = ''.join(
+        f"<p>Paragraph {i} of story {index}, with some clauses, names and numbers like {i * 17}, "
+        f"describing events in enough detail to look like real article text.</p>"
+        for i in range(40)
+    )
+    links = ''.join(f"<li><a href='/{i}'>Link {i}</a></li>" for i in range(60))
+    return (
+        f"<html><head><title>Story {index}</title><script>{'var x = 1;' * 200}</script>"
+        f"<style>{'.a {{color: red}}' * 100}</style></head><body>"
+        f"<header><nav><ul>{links}</ul></nav></header>"
+        f"<div class='sidebar'><ul>{links}</ul></div>"
+        f"<div id='content'><h1>Story {index}</h1>{paragraphs}</div>"
+        f"<div class='comments'>{'<p>Nice article, thanks!</p>' * 30}</div>"
+        f"<footer>{links}</footer></body></html>"
+    )
+
+def load_corpus(corpus_dir):
+    """Saved pages from corpus_dir, or the synthetic corpus"""
+    if not corpus_dir:
+        return [synthetic_page(i) for i in range(SYNTHETIC_PAGES)]
+    pages = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '**', '*.htm*'), recursive=True)):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            pages.append(f.read())
+    return pages
+
+def run_engine(engine, corpus_dir, repeat):
+    """Extract every page with one engine and return stats (runs in a child process)"""
+    from html_extraction import ENGINES, get_engine_name
+
+    name = get_engine_name(engine)
+    extract = ENGINES[name]
+    pages = load_corpus(corpus_dir)
+    extract(pages[0]) # Warm up imports
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    chars = 0
+    for _ in range(repeat):
+        for page in pages:
+            chars += len(extract(page))
+    elapsed = time.perf_counter() - start
+
+    return {
+        'engine': name,
+        'pages': len(pages) * repeat,
+        'pages_per_sec': len(pages) * repeat / elapsed,
+        'mb_per_sec': sum(len(page) for page in pages) * repeat / elapsed / 1e6,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'extra_rss_mb': (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) / 1024,
+        'avg_output_chars': chars / (len(pages) * repeat)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark HTML main-content extraction engines")
+    parser.add_argument('--corpus', help="Directory of saved .html pages")
+    parser.add_argument('--engines', nargs='+', default=['soup', 'lxml'])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_engine(args.child, args.corpus, args.repeat)))
+        sys.exit(0)
+
+    print(f"{'engine':<8} {'pages':>6} {'pages/s':>9} {'MB/s':>7} {'peak MB':>8} {'extra MB':>9} {'avg chars':>10}")
+    for engine in args.engines:
+        command = [sys.executable, __file__, '--child', engine, '--repeat', str(args.repeat)]
+        if args.corpus:
+            command += ['--corpus', args.corpus]
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"{engine:<8} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{stats['engine']:<8} {stats['pages']:>6} {stats['pages_per_sec']:>9.1f} {stats['mb_per_sec']:>7.2f} "
+              f"{stats['peak_rss_mb']:>8.1f} {stats['extra_rss_mb']:>9.1f} {stats['avg_output_chars']:>10.0f}")
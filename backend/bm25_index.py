@@ -0,0 +1,167 @@
+import base64
+import hashlib
+import json
+import math
+import re
+import sys
+import zlib
+from array import array
+from collections import Counter
+from logger import logger
+from lru_cache import LRUCache
+from chunker import iter_chunks
+from s3_helper import read_document_artifact, write_document_artifact
+
+# Per-document BM25 index over fixed-size chunks, built when a document is
+# stored and kept next to it as shared/websites/{hash}.bm25. Postings are
+# flat arrays (chunk ids and term frequencies, sliced per term) so the index
+# stays compact and loads without rebuilding Python dicts per posting.
+BM25_SUFFIX = '.bm25'
+BM25_CHUNK_CHARS = 1000
+BM25_K1 = 1.2
+BM25_B = 0.75
+BM25_VERSION = 1
+CHARS_PER_TOKEN = 4
+TOKEN_PATTERN = re.compile(r'\w+')
+STOPWORDS = frozenset(
+    'a an and are as at be by for from has have how in is it its of on or that the this to was were what when '
+    'where which who why will with'.split()
+)
+ARRAYS = ('chunk_offsets', 'chunk_lengths', 'term_starts', 'postings_chunks', 'postings_tfs')
+
+_indexes = LRUCache(max_size=64)
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+def fingerprint(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+class BM25Index:
+    """BM25 over a document's chunks. Chunk i is text[chunk_offsets[2i]:chunk_offsets[2i + 1]]"""
+
+    def __init__(self, terms, term_starts, postings_chunks, postings_tfs, chunk_offsets, chunk_lengths, text_fingerprint, text=None):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.term_starts = term_starts
+        self.postings_chunks = postings_chunks
+        self.postings_tfs = postings_tfs
+        self.chunk_offsets = chunk_offsets
+        self.chunk_lengths = chunk_lengths
+        self.fingerprint = text_fingerprint
+        self.text = text
+        self.average_length = (sum(chunk_lengths) / len(chunk_lengths)) if chunk_lengths else 0
+
+    @classmethod
+    def build(cls, text, chunk_chars=BM25_CHUNK_CHARS):
+        postings = {}
+        chunk_offsets = array('I')
+        chunk_lengths = array('I')
+        for chunk_id, chunk in enumerate(iter_chunks(text, chunk_chars)):
+            tokens = tokenize(chunk.text)
+            chunk_offsets.extend((chunk.start, chunk.end))
+            chunk_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings.setdefault(term, []).append((chunk_id, tf))
+
+        terms = sorted(postings)
+        term_starts = array('I', [0])
+        postings_chunks = array('I')
+        postings_tfs = array('I')
+        for term in terms:
+            for chunk_id, tf in postings[term]:
+                postings_chunks.append(chunk_id)
+                postings_tfs.append(tf)
+            term_starts.append(len(postings_chunks))
+        return cls(terms, term_starts, postings_chunks, postings_tfs, chunk_offsets, chunk_lengths, fingerprint(text), text)
+
+    def score(self, query):
+        """Return {chunk_id: BM25 score} for chunks matching any query term"""
+        chunk_count = len(self.chunk_lengths)
+        scores = {}
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_starts[term_id], self.term_starts[term_id + 1]
+            document_frequency = end - start
+            idf = math.log(1 + (chunk_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for i in range(start, end):
+                chunk_id = self.postings_chunks[i]
+                tf = self.postings_tfs[i]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.chunk_lengths[chunk_id] / (self.average_length or 1))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def select_passages(self, query, budget_tokens, chars_per_token=CHARS_PER_TOKEN):
+        """Best-scoring chunks that fit in budget_tokens, returned in document order"""
+        budget_chars = budget_tokens * chars_per_token
+        selected = []
+        used = 0
+        for chunk_id, _ in sorted(self.score(query).items(), key=lambda item: item[1], reverse=True):
+            start, end = self.chunk_offsets[2 * chunk_id], self.chunk_offsets[2 * chunk_id + 1]
+            if used + (end - start) > budget_chars:
+                continue
+            selected.append((start, end))
+            used += end - start
+        return [self.text[start:end] for start, end in sorted(selected)]
+
+    def to_bytes(self):
+        payload = {
+            'version': BM25_VERSION,
+            'byteorder': sys.byteorder,
+            'fingerprint': self.fingerprint,
+            'terms': self.terms
+        }
+        for name in ARRAYS:
+            payload[name] = base64.b64encode(getattr(self, name).tobytes()).decode('ascii')
+        return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, body, text=None):
+        payload = json.loads(zlib.decompress(body))
+        if payload.get('version') != BM25_VERSION:
+            return None
+        arrays = {}
+        for name in ARRAYS:
+            values = array('I')
+            values.frombytes(base64.b64decode(payload[name]))
+            if payload['byteorder'] != sys.byteorder:
+                values.byteswap()
+            arrays[name] = values
+        return cls(payload['terms'], arrays['term_starts'], arrays['postings_chunks'], arrays['postings_tfs'],
+                   arrays['chunk_offsets'], arrays['chunk_lengths'], payload['fingerprint'], text)
+
+def store_bm25_index(doc_id, text):
+    """Build the index for freshly stored content and save it next to the document"""
+    index = BM25Index.build(text)
+    _indexes.put((doc_id, index.fingerprint), index)
+    write_document_artifact(doc_id, BM25_SUFFIX, index.to_bytes())
+    return index
+
+def get_bm25_index(doc_id, text, persist=True):
+    """Per-container cached index, loaded from storage or built on a miss"""
+    text_fingerprint = fingerprint(text)
+    index = _indexes.get((doc_id, text_fingerprint))
+    if index is not None:
+        return index
+
+    if persist:
+        body = read_document_artifact(doc_id, BM25_SUFFIX)
+        index = BM25Index.from_bytes(body, text) if body else None
+        if index is not None and index.fingerprint == text_fingerprint:
+            _indexes.put((doc_id, text_fingerprint), index)
+            return index
+        return store_bm25_index(doc_id, text)
+
+    index = BM25Index.build(text)
+    _indexes.put((doc_id, text_fingerprint), index)
+    return index
+
+def select_passages(doc_id, text, query, budget_tokens, persist=True):
+    """Passages of text most relevant to query within budget_tokens, or None on error"""
+    try:
+        return get_bm25_index(doc_id, text, persist).select_passages(query, budget_tokens)
+    except Exception as e:
+        logger.error(f"BM25 passage selection error for {doc_id}: {str(e)}", exc_info=True)
+        return None
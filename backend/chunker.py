@@ -0,0 +1,88 @@
+import re
+from collections import deque, namedtuple
+
+# Linear-time text chunking. Text is cut at paragraph breaks, then sentence
+# ends, then (for a single oversized sentence) whitespace or a hard split, so
+# every chunk strictly fits the budget. Chunks are slices of the original
+# text and carry their offsets: text[chunk.start:chunk.end] == chunk.text.
+CHARS_PER_TOKEN = 4
+DEFAULT_CHUNK_CHARS = 5000
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+
+Chunk = namedtuple('Chunk', ['text', 'start', 'end'])
+
+def iter_spans(text, pattern, start, end):
+    """Yield (start, end) of the non-empty, whitespace-trimmed pieces between pattern matches"""
+    position = start
+    for match in pattern.finditer(text, start, end):
+        yield from trimmed_span(text, position, match.start())
+        position = match.end()
+    yield from trimmed_span(text, position, end)
+
+def trimmed_span(text, start, end):
+    """Yield (start, end) without surrounding whitespace, or nothing if it's blank"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    if start < end:
+        yield start, end
+
+def hard_split(text, start, end, max_chars):
+    """Split an oversized span at the last space in each window, or exactly at max_chars"""
+    while end - start > max_chars:
+        cut = text.rfind(' ', start + max_chars // 2, start + max_chars + 1)
+        if cut == -1:
+            cut = start + max_chars
+        yield from trimmed_span(text, start, cut)
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+    yield from trimmed_span(text, start, end)
+
+def iter_segments(text, max_chars):
+    """Yield (start, end) segments no longer than max_chars: paragraphs, else sentences, else hard splits"""
+    for paragraph_start, paragraph_end in iter_spans(text, PARAGRAPH_BREAK, 0, len(text)):
+        if paragraph_end - paragraph_start <= max_chars:
+            yield paragraph_start, paragraph_end
+            continue
+        for sentence_start, sentence_end in iter_spans(text, SENTENCE_BREAK, paragraph_start, paragraph_end):
+            if sentence_end - sentence_start <= max_chars:
+                yield sentence_start, sentence_end
+            else:
+                yield from hard_split(text, sentence_start, sentence_end, max_chars)
+
+def iter_chunks(text, max_chars=None, overlap=0, max_tokens=None, overlap_tokens=None,
+                chars_per_token=CHARS_PER_TOKEN):
+    """Lazily yield Chunks of at most max_chars characters and/or max_tokens estimated tokens.
+
+    Consecutive segments are packed greedily. With overlap, each chunk starts
+    with whole trailing segments of the previous one, up to overlap characters.
+    """
+    if max_tokens is not None:
+        token_chars = max_tokens * chars_per_token
+        max_chars = token_chars if max_chars is None else min(max_chars, token_chars)
+    elif max_chars is None:
+        max_chars = DEFAULT_CHUNK_CHARS
+    if overlap_tokens is not None:
+        overlap = overlap_tokens * chars_per_token
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    overlap = max(0, min(overlap, max_chars - 1))
+
+    current = deque()
+    for segment in iter_segments(text, max_chars):
+        if current and segment[1] - current[0][0] > max_chars:
+            chunk_start, chunk_end = current[0][0], current[-1][1]
+            yield Chunk(text[chunk_start:chunk_end], chunk_start, chunk_end)
+
+            # Keep trailing segments for the overlap, but never so many that
+            # the next segment no longer fits
+            while current and (chunk_end - current[0][0] > overlap or segment[1] - current[0][0] > max_chars):
+                current.popleft()
+        current.append(segment)
+
+    if current:
+        chunk_start, chunk_end = current[0][0], current[-1][1]
+        yield Chunk(text[chunk_start:chunk_end], chunk_start, chunk_end)
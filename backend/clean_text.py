@@ -1,28 +1,61 @@
 import re
-from bs4 import BeautifulSoup
-
-def clean_text(text):
-    # Remove excessive whitespace, normalize line breaks
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
-
-def extract_main_content(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
-    # Remove unwanted elements
-    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
-        element.decompose()
-    
-    # Extract text from main content areas (prioritize article, main, content divs)
-    main_content = soup.find('article') or soup.find('main') or soup.find(id=re.compile(r'content|main', re.I))
-    
-    if main_content:
-        # Extract from main content area if found
-        content = main_content.get_text(separator='\n', strip=True)
-    else:
-        # Fallback to extracting paragraphs and headings if no main content area identified
-        elements = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p'])
-        content = '\n'.join([elem.get_text(strip=True) for elem in elements if elem.get_text(strip=True)])
-    
-    return content
\ No newline at end of file
+
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+STREAM_WINDOW_SIZE = 64 * 1024
+
+def clean_text(text, preserve_paragraphs=False):
+    """Collapse whitespace runs to single spaces.
+
+    With preserve_paragraphs, runs containing a blank line become a single
+    paragraph break ("\\n\\n") so chunkers can split on paragraphs.
+    """
+    if not preserve_paragraphs:
+        return ' '.join(text.split())
+    paragraphs = (' '.join(paragraph.split()) for paragraph in PARAGRAPH_BREAK.split(text))
+    return '\n\n'.join(paragraph for paragraph in paragraphs if paragraph)
+
+def whitespace_separator(run, preserve_paragraphs):
+    """Normalized form of a whitespace run; '\\n' is kept so a break split across windows still counts"""
+    if preserve_paragraphs:
+        newlines = run.count('\n')
+        if newlines >= 2:
+            return '\n\n'
+        if newlines == 1:
+            return '\n'
+    return ' '
+
+def iter_clean_text(source, preserve_paragraphs=False, window_size=STREAM_WINDOW_SIZE):
+    """Generator form of clean_text for very large bodies.
+
+    source is a string or an iterable of string pieces (e.g. a decoded stream).
+    Works on window_size pieces at a time and yields cleaned text, so
+    ''.join(iter_clean_text(text)) == clean_text(text) without holding extra
+    full-size copies. Whitespace at a window edge is carried into the next window.
+    """
+    windows = source
+    if isinstance(source, str):
+        windows = (source[i:i + window_size] for i in range(0, len(source), window_size))
+
+    carry = ''
+    started = False
+    for window in windows:
+        buffer = carry + window
+        body = buffer.rstrip()
+        if not body:
+            carry = whitespace_separator(buffer, preserve_paragraphs) if buffer else ''
+            continue
+        carry = whitespace_separator(buffer[len(body):], preserve_paragraphs) if len(body) < len(buffer) else ''
+
+        stripped = body.lstrip()
+        if started and len(stripped) < len(body):
+            separator = whitespace_separator(body[:len(body) - len(stripped)], preserve_paragraphs)
+            yield '\n\n' if separator == '\n\n' else ' '
+        yield clean_text(stripped, preserve_paragraphs)
+        started = True
+
+def extract_main_content(html_content, engine=None):
+    """Extract the readable main content of an HTML page (see html_extraction)"""
+    # Imported here so clean_text() callers don't pay for the parsers at cold start
+    from html_extraction import extract_main_content as extract
+
+    return extract(html_content, engine)
@@ -1,31 +1,136 @@
 import json
-import boto3
 import os
 import logging
+import time
+from aws_clients import get_client
+from job_status import get_job_status, get_job_statuses, TERMINAL_STATES, COMPLETED, FAILED
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-s3_client = boto3.client('s3')
-
 # Environment variables expected:
 # - S3_BUCKET: The bucket where results are stored
 # - REKOGNITION_PREFIX: e.g., "rekognition-results"
 # - TRANSCRIBE_PREFIX: e.g., "transcribe-results"
+# - JOB_STATUS_TABLE: Job state records written by the invokers and workers (job_status.py)
+
+# GET /results/{jobId}?type=...&wait=N&status=S long-polls: while the job's
+# state record still says S (or whatever it said on the first read), the
+# request re-reads the record every STATUS_POLL_INTERVAL seconds for up to N
+# seconds and returns as soon as it changes. S3 is only read once, for the
+# result of a COMPLETED job. Jobs without a record fall back to the S3
+# result/FAILED files. POST /results/batch returns the states of many jobs.
+MAX_WAIT_SECONDS = int(os.environ.get('MAX_WAIT_SECONDS', 20)) # Stay under the API Gateway 30s timeout
+STATUS_POLL_INTERVAL = float(os.environ.get('STATUS_POLL_INTERVAL', 1))
+MAX_BATCH_JOBS = 100
+
+def result_keys(job_id, result_type, rekognition_prefix, transcribe_prefix):
+    """Return the (result_key, failure_key) S3 keys for a job"""
+    if result_type == 'rekognition':
+        # Failure status for Rekognition isn't explicitly saved currently
+        return f"{rekognition_prefix}/{job_id}.txt", None
+    if result_type == 'transcribe':
+        return f"{transcribe_prefix}/{job_id}.txt", f"{transcribe_prefix}/{job_id}.FAILED.txt"
+    raise ValueError(f"Invalid result type specified: {result_type}")
+
+def read_s3_status(job_id, s3_bucket, result_key, failure_key):
+    """Legacy status check from the S3 result files. Returns (statusCode, body)"""
+    # Check for successful result file
+    try:
+        logger.debug(f"Checking for result file: s3://{s3_bucket}/{result_key}")
+        response = get_client('s3').get_object(Bucket=s3_bucket, Key=result_key)
+        content = response['Body'].read().decode('utf-8')
+        logger.info(f"Result found for job {job_id}")
+        return 200, {'status': 'COMPLETED', 'result': content}
+    except get_client('s3').exceptions.NoSuchKey:
+        logger.info(f"Result file not found yet for job {job_id}. Checking for failure...")
+        # Fall through to check failure key or return PENDING
+    except Exception as e:
+        logger.error(f"Error retrieving result file s3://{s3_bucket}/{result_key}: {e}")
+        # Return PENDING on error to allow retries, or consider a different status
+        return 202, {'status': 'PENDING', 'detail': f'Error checking result: {e}'}
+
+    # Check for failure file (currently only for transcribe)
+    if failure_key:
+        try:
+            logger.debug(f"Checking for failure file: s3://{s3_bucket}/{failure_key}")
+            response = get_client('s3').get_object(Bucket=s3_bucket, Key=failure_key)
+            failure_reason = response['Body'].read().decode('utf-8')
+            logger.error(f"Failure file found for job {job_id}. Reason: {failure_reason}")
+            return 200, {'status': 'FAILED', 'error': failure_reason}
+        except get_client('s3').exceptions.NoSuchKey:
+            logger.info(f"Failure file not found for job {job_id}. Status is PENDING.")
+        except Exception as e:
+            logger.error(f"Error retrieving failure file s3://{s3_bucket}/{failure_key}: {e}")
+            return 202, {'status': 'PENDING', 'detail': f'Error checking failure file: {e}'}
+
+    # If no result or failure file found
+    return 202, {'status': 'PENDING', 'detail': 'Result not yet available.'}
+
+def wait_for_change(job_id, record, known_status, wait_seconds, context=None):
+    """Re-read the job's record until it leaves known_status, finishes, or wait_seconds pass"""
+    deadline = time.time() + wait_seconds
+    if context is not None:
+        # Leave time to fetch the result and respond before the Lambda times out
+        deadline = min(deadline, time.time() + context.get_remaining_time_in_millis() / 1000 - 3)
+
+    while record['status'] == known_status and record['status'] not in TERMINAL_STATES:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        time.sleep(min(STATUS_POLL_INTERVAL, remaining))
+        record = get_job_status(job_id) or record
+    return record
+
+def read_record_status(job_id, record, s3_bucket):
+    """Response for a job with a state record. Returns (statusCode, body)"""
+    status = record['status']
+    if status == COMPLETED:
+        try:
+            response = get_client('s3').get_object(Bucket=s3_bucket, Key=record['result_key'])
+        except get_client('s3').exceptions.NoSuchKey:
+            logger.error(f"Job {job_id} is COMPLETED but s3://{s3_bucket}/{record['result_key']} is missing")
+            return 200, {'status': 'FAILED', 'error': 'Result file is missing'}
+        logger.info(f"Result found for job {job_id}")
+        return 200, {'status': COMPLETED, 'result': response['Body'].read().decode('utf-8')}
+    if status == FAILED:
+        return 200, {'status': FAILED, 'error': record.get('error') or 'Unknown reason'}
+    return 202, {'status': status, 'detail': 'Result not yet available.'}
+
+def handle_batch_status(body):
+    """States of up to MAX_BATCH_JOBS jobs in one call, without fetching results"""
+    job_ids = body.get('jobIds')
+    if not isinstance(job_ids, list) or not job_ids or not all(isinstance(job_id, str) for job_id in job_ids):
+        raise ValueError("'jobIds' must be a non-empty list of job IDs")
+    if len(job_ids) > MAX_BATCH_JOBS:
+        raise ValueError(f"At most {MAX_BATCH_JOBS} jobIds per request")
+
+    records = get_job_statuses(job_ids)
+    jobs = {}
+    for job_id in job_ids:
+        record = records.get(job_id)
+        if not record:
+            jobs[job_id] = {'status': 'UNKNOWN'}
+            continue
+        jobs[job_id] = {'status': record['status'], 'type': record.get('job_type')}
+        if record.get('error'):
+            jobs[job_id]['error'] = record['error']
+    return {'jobs': jobs}
 
 def lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event)}")
-    
+
     headers = {
         'Access-Control-Allow-Origin': '*',
         'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-        'Access-Control-Allow-Methods': 'OPTIONS,GET' # Allow GET
+        'Access-Control-Allow-Methods': 'OPTIONS,GET,POST'
     }
-    
+
+    method = event.get('requestContext', {}).get('http', {}).get('method')
     # Handle OPTIONS request for CORS
-    if event.get('requestContext', {}).get('http', {}).get('method') == 'OPTIONS':
+    if method == 'OPTIONS':
         return {'statusCode': 200, 'headers': headers, 'body': ''}
-        
+
     try:
         s3_bucket = os.environ['S3_BUCKET']
         rekognition_prefix = os.environ['REKOGNITION_PREFIX']
@@ -36,82 +141,41 @@ def lambda_handler(event, context):
             'statusCode': 500, 'headers': headers,
             'body': json.dumps({'error': 'Internal configuration error', 'details': f'Missing env var: {e}'})
         }
-        
+
     try:
+        if method == 'POST':
+            body = json.loads(event.get('body') or '{}')
+            return {'statusCode': 200, 'headers': headers, 'body': json.dumps(handle_batch_status(body))}
+
         # Extract job ID and type from path/query parameters
-        job_id = event.get('pathParameters', {}).get('jobId')
-        result_type = event.get('queryStringParameters', {}).get('type', 'rekognition') # Default or require type?
+        job_id = (event.get('pathParameters') or {}).get('jobId')
+        query = event.get('queryStringParameters') or {}
+        result_type = query.get('type', 'rekognition') # Default or require type?
 
         if not job_id:
             raise ValueError("Missing 'jobId' in path parameters")
-        
-        logger.info(f"Checking status for Job ID: {job_id}, Type: {result_type}")
-
-        result_key = None
-        failure_key = None
-        
-        if result_type == 'rekognition':
-            result_key = f"{rekognition_prefix}/{job_id}.txt"
-            # Failure status for Rekognition isn't explicitly saved currently
-        elif result_type == 'transcribe':
-            result_key = f"{transcribe_prefix}/{job_id}.txt"
-            failure_key = f"{transcribe_prefix}/{job_id}.FAILED.txt"
-        else:
-            raise ValueError(f"Invalid result type specified: {result_type}")
+        try:
+            wait_seconds = min(max(int(query.get('wait', 0)), 0), MAX_WAIT_SECONDS)
+        except ValueError:
+            raise ValueError("'wait' must be a number of seconds")
+
+        logger.info(f"Checking status for Job ID: {job_id}, Type: {result_type}, wait: {wait_seconds}s")
+        result_key, failure_key = result_keys(job_id, result_type, rekognition_prefix, transcribe_prefix)
 
-        # Check for successful result file
         try:
-            logger.debug(f"Checking for result file: s3://{s3_bucket}/{result_key}")
-            response = s3_client.get_object(Bucket=s3_bucket, Key=result_key)
-            content = response['Body'].read().decode('utf-8')
-            logger.info(f"Result found for job {job_id}")
-            return {
-                'statusCode': 200,
-                'headers': headers,
-                'body': json.dumps({'status': 'COMPLETED', 'result': content})
-            }
-        except s3_client.exceptions.NoSuchKey:
-            logger.info(f"Result file not found yet for job {job_id}. Checking for failure...")
-            # Fall through to check failure key or return PENDING
+            record = get_job_status(job_id)
         except Exception as e:
-            logger.error(f"Error retrieving result file s3://{s3_bucket}/{result_key}: {e}")
-            # Return PENDING on error to allow retries, or consider a different status
-            return {
-                'statusCode': 202, # Still processing / temporarily unavailable
-                'headers': headers,
-                'body': json.dumps({'status': 'PENDING', 'detail': f'Error checking result: {e}'})
-            }
-            
-        # Check for failure file (currently only for transcribe)
-        if failure_key:
-            try:
-                logger.debug(f"Checking for failure file: s3://{s3_bucket}/{failure_key}")
-                response = s3_client.get_object(Bucket=s3_bucket, Key=failure_key)
-                failure_reason = response['Body'].read().decode('utf-8')
-                logger.error(f"Failure file found for job {job_id}. Reason: {failure_reason}")
-                return {
-                    'statusCode': 200, # Found a definitive FAILED status
-                    'headers': headers,
-                    'body': json.dumps({'status': 'FAILED', 'error': failure_reason})
-                }
-            except s3_client.exceptions.NoSuchKey:
-                logger.info(f"Failure file not found for job {job_id}. Status is PENDING.")
-                # Return PENDING as neither result nor failure file exists
-            except Exception as e:
-                 logger.error(f"Error retrieving failure file s3://{s3_bucket}/{failure_key}: {e}")
-                 # Return PENDING on error to allow retries
-                 return {
-                     'statusCode': 202, 
-                     'headers': headers,
-                     'body': json.dumps({'status': 'PENDING', 'detail': f'Error checking failure file: {e}'})
-                 }
-                 
-        # If no result or failure file found
-        return {
-            'statusCode': 202, # Still processing
-            'headers': headers,
-            'body': json.dumps({'status': 'PENDING', 'detail': 'Result not yet available.'})
-        }
+            logger.error(f"Job status read error for {job_id}: {e}")
+            record = None
+
+        if record is None:
+            status_code, body = read_s3_status(job_id, s3_bucket, result_key, failure_key)
+        else:
+            if wait_seconds:
+                record = wait_for_change(job_id, record, query.get('status') or record['status'], wait_seconds, context)
+            status_code, body = read_record_status(job_id, record, s3_bucket)
+
+        return {'statusCode': status_code, 'headers': headers, 'body': json.dumps(body)}
 
     except ValueError as e:
          logger.error(f"Input validation error: {str(e)}")
@@ -123,4 +187,4 @@ def lambda_handler(event, context):
         return {
             'statusCode': 500, 'headers': headers,
             'body': json.dumps({'error': f'Internal server error: {str(e)}'})
-        } 
\ No newline at end of file
+        }
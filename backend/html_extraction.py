@@ -0,0 +1,133 @@
+import os
+import re
+from logger import logger
+
+# Main-content extraction engines. "lxml" parses with libxml2 and scores
+# text blocks in a single pass over the tree, in the spirit of the
+# Readability.js bundled with the extension. "soup" is the original
+# BeautifulSoup/html.parser implementation and the fallback whenever lxml is
+# missing or finds nothing.
+EXTRACTION_ENGINE = os.environ.get('EXTRACTION_ENGINE', 'auto')
+
+UNWANTED_TAGS = ('script', 'style', 'nav', 'footer', 'header', 'aside', 'noscript', 'form', 'iframe')
+BLOCK_TAGS = ('p', 'pre', 'blockquote', 'li', 'td', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+SCORED_TAGS = ('p', 'pre', 'td', 'blockquote')
+POSITIVE_HINTS = re.compile(r'article|body|content|entry|main|page|post|text|blog|story', re.I)
+NEGATIVE_HINTS = re.compile(r'comment|meta|footer|footnote|sidebar|sponsor|ad-|promo|related|share|social|widget|banner|menu|nav', re.I)
+MIN_BLOCK_CHARS = 25
+
+def extract_with_soup(html_content):
+    """Original extraction: BeautifulSoup with html.parser"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html_content, 'html.parser')
+
+    # Remove unwanted elements
+    for element in soup(['script', 'style', 'nav', 'footer', 'header', 'aside']):
+        element.decompose()
+
+    # Extract text from main content areas (prioritize article, main, content divs)
+    main_content = soup.find('article') or soup.find('main') or soup.find(id=re.compile(r'content|main', re.I))
+
+    if main_content:
+        # Extract from main content area if found
+        content = main_content.get_text(separator='\n', strip=True)
+    else:
+        # Fallback to extracting paragraphs and headings if no main content area identified
+        elements = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p'])
+        content = '\n'.join([elem.get_text(strip=True) for elem in elements if elem.get_text(strip=True)])
+
+    return content
+
+def class_weight(element):
+    """Readability-style bonus/penalty from class and id"""
+    hints = f"{element.get('class', '')} {element.get('id', '')}"
+    weight = 0
+    if POSITIVE_HINTS.search(hints):
+        weight += 25
+    if NEGATIVE_HINTS.search(hints):
+        weight -= 25
+    if element.tag in ('article', 'main'):
+        weight += 30
+    return weight
+
+def extract_with_lxml(html_content):
+    """Parse with lxml and pick the best-scoring container in one pass over the text blocks"""
+    from lxml import etree, html as lxml_html
+
+    encoding = None
+    if isinstance(html_content, str):
+        # Encode ourselves so a <meta charset> in an already decoded page is ignored
+        html_content = html_content.encode('utf-8')
+        encoding = 'utf-8'
+    parser = lxml_html.HTMLParser(remove_comments=True, remove_pis=True, encoding=encoding)
+    root = lxml_html.fromstring(html_content, parser=parser)
+    etree.strip_elements(root, *UNWANTED_TAGS, with_tail=False)
+
+    scores = {}
+    blocks = []
+    seen = set()
+    for element in root.iter(*BLOCK_TAGS):
+        # A <p> inside an <li> is already part of the <li>'s text
+        if any(ancestor in seen for ancestor in element.iterancestors(*BLOCK_TAGS)):
+            continue
+        text = ' '.join(element.text_content().split())
+        if not text:
+            continue
+        seen.add(element)
+        blocks.append((element, text))
+
+        if element.tag not in SCORED_TAGS or len(text) < MIN_BLOCK_CHARS:
+            continue
+        score = 1 + text.count(',') + min(len(text) // 100, 3)
+        parent = element.getparent()
+        grandparent = parent.getparent() if parent is not None else None
+        for candidate, share in ((parent, 1.0), (grandparent, 0.5)):
+            if candidate is None:
+                continue
+            if candidate not in scores:
+                scores[candidate] = class_weight(candidate)
+            scores[candidate] += score * share
+
+    if not blocks:
+        return ' '.join(root.text_content().split())
+    if not scores:
+        return '\n\n'.join(text for _, text in blocks)
+
+    best = max(scores, key=scores.get)
+    return '\n\n'.join(text for element, text in blocks if element is best or best in element.iterancestors())
+
+ENGINES = {
+    'lxml': extract_with_lxml,
+    'soup': extract_with_soup
+}
+
+def lxml_available():
+    """True if lxml can be imported"""
+    try:
+        import lxml.html # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def get_engine_name(name=None):
+    """Resolve 'auto' (or None) to the fastest available engine"""
+    name = name or EXTRACTION_ENGINE
+    if name == 'auto':
+        return 'lxml' if lxml_available() else 'soup'
+    if name not in ENGINES:
+        raise ValueError(f"Unknown extraction engine: {name}")
+    return name
+
+def extract_main_content(html_content, engine=None):
+    """Extract readable main content from HTML, falling back to the soup engine"""
+    name = get_engine_name(engine)
+    if name != 'soup':
+        try:
+            content = ENGINES[name](html_content)
+            if content:
+                return content
+            logger.info(f"{name} extraction found no content, falling back to soup")
+        except Exception as e:
+            logger.warning(f"{name} extraction failed, falling back to soup: {str(e)}")
+    return extract_with_soup(html_content)
@@ -0,0 +1,59 @@
+import argparse
+import subprocess
+import sys
+
+# Reports cold-start import cost for the Lambda entry modules using
+# `python -X importtime`. Each module is imported in a fresh interpreter so
+# results aren't hidden by modules already loaded by an earlier import.
+DEFAULT_MODULES = ['summarize', 'ingestion_worker', 'get_result', 'invoke_transcribe', 'invoke_rekognition', 'auth']
+
+def measure_imports(module_name):
+    """Return (total_us, [(cumulative_us, self_us, name), ...]) for importing a module"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        errors = [line for line in result.stderr.splitlines() if line.strip() and not line.startswith('import time:')]
+        raise RuntimeError(errors[-1] if errors else f"import {module_name} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Keep the name's indentation, it encodes the import depth
+        rows.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+
+    total = next((cumulative for cumulative, _, name in rows if name.strip() == module_name), 0)
+    return total, rows
+
+def print_report(module_name, total_us, rows, top):
+    """Print the total and the slowest top-level imports for a module"""
+    print(f"{module_name}: {total_us / 1000:.1f}ms")
+    direct = [row for row in rows if len(row[2]) - len(row[2].lstrip()) == 2]
+    for cumulative_us, self_us, name in sorted(direct, reverse=True)[:top]:
+        print(f"    {cumulative_us / 1000:8.1f}ms  (self {self_us / 1000:6.1f}ms)  {name.strip()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report import time per Lambda module")
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--top', type=int, default=8, help="Number of slowest imports to list per module")
+    parser.add_argument('--budget-ms', type=float, help="Exit non-zero if any module takes longer than this to import")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module_name in args.modules:
+        try:
+            total_us, rows = measure_imports(module_name)
+        except RuntimeError as e:
+            print(f"{module_name}: import failed ({e})")
+            over_budget.append(module_name)
+            continue
+        print_report(module_name, total_us, rows, args.top)
+        if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+            over_budget.append(module_name)
+
+    if over_budget:
+        print(f"Over budget or failed: {', '.join(over_budget)}")
+        sys.exit(1)
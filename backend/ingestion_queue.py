@@ -0,0 +1,52 @@
+import json
+import os
+import time
+from logger import logger
+from job_queue import SQSJobQueue, SQLiteJobQueue
+
+# Kendra ingestion runs in the background: the request path enqueues a job
+# and ingestion_worker picks it up. Production uses SQS, local runs and
+# tests can point INGESTION_QUEUE_DB at a SQLite file instead.
+INGESTION_QUEUE_URL = os.environ.get('INGESTION_QUEUE_URL')
+INGESTION_QUEUE_DB = os.environ.get('INGESTION_QUEUE_DB')
+MAX_MESSAGE_BYTES = 250 * 1024  # SQS caps messages at 256 KB
+# A document still 'queued' after this long lost its job (dropped or dead-lettered
+# without a status write) and is enqueued again. Default: the queue's 5 receives x 360s
+INGESTION_QUEUED_TTL = int(os.environ.get('INGESTION_QUEUED_TTL', 1800))
+
+_queue = None
+
+def get_ingestion_queue():
+    """Return the configured ingestion queue, or None to index inline"""
+    global _queue
+    if _queue is None:
+        if INGESTION_QUEUE_URL:
+            _queue = SQSJobQueue(INGESTION_QUEUE_URL)
+        elif INGESTION_QUEUE_DB:
+            _queue = SQLiteJobQueue(INGESTION_QUEUE_DB)
+    return _queue
+
+def build_ingestion_job(url_hash, url, title, chunks):
+    """Describe a document to index. Oversized chunk lists are left for the worker to rebuild from S3"""
+    job = {'url_hash': url_hash, 'url': url, 'title': title, 'chunks': chunks, 'enqueued_at': int(time.time())}
+    if len(json.dumps(job).encode('utf-8')) > MAX_MESSAGE_BYTES:
+        job['chunks'] = None
+    return job
+
+def is_queued(metadata, now=None):
+    """True if the document's ingestion job was queued recently enough to still be in flight"""
+    if not metadata or metadata.get('indexed_status') != 'queued':
+        return False
+    now = time.time() if now is None else now
+    return now - metadata.get('queued_at', 0) < INGESTION_QUEUED_TTL
+
+def enqueue_ingestion(url_hash, url, title, chunks, queue=None):
+    """Hand a document to the background Kendra ingestion worker. Returns False if no queue is configured"""
+    if queue is None:
+        queue = get_ingestion_queue()
+    if queue is None:
+        return False
+
+    queue.enqueue(build_ingestion_job(url_hash, url, title, chunks))
+    logger.info(f"Queued {len(chunks)} chunks of {url_hash} for Kendra ingestion")
+    return True
@@ -0,0 +1,63 @@
+import json
+import os
+from logger import logger
+from kendra_indexing import split_into_chunks, index_in_kendra
+from s3_helper import get_document_content, update_indexed_status
+
+KENDRA_INDEX_ID = os.environ.get('KENDRA_INDEX_ID')
+
+def process_job(job, index_id=KENDRA_INDEX_ID, kendra_client=None):
+    """Index one queued document in Kendra and record the outcome once. Returns True on success"""
+    url_hash = job['url_hash']
+    title = job.get('url') or job.get('title') or ''
+    chunks = job.get('chunks')
+
+    if chunks is None:
+        # Chunk list was too large for the queue message, rebuild it from S3
+        document = get_document_content(url_hash)
+        if not document or not document.get('cleaned_text'):
+            logger.error(f"No stored content for queued document {url_hash}")
+            update_indexed_status(url_hash, 'failed')
+            return False
+        chunks = split_into_chunks(document['cleaned_text'])
+
+    result = index_in_kendra(chunks, url_hash, title, index_id, kendra_client)
+
+    # index_in_kendra only records status for URL titles, make sure queued jobs always get one
+    if not title.startswith(('http://', 'https://')):
+        update_indexed_status(url_hash, result['status'])
+
+    return result['status'] == 'complete'
+
+def drain(queue, index_id=KENDRA_INDEX_ID, kendra_client=None, max_jobs=None, retry_delay=30):
+    """Process jobs from a polling queue (e.g. SQLiteJobQueue) until it is empty. Returns jobs processed"""
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        messages = queue.receive(max_messages=10)
+        if not messages:
+            break
+        for receipt, job, _ in messages:
+            try:
+                ok = process_job(job, index_id, kendra_client)
+            except Exception as e:
+                logger.error(f"Error processing ingestion job: {str(e)}", exc_info=True)
+                ok = False
+            if ok:
+                queue.ack(receipt)
+            else:
+                queue.nack(receipt, delay=retry_delay)
+            processed += 1
+    return processed
+
+def lambda_handler(event, context):
+    """SQS-triggered entry point. Failed messages are reported back so SQS retries only those"""
+    batch_item_failures = []
+    for record in event.get('Records', []):
+        try:
+            if not process_job(json.loads(record['body'])):
+                batch_item_failures.append({'itemIdentifier': record['messageId']})
+        except Exception as e:
+            logger.error(f"Error processing ingestion record {record.get('messageId')}: {str(e)}", exc_info=True)
+            batch_item_failures.append({'itemIdentifier': record['messageId']})
+
+    return {'batchItemFailures': batch_item_failures}
@@ -1,149 +1,191 @@
 import json
-import boto3
 import os
 import logging
+import math
+import re
+import urllib.parse
 import uuid
-import base64 # Needed for decoding audio
+import base64 # Needed for decoding audio (legacy audio_data requests)
+from aws_clients import get_client
+from job_status import set_job_status, PENDING, FAILED
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-ecs_client = boto3.client('ecs')
-s3_client = boto3.client('s3') # Added S3 client
-
 # Environment variable for the bucket where temporary audio is uploaded
-TEMP_AUDIO_BUCKET_ENV_VAR = 'TEMP_AUDIO_BUCKET' 
+TEMP_AUDIO_BUCKET_ENV_VAR = 'TEMP_AUDIO_BUCKET'
 TEMP_AUDIO_PREFIX = "temp-audio" # S3 prefix for uploaded audio
+AUDIO_CONTENT_TYPE = 'audio/webm'
+
+# Two-phase upload: POST /transcribe returns a presigned POST (or, above
+# MULTIPART_THRESHOLD bytes, presigned part URLs) for temp-audio/{uuid}.webm and
+# the client uploads the recording straight to S3. The object-created event
+# for that key invokes this handler again, which queues the Transcribe job.
+MAX_AUDIO_BYTES = int(os.environ.get('MAX_AUDIO_BYTES', 2 * 1024 ** 3)) # Transcribe's media size limit
+MULTIPART_THRESHOLD = int(os.environ.get('MULTIPART_THRESHOLD', 64 * 1024 ** 2))
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE', 16 * 1024 ** 2)) # S3 minimum is 5MB
+UPLOAD_URL_EXPIRY = int(os.environ.get('UPLOAD_URL_EXPIRY', 900))
+
+AUDIO_KEY_PATTERN = re.compile(rf"^{TEMP_AUDIO_PREFIX}/([0-9a-f]{{8}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{4}}-[0-9a-f]{{12}})\.webm$")
+
+def response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(body)
+    }
+
+def job_name_for_key(key):
+    """temp-audio/{uuid}.webm -> transcribe-{uuid}, or None for other keys"""
+    match = AUDIO_KEY_PATTERN.match(key or '')
+    return f"transcribe-{match.group(1)}" if match else None
+
+def create_upload(bucket, size):
+    """Presign the upload of a new recording of size bytes. Returns the response body"""
+    job_uuid = str(uuid.uuid4())
+    s3_key = f"{TEMP_AUDIO_PREFIX}/{job_uuid}.webm"
+    result = {'jobName': f"transcribe-{job_uuid}", 'key': s3_key}
+    set_job_status(result['jobName'], PENDING, 'transcribe')
+
+    if size <= MULTIPART_THRESHOLD:
+        result['upload'] = {
+            'method': 'POST',
+            **get_client('s3').generate_presigned_post(
+                Bucket=bucket,
+                Key=s3_key,
+                Fields={'Content-Type': AUDIO_CONTENT_TYPE},
+                Conditions=[{'Content-Type': AUDIO_CONTENT_TYPE}, ['content-length-range', 1, MULTIPART_THRESHOLD]],
+                ExpiresIn=UPLOAD_URL_EXPIRY
+            )
+        }
+        return result
+
+    upload_id = get_client('s3').create_multipart_upload(Bucket=bucket, Key=s3_key, ContentType=AUDIO_CONTENT_TYPE)['UploadId']
+    part_count = math.ceil(size / MULTIPART_PART_SIZE)
+    result['upload'] = {
+        'method': 'MULTIPART',
+        'uploadId': upload_id,
+        'partSize': MULTIPART_PART_SIZE,
+        'parts': [
+            {
+                'partNumber': part_number,
+                'url': get_client('s3').generate_presigned_url(
+                    'upload_part',
+                    Params={'Bucket': bucket, 'Key': s3_key, 'UploadId': upload_id, 'PartNumber': part_number},
+                    ExpiresIn=UPLOAD_URL_EXPIRY
+                )
+            }
+            for part_number in range(1, part_count + 1)
+        ]
+    }
+    return result
+
+def complete_upload(bucket, body):
+    """Finish a multipart upload from the part ETags the client collected"""
+    s3_key = body.get('key')
+    job_name = job_name_for_key(s3_key)
+    if not job_name or not body.get('uploadId'):
+        raise ValueError("Missing or invalid 'key' or 'uploadId'")
+
+    if body.get('action') == 'abort_upload':
+        get_client('s3').abort_multipart_upload(Bucket=bucket, Key=s3_key, UploadId=body['uploadId'])
+        logger.info(f"Aborted upload s3://{bucket}/{s3_key}")
+        set_job_status(job_name, FAILED, 'transcribe', error='Upload aborted')
+        return response(200, {'message': 'Upload aborted', 'jobName': job_name})
+
+    parts = body.get('parts')
+    if not parts:
+        raise ValueError("Missing 'parts' for multipart upload")
+    get_client('s3').complete_multipart_upload(
+        Bucket=bucket,
+        Key=s3_key,
+        UploadId=body['uploadId'],
+        MultipartUpload={'Parts': [{'PartNumber': int(part['partNumber']), 'ETag': part['etag']} for part in parts]}
+    )
+    logger.info(f"Completed multipart upload s3://{bucket}/{s3_key}")
+    return response(202, {'message': 'Transcribe task submitted successfully', 'jobName': job_name})
+
+def upload_audio_data(bucket, audio_base64):
+    """Legacy path: the whole clip base64 encoded in the request body"""
+    try:
+        missing_padding = len(audio_base64) % 4
+        if missing_padding:
+            audio_base64 += '=' * (4 - missing_padding)
+        audio_bytes = base64.b64decode(audio_base64)
+        logger.info(f"Audio decoded successfully, size: {len(audio_bytes)} bytes")
+    except base64.binascii.Error as e:
+        logger.error(f"Base64 decoding error: {str(e)}")
+        raise ValueError(f"Invalid base64 audio data: {str(e)}")
+
+    job_uuid = str(uuid.uuid4())
+    s3_key = f"{TEMP_AUDIO_PREFIX}/{job_uuid}.webm"
+    get_client('s3').put_object(Bucket=bucket, Key=s3_key, Body=audio_bytes, ContentType=AUDIO_CONTENT_TYPE)
+    logger.info(f"Audio uploaded to S3: s3://{bucket}/{s3_key}")
+    set_job_status(f"transcribe-{job_uuid}", PENDING, 'transcribe')
+    # The object-created event queues the job, as for direct uploads
+    return response(202, {'message': 'Transcribe task submitted successfully', 'jobName': f"transcribe-{job_uuid}"})
+
+def queue_uploaded_audio(event):
+    """S3 object-created records for temp-audio/: queue one Transcribe job per recording"""
+    job_queue_url = os.environ['JOB_QUEUE_URL']
+    queued = 0
+    for record in event['Records']:
+        bucket = record['s3']['bucket']['name']
+        s3_key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+        job_name = job_name_for_key(s3_key)
+        if not job_name:
+            logger.warning(f"Ignoring unexpected object s3://{bucket}/{s3_key}")
+            continue
+
+        # --- Queue the job for the Transcribe worker service (transcribe.py in worker mode) ---
+        job = {'job_name': job_name, 'bucket': bucket, 'key': s3_key}
+        # Raising makes Lambda retry the async invocation
+        get_client('sqs').send_message(QueueUrl=job_queue_url, MessageBody=json.dumps(job))
+        logger.info(f"Queued Transcribe job {job_name}")
+        queued += 1
+    return {'queued': queued}
 
 def lambda_handler(event, context):
     logger.info(f"Received event: {json.dumps(event)}")
 
-    # --- Extract necessary parameters from the event ---
-    try:
-        body = json.loads(event.get('body', '{}'))
-        audio_base64 = body.get('audio_data')
-        if not audio_base64:
-            raise ValueError("Missing 'audio_data' (base64 encoded) in request body")
-            
-        # Decode base64 audio data
-        try:
-            missing_padding = len(audio_base64) % 4
-            if missing_padding:
-                audio_base64 += '=' * (4 - missing_padding)
-            audio_bytes = base64.b64decode(audio_base64)
-            logger.info(f"Audio decoded successfully, size: {len(audio_bytes)} bytes")
-        except base64.binascii.Error as e:
-             logger.error(f"Base64 decoding error: {str(e)}")
-             raise ValueError(f"Invalid base64 audio data: {str(e)}")
-             
-    except Exception as e:
-        logger.error(f"Error parsing input event or decoding audio: {e}")
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Invalid input format or audio data', 'details': str(e)})
-        }
+    if event.get('Records'):
+        return queue_uploaded_audio(event)
 
     # --- Get Configuration from Environment Variables ---
     try:
-        cluster_name = os.environ['ECS_CLUSTER_ARN']
-        task_definition_arn = os.environ['TRANSCRIBE_TASK_DEF_ARN']
-        subnet_ids_str = os.environ['PRIVATE_SUBNET_IDS']
-        security_group_id = os.environ['TASK_SECURITY_GROUP_ID']
         temp_audio_bucket = os.environ[TEMP_AUDIO_BUCKET_ENV_VAR]
-        private_subnets = subnet_ids_str.split(',')
     except KeyError as e:
         logger.error(f"Missing environment variable: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Internal configuration error', 'details': f'Missing env var: {e}'})
-        }
+        return response(500, {'error': 'Internal configuration error', 'details': f'Missing env var: {e}'})
 
-    # --- Upload audio to S3 --- 
-    job_uuid = str(uuid.uuid4())
-    s3_key = f"{TEMP_AUDIO_PREFIX}/{job_uuid}.webm" # Assuming webm
-    transcribe_job_name = f"transcribe-{job_uuid}"
-    
+    # --- Extract necessary parameters from the event ---
     try:
-        s3_client.put_object(Bucket=temp_audio_bucket, Key=s3_key, Body=audio_bytes, ContentType='audio/webm')
-        logger.info(f"Audio uploaded to S3: s3://{temp_audio_bucket}/{s3_key}")
-    except Exception as e:
-        logger.error(f"Error uploading audio to S3: {str(e)}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Failed to upload audio to S3', 'details': str(e)})
-        }
-        
-    # --- Prepare Environment Variables for the Container --- 
-    container_environment = [
-        {
-            'name': 'S3_BUCKET', 
-            'value': temp_audio_bucket # Bucket where audio IS and results WILL BE saved
-        },
-        {
-            'name': 'S3_KEY', # Key of the input audio
-            'value': s3_key
-        },
-        {
-            'name': 'JOB_NAME', # Unique name for the transcribe job AND result file
-            'value': transcribe_job_name
-        }
-    ]
+        body = json.loads(event.get('body') or '{}')
+        action = body.get('action', 'create_upload')
+        if body.get('audio_data'):
+            return upload_audio_data(temp_audio_bucket, body['audio_data'])
+        if action in ('complete_upload', 'abort_upload'):
+            return complete_upload(temp_audio_bucket, body)
+        if action != 'create_upload':
+            raise ValueError(f"Unknown action: {action}")
 
-    logger.info(f"Attempting to run Transcribe task {transcribe_job_name} with definition {task_definition_arn}...")
+        try:
+            size = int(body.get('size'))
+        except (TypeError, ValueError):
+            raise ValueError("Missing or invalid 'size' (recording size in bytes)")
+        if size <= 0 or size > MAX_AUDIO_BYTES:
+            raise ValueError(f"Recording size must be between 1 and {MAX_AUDIO_BYTES} bytes")
+    except ValueError as e:
+        logger.error(f"Invalid transcribe request: {e}")
+        return response(400, {'error': 'Invalid input format or audio data', 'details': str(e)})
+    except Exception as e:
+        logger.error(f"Error handling transcribe request: {str(e)}", exc_info=True)
+        return response(500, {'error': 'Failed to upload audio to S3', 'details': str(e)})
 
-    # --- Run the ECS Task --- 
     try:
-        response = ecs_client.run_task(
-            cluster=cluster_name,
-            launchType='FARGATE',
-            taskDefinition=task_definition_arn,
-            count=1,
-            platformVersion='LATEST',
-            networkConfiguration={
-                'awsvpcConfiguration': {
-                    'subnets': private_subnets,
-                    'securityGroups': [security_group_id],
-                    'assignPublicIp': 'DISABLED'
-                }
-            },
-            overrides={
-                'containerOverrides': [
-                    {
-                        'name': 'transcribe-container', 
-                        'environment': container_environment
-                    }
-                ]
-            }
-        )
-        logger.info(f"ECS RunTask response: {response}")
-
-        if not response.get('tasks'):
-             raise Exception(f"Failed to start ECS task. Failures: {response.get('failures', [])}")
-
-        task_arn = response['tasks'][0]['taskArn']
-        logger.info(f"Successfully started task: {task_arn}")
-        
-        # Return JobName so caller can potentially track/find the result in S3
-        return {
-            'statusCode': 202, # Accepted
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'message': 'Transcribe task submitted successfully', 'jobName': transcribe_job_name, 'taskArn': task_arn})
-        }
-
+        upload = create_upload(temp_audio_bucket, size)
+        logger.info(f"Presigned {upload['upload']['method']} upload for s3://{temp_audio_bucket}/{upload['key']}")
+        return response(200, upload)
     except Exception as e:
-        logger.error(f"Error calling RunTask: {e}", exc_info=True)
-        # Attempt to clean up the uploaded S3 object if RunTask fails
-        try: 
-            s3_client.delete_object(Bucket=temp_audio_bucket, Key=s3_key)
-            logger.info(f"Cleaned up temporary audio file s3://{temp_audio_bucket}/{s3_key} after RunTask failure.")
-        except Exception as cleanup_e:
-             logger.error(f"Failed to cleanup temporary audio file s3://{temp_audio_bucket}/{s3_key} after RunTask failure: {cleanup_e}")
-             
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Failed to start ECS task', 'details': str(e)})
-        } 
\ No newline at end of file
+        logger.error(f"Error presigning audio upload: {str(e)}", exc_info=True)
+        return response(500, {'error': 'Failed to create audio upload', 'details': str(e)})
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from aws_clients import get_client
+
+# Queues shared by the background workers: Kendra ingestion (ingestion_queue.py)
+# and the transcribe/rekognition media workers (media_worker.py). Both
+# implementations hand out (receipt, job, attempts) tuples, where attempts
+# counts this delivery, and take the receipt back through ack() or nack().
+# Production uses SQS, local runs and tests a SQLite file or ':memory:'.
+
+class SQSJobQueue:
+    """Job queue backed by Amazon SQS"""
+
+    def __init__(self, queue_url, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs = sqs_client or get_client('sqs')
+
+    def enqueue(self, job):
+        self.sqs.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(job))
+
+    def receive(self, max_messages=10, visibility_timeout=300):
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=min(max_messages, 10),
+            VisibilityTimeout=visibility_timeout,
+            WaitTimeSeconds=1,
+            AttributeNames=['ApproximateReceiveCount']
+        )
+        return [
+            (message['ReceiptHandle'], json.loads(message['Body']), int(message.get('Attributes', {}).get('ApproximateReceiveCount', 1)))
+            for message in response.get('Messages', [])
+        ]
+
+    def ack(self, receipt):
+        self.sqs.delete_message(QueueUrl=self.queue_url, ReceiptHandle=receipt)
+
+    def nack(self, receipt, delay=0):
+        self.sqs.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=receipt, VisibilityTimeout=int(delay))
+
+class SQLiteJobQueue:
+    """Local job queue stored in a SQLite database (use ':memory:' for tests)"""
+
+    def __init__(self, path=':memory:'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                'id TEXT PRIMARY KEY, body TEXT NOT NULL, '
+                'available_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0)'
+            )
+
+    def enqueue(self, job):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO jobs (id, body, available_at) VALUES (?, ?, ?)',
+                (str(uuid.uuid4()), json.dumps(job), time.time())
+            )
+
+    def receive(self, max_messages=10, visibility_timeout=300):
+        now = time.time()
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                'SELECT id, body, attempts FROM jobs WHERE available_at <= ? ORDER BY available_at LIMIT ?',
+                (now, max_messages)
+            ).fetchall()
+            # Hide received jobs until they are acked or the visibility timeout passes
+            self._conn.executemany(
+                'UPDATE jobs SET available_at = ?, attempts = attempts + 1 WHERE id = ?',
+                [(now + visibility_timeout, row[0]) for row in rows]
+            )
+        return [(row[0], json.loads(row[1]), row[2] + 1) for row in rows]
+
+    def ack(self, receipt):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM jobs WHERE id = ?', (receipt,))
+
+    def nack(self, receipt, delay=0):
+        with self._lock, self._conn:
+            self._conn.execute('UPDATE jobs SET available_at = ? WHERE id = ?', (time.time() + delay, receipt))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
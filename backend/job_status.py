@@ -0,0 +1,92 @@
+import os
+import time
+from logger import logger
+from aws_clients import get_resource
+
+# Compact state records for Rekognition/Transcribe jobs, one DynamoDB item per
+# job: {job_id, job_type, status, result_key, error, updated_at, expires_at}.
+# The invokers write PENDING, workers RUNNING and the result writers
+# COMPLETED (with the S3 result_key) or FAILED, so get_result can answer from
+# a single GetItem instead of probing S3. Without JOB_STATUS_TABLE every call
+# is a no-op and get_result falls back to the S3 result files.
+JOB_STATUS_TABLE = os.environ.get('JOB_STATUS_TABLE')
+JOB_STATUS_TTL = int(os.environ.get('JOB_STATUS_TTL', 86400))
+BATCH_GET_LIMIT = 100 # DynamoDB BatchGetItem maximum
+
+PENDING, RUNNING, COMPLETED, FAILED = 'PENDING', 'RUNNING', 'COMPLETED', 'FAILED'
+TERMINAL_STATES = frozenset([COMPLETED, FAILED])
+# States a non-terminal write may replace, so a job only ever moves forwards
+PREVIOUS_STATES = {PENDING: (PENDING,), RUNNING: (PENDING, RUNNING)}
+
+def get_job_table(table_name=JOB_STATUS_TABLE):
+    """The job status table, or None when it isn't configured"""
+    return get_resource('dynamodb').Table(table_name) if table_name else None
+
+def set_job_status(job_id, status, job_type=None, result_key=None, error=None, table=None):
+    """Record a job's state. Returns False if it wasn't written
+
+    PENDING never overwrites a started job and RUNNING never a finished one,
+    so a redelivered or late message can't move it backwards.
+    """
+    table = table or get_job_table()
+    if table is None:
+        return False
+
+    now = int(time.time())
+    fields = {'status': status, 'updated_at': now, 'expires_at': now + JOB_STATUS_TTL}
+    if job_type:
+        fields['job_type'] = job_type
+    if result_key:
+        fields['result_key'] = result_key
+    if error:
+        fields['error'] = error[:1000]
+
+    names = {f"#{name}": name for name in fields}
+    values = {f":{name}": value for name, value in fields.items()}
+    update = {
+        'Key': {'job_id': job_id},
+        'UpdateExpression': 'SET ' + ', '.join(f"#{name} = :{name}" for name in fields),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }
+    if status not in TERMINAL_STATES:
+        previous = {f":previous{n}": state for n, state in enumerate(PREVIOUS_STATES[status])}
+        update['ConditionExpression'] = f"attribute_not_exists(job_id) OR #status IN ({', '.join(previous)})"
+        values.update(previous)
+
+    try:
+        table.update_item(**update)
+        return True
+    except Exception as e:
+        if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            logger.info(f"Job {job_id} already past {status}, not moving it back")
+        else:
+            logger.error(f"Job status write error for {job_id}: {str(e)}")
+        return False
+
+def get_job_status(job_id, table=None):
+    """Return the job's state record, or None if there is none"""
+    table = table or get_job_table()
+    if table is None:
+        return None
+    return table.get_item(Key={'job_id': job_id}, ConsistentRead=True).get('Item')
+
+def get_job_statuses(job_ids, table=None, dynamodb=None):
+    """Return {job_id: record} for the jobs that have a state record"""
+    table = table or get_job_table()
+    if table is None:
+        return {}
+    dynamodb = dynamodb or get_resource('dynamodb')
+    job_ids = list(dict.fromkeys(job_ids))
+
+    records = {}
+    for start in range(0, len(job_ids), BATCH_GET_LIMIT):
+        request = {table.name: {'Keys': [{'job_id': job_id} for job_id in job_ids[start:start + BATCH_GET_LIMIT]]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table.name, []):
+                records[item['job_id']] = item
+            request = response.get('UnprocessedKeys') or None
+            if request:
+                time.sleep(0.1) # Throttled; back off before retrying the rest
+    return records
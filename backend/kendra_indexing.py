@@ -1,8 +1,34 @@
 import hashlib
-import re
-import boto3
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 from logger import logger
-from s3_helper import generate_url_hash, update_indexed_status, get_document
+from aws_clients import get_client
+from chunker import iter_chunks
+from lru_cache import LRUCache
+from s3_helper import generate_url_hash, update_indexed_status, get_document, check_document_exists
+
+# Default time a request may spend waiting for freshly indexed documents
+KENDRA_WAIT_BUDGET = float(os.environ.get('KENDRA_WAIT_BUDGET', 3))
+READINESS_BASE_DELAY = 0.25
+READINESS_MAX_DELAY = 2.0
+STATUS_BATCH_SIZE = 10  # batch_get_document_status accepts at most 10 ids per call
+KENDRA_BATCH_SIZE = 10  # batch_put_document accepts at most 10 documents per call
+KENDRA_BATCH_MAX_BYTES = 50 * 1024 * 1024  # ...and at most 50 MB of documents in total
+KENDRA_PUT_CONCURRENCY = int(os.environ.get('KENDRA_PUT_CONCURRENCY', 4))
+PUT_MAX_ATTEMPTS = 3
+KENDRA_PASSAGE_CACHE_TTL = int(os.environ.get('KENDRA_PASSAGE_CACHE_TTL', 300))
+DEFAULT_KENDRA_QUERY = "What are the main points and key information in this document?"
+KENDRA_CHUNK_OVERLAP = int(os.environ.get('KENDRA_CHUNK_OVERLAP', 0)) # Characters repeated between adjacent chunks
+KENDRA_READY_STATUSES = ('INDEXED', 'UPDATED')
+KENDRA_FAILED_STATUSES = ('FAILED', 'UPDATE_FAILED')
+
+class KendraUnavailable(Exception):
+    """Kendra was required for a request but couldn't provide its content"""
+
+# (index_id, doc_id, query_text) -> combined passages, per container
+_passage_cache = LRUCache(max_size=256, ttl=KENDRA_PASSAGE_CACHE_TTL)
 
 def generate_document_id(content, title=""):
     """Updated function to use hash based url encoding for S3 bucket storing"""
@@ -15,128 +41,193 @@ def generate_document_id(content, title=""):
     hash_input = (title + content_sample).encode('utf-8')
     return hashlib.md5(hash_input).hexdigest()
 
-def split_into_chunks(text, max_chunk_size=5000):
+def split_into_chunks(text, max_chunk_size=5000, overlap=KENDRA_CHUNK_OVERLAP):
     """Split text into manageable chunks for Kendra indexing"""
-    # First try to split by paragraphs
-    paragraphs = re.split(r'\n\n+', text)
-    chunks = []
-    current_chunk = ""
-    
-    for paragraph in paragraphs:
-        if len(current_chunk) + len(paragraph) <= max_chunk_size:
-            current_chunk += paragraph + "\n\n"
-        else:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = paragraph + "\n\n"
-    
-    # Add the last chunk if it exists
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    # If we have no chunks (e.g., a single huge paragraph), split by sentences
-    if not chunks:
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        current_chunk = ""
-        
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) <= max_chunk_size:
-                current_chunk += sentence + " "
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                current_chunk = sentence + " "
-        
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-    
-    return chunks
+    return [chunk.text for chunk in iter_chunks(text, max_chunk_size, overlap)]
 
-def index_in_kendra(chunks, doc_id, title, index_id):
-    """Index content chunks in Kendra"""
-    kendra_client = boto3.client('kendra')
-    
-    responses = []
-    for i, chunk in enumerate(chunks):
-        chunk_id = f"{doc_id}_chunk_{i}"
-        
-        try:
-            response = kendra_client.batch_put_document(
-                IndexId=index_id,
-                Documents=[{
-                    'Id': chunk_id,
-                    'Title': f"{title} - Part {i+1}" if title else f"Document Part {i+1}",
-                    'Blob': chunk.encode(),
-                    'ContentType': 'PLAIN_TEXT',
-                    'Attributes': [
-                        {'Key': 'document_id', 'Value': {'StringValue': doc_id}},
-                        {'Key': 'chunk_number', 'Value': {'LongValue': i}},
-                        {'Key': 'source_url', 'Value': {'StringValue': title if title.startswith(('http://', 'https://')) else 'manual-input'}}
-                    ]
-                }]
-            )
-            responses.append(response)
-            
-            # If this is URL-based content, update the indexed status in S3
-            if title.startswith(('http://', 'https://')):
-                url_hash = generate_url_hash(title)
-                update_indexed_status(url_hash, 'complete')
-                
-        except Exception as e:
-            logger.error(f"Error indexing chunk {i}: {str(e)}")
-            
-            # Mark indexing as failed in S3 if URL-based
-            if title.startswith(('http://', 'https://')):
-                url_hash = generate_url_hash(title)
-                update_indexed_status(url_hash, 'failed')
-    
-    return responses
+def chunk_document_id(doc_id, chunk_number):
+    return f"{doc_id}_chunk_{chunk_number}"
 
-def query_kendra(doc_id, index_id, query_text="What are the main points and key information in this document?"):
-    """Query Kendra for the most relevant content from the document"""
-    kendra_client = boto3.client('kendra')
-    
+def build_kendra_document(chunk, doc_id, chunk_number, title):
+    """Build the batch_put_document entry for one chunk"""
+    return {
+        'Id': chunk_document_id(doc_id, chunk_number),
+        'Title': f"{title} - Part {chunk_number+1}" if title else f"Document Part {chunk_number+1}",
+        'Blob': chunk.encode(),
+        'ContentType': 'PLAIN_TEXT',
+        'Attributes': [
+            {'Key': 'document_id', 'Value': {'StringValue': doc_id}},
+            {'Key': 'chunk_number', 'Value': {'LongValue': chunk_number}},
+            {'Key': 'source_url', 'Value': {'StringValue': title if title.startswith(('http://', 'https://')) else 'manual-input'}}
+        ]
+    }
+
+def pack_batches(documents, max_documents=KENDRA_BATCH_SIZE, max_bytes=KENDRA_BATCH_MAX_BYTES):
+    """Group documents into batch_put_document calls within Kendra's per-call count and size limits"""
+    batches = []
+    current = []
+    current_bytes = 0
+    for document in documents:
+        size = len(document['Blob'])
+        if current and (len(current) >= max_documents or current_bytes + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(document)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+def put_batch(kendra_client, index_id, batch):
+    """Send one batch, returning (FailedDocuments, timing info)"""
+    started = time.time()
     try:
-        # First try to get document from S3 if it's a URL hash
-        s3_content = None
+        response = kendra_client.batch_put_document(IndexId=index_id, Documents=batch)
+        failed = response.get('FailedDocuments', [])
+    except Exception as e:
+        logger.error(f"Error writing Kendra batch: {str(e)}")
+        failed = [{'Id': document['Id'], 'ErrorMessage': str(e)} for document in batch]
+
+    timing = {
+        'documents': len(batch),
+        'bytes': sum(len(document['Blob']) for document in batch),
+        'failed': len(failed),
+        'seconds': round(time.time() - started, 3)
+    }
+    return failed, timing
+
+def put_documents(documents, index_id, kendra_client=None, max_attempts=PUT_MAX_ATTEMPTS, concurrency=KENDRA_PUT_CONCURRENCY):
+    """Write documents to Kendra in packed batches, running up to `concurrency` batches at once
+    and retrying the entries reported in FailedDocuments.
+
+    Returns (failed, batch_timings) where failed holds the FailedDocuments entries
+    that still failed after max_attempts.
+    """
+    kendra_client = kendra_client or get_client('kendra')
+    pending = list(documents)
+    failed = []
+    timings = []
+
+    for attempt in range(max_attempts):
+        batches = pack_batches(pending)
+        workers = max(1, min(concurrency, len(batches)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda batch: put_batch(kendra_client, index_id, batch), batches))
+
+        failed = []
+        for batch_failed, timing in results:
+            failed.extend(batch_failed)
+            timings.append({**timing, 'attempt': attempt + 1})
+
+        if not failed:
+            return [], timings
+
+        failed_ids = {failure['Id'] for failure in failed}
+        pending = [document for document in pending if document['Id'] in failed_ids]
+        logger.warning(f"{len(failed)} Kendra documents failed, attempt {attempt+1}/{max_attempts}")
+        if attempt + 1 < max_attempts:
+            time.sleep(READINESS_BASE_DELAY * (2 ** attempt) * random.uniform(1.0, 2.0))
+
+    return failed, timings
+
+def index_in_kendra(chunks, doc_id, title, index_id, kendra_client=None, session=None):
+    """Index content chunks in Kendra using packed, concurrent batches.
+
+    The indexed status of URL-based content is written once, after every batch
+    has finished. Returns {'status', 'failed', 'batches'} where batches holds
+    per-batch timing.
+    """
+    documents = [build_kendra_document(chunk, doc_id, i, title) for i, chunk in enumerate(chunks)]
+    started = time.time()
+    failed, timings = put_documents(documents, index_id, kendra_client)
+    status = 'failed' if failed else 'complete'
+
+    logger.info(
+        f"Indexed {len(documents) - len(failed)}/{len(documents)} chunks of {doc_id} "
+        f"in {len(timings)} batches, {time.time() - started:.2f}s total. Batch timings: {timings}"
+    )
+    if failed:
+        logger.error(f"Kendra rejected chunks of {doc_id}: {failed}")
+    invalidate_passages(doc_id)
+
+    # If this is URL-based content, update the indexed status in S3
+    if title.startswith(('http://', 'https://')):
+        update_indexed_status(generate_url_hash(title), status, session=session)
+
+    return {'status': status, 'failed': failed, 'batches': timings}
+
+def get_document_statuses(index_id, document_ids, kendra_client=None):
+    """Return {document_id: status} using batch_get_document_status"""
+    kendra_client = kendra_client or get_client('kendra')
+    statuses = {}
+    for start in range(0, len(document_ids), STATUS_BATCH_SIZE):
+        batch = document_ids[start:start + STATUS_BATCH_SIZE]
+        response = kendra_client.batch_get_document_status(
+            IndexId=index_id,
+            DocumentInfoList=[{'DocumentId': document_id} for document_id in batch]
+        )
+        for status in response.get('DocumentStatusList', []):
+            statuses[status['DocumentId']] = status.get('DocumentStatus')
+        for error in response.get('Errors', []):
+            statuses[error['DocumentId']] = 'FAILED'
+    return statuses
+
+def wait_for_index_ready(index_id, document_ids=None, url_hash=None, wait_budget=KENDRA_WAIT_BUDGET):
+    """Wait until documents are searchable in Kendra, giving up once wait_budget seconds are spent.
+
+    When document_ids are given their status is read from batch_get_document_status,
+    otherwise the indexed_status flag in the S3 metadata for url_hash is used.
+    Polls with jittered, bounded exponential backoff. Returns True if ready.
+    """
+    kendra_client = get_client('kendra') if document_ids else None
+    deadline = time.time() + max(0, wait_budget)
+    attempt = 0
+
+    while True:
         try:
-            s3_content = get_document(doc_id)
+            if document_ids:
+                statuses = get_document_statuses(index_id, document_ids, kendra_client)
+                if any(statuses.get(document_id) in KENDRA_FAILED_STATUSES for document_id in document_ids):
+                    logger.warning(f"Kendra reported failed documents: {statuses}")
+                    return False
+                if all(statuses.get(document_id) in KENDRA_READY_STATUSES for document_id in document_ids):
+                    return True
+            else:
+                metadata = check_document_exists(url_hash) or {}
+                status = metadata.get('indexed_status')
+                if status == 'complete':
+                    return True
+                if status == 'failed':
+                    return False
         except Exception as e:
-            logger.info(f"Document {doc_id} not found in S3, querying Kendra directly")
-        
-        # If we found the document in S3 and it's already indexed in Kendra,
-        # we can use its content directly
-        if s3_content and s3_content.get('cleaned_text'):
-            # Check if this document is already indexed in Kendra
-            try:
-                # Make a test query to see if it exists in Kendra
-                test_response = kendra_client.query(
-                    IndexId=index_id,
-                    QueryText=query_text,
-                    AttributeFilter={
-                        'EqualsTo': {
-                            'Key': 'document_id',
-                            'Value': {'StringValue': doc_id}
-                        }
-                    },
-                    PageSize=1
-                )
-                
-                # If the document is found in Kendra, proceed with normal query
-                if test_response.get('ResultItems'):
-                    pass  # Document exists in Kendra, continue with query below
-                else:
-                    # Document not found in Kendra but exists in S3
-                    # Return the cleaned text from S3 directly
-                    logger.info(f"Document {doc_id} found in S3 but not in Kendra, returning S3 content")
-                    return s3_content.get('cleaned_text')
-            except Exception as e:
-                logger.warning(f"Error checking if document exists in Kendra: {str(e)}")
-                # If we can't check Kendra, return S3 content as fallback
-                return s3_content.get('cleaned_text')
-        
-        # Query Kendra for the main points of the document
-        response = kendra_client.query(
+            logger.warning(f"Error checking Kendra index readiness: {str(e)}")
+
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            logger.info(f"Kendra index not ready within {wait_budget}s budget")
+            return False
+
+        delay = min(READINESS_MAX_DELAY, READINESS_BASE_DELAY * (2 ** attempt))
+        time.sleep(min(remaining, delay * random.uniform(0.5, 1.0)))
+        attempt += 1
+
+def query_kendra(doc_id, index_id, query_text=DEFAULT_KENDRA_QUERY, session=None):
+    """Query Kendra for the most relevant content from the document.
+
+    Makes a single query. Passages are cached per container by (doc_id, query_text),
+    so the default summarize query is shared by every user of a URL. The stored
+    S3 content is only loaded as a fallback; pass the request's DocumentSession
+    to reuse it if it's already loaded.
+    """
+    cache_key = (index_id, doc_id, query_text)
+    cached = _passage_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Using cached Kendra passages for {doc_id}")
+        return cached
+
+    try:
+        response = get_client('kendra').query(
             IndexId=index_id,
             QueryText=query_text,
             AttributeFilter={
@@ -147,7 +238,7 @@ def query_kendra(doc_id, index_id, query_text="What are the main points and key
             },
             PageSize=5  # Retrieve top 5 most relevant chunks
         )
-        
+
         # Extract and combine relevant passages
         passages = []
         for result in response.get('ResultItems', []):
@@ -155,25 +246,28 @@ def query_kendra(doc_id, index_id, query_text="What are the main points and key
                 text = result['DocumentExcerpt']['Text']
                 if text and text not in passages:  # Avoid duplicates
                     passages.append(text)
-        
+
         if passages:
-            return "\n\n".join(passages)
-        elif s3_content and s3_content.get('cleaned_text'):
-            # Fallback to S3 content if Kendra query returned no results
-            return s3_content.get('cleaned_text')
-        else:
-            return None  # No relevant passages found
-            
+            combined = "\n\n".join(passages)
+            _passage_cache.put(cache_key, combined)
+            return combined
+        logger.info(f"Kendra returned no passages for {doc_id}, falling back to S3 content")
     except Exception as e:
         logger.error(f"Error querying Kendra: {str(e)}")
-        
-        # Try to get content from S3 as a fallback
-        try:
-            s3_content = get_document(doc_id)
-            if s3_content and s3_content.get('cleaned_text'):
-                logger.info(f"Returning S3 content as fallback for document {doc_id}")
-                return s3_content.get('cleaned_text')
-        except Exception as s3_error:
-            logger.error(f"Error retrieving S3 fallback: {str(s3_error)}")
-            
-        return None
\ No newline at end of file
+
+    return get_fallback_content(doc_id, session)
+
+def get_fallback_content(doc_id, session=None):
+    """The stored cleaned text of a document, or None"""
+    try:
+        s3_content = get_document(doc_id, session=session)
+        if s3_content and s3_content.get('cleaned_text'):
+            logger.info(f"Returning S3 content as fallback for document {doc_id}")
+            return s3_content.get('cleaned_text')
+    except Exception as e:
+        logger.error(f"Error retrieving S3 fallback: {str(e)}")
+    return None
+
+def invalidate_passages(doc_id):
+    """Forget cached passages for a document, e.g. after it's re-indexed"""
+    _passage_cache.drop_where(lambda key: key[1] == doc_id)
@@ -0,0 +1,87 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from logger import logger
+from job_queue import SQSJobQueue, SQLiteJobQueue
+
+# Long-running worker mode for the transcribe and rekognition containers. The
+# invoker Lambdas enqueue one message per request and a service of warm
+# workers pulls them, keeping up to WORKER_CONCURRENCY jobs in flight with
+# shared clients, instead of paying a Fargate cold start per request. Jobs go
+# through SQS (JOB_QUEUE_URL) or, for local runs and tests, a SQLite queue
+# (JOB_QUEUE_DB, ':memory:' works). A job handler that raises is retried after
+# JOB_RETRY_DELAY seconds; SQS moves it to the DLQ after JOB_MAX_RECEIVES
+# deliveries (the queue's maxReceiveCount), so when the last one fails the
+# worker's fail_job hook records the job as FAILED first. The SQLite queue has
+# no DLQ and keeps retrying.
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL')
+JOB_QUEUE_DB = os.environ.get('JOB_QUEUE_DB')
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', 4))
+JOB_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_VISIBILITY_TIMEOUT', 300))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))
+JOB_MAX_RECEIVES = int(os.environ.get('JOB_MAX_RECEIVES', 3))
+
+def get_job_queue(queue_url=JOB_QUEUE_URL, db_path=JOB_QUEUE_DB):
+    """Return the configured job queue, or None when the container runs a single job"""
+    if queue_url:
+        return SQSJobQueue(queue_url)
+    if db_path:
+        return SQLiteJobQueue(db_path)
+    return None
+
+def finish_job(queue, message, future, retry_delay, fail_job=None, max_receives=JOB_MAX_RECEIVES):
+    receipt, job, attempts = message
+    try:
+        future.result()
+        queue.ack(receipt)
+    except Exception as e:
+        if attempts >= max_receives and fail_job is not None:
+            logger.error(f"Job failed on attempt {attempts}, giving up: {str(e)}", exc_info=True)
+            try:
+                fail_job(job, e)
+            except Exception as fail_error:
+                logger.error(f"Could not record job failure: {str(fail_error)}")
+        else:
+            logger.error(f"Job failed, retrying in {retry_delay}s: {str(e)}", exc_info=True)
+        # On the last attempt SQS dead-letters the message at its next receive
+        queue.nack(receipt, retry_delay)
+
+def run_worker(queue, handle_job, concurrency=WORKER_CONCURRENCY, stop=None, idle_exit=False, retry_delay=JOB_RETRY_DELAY,
+               fail_job=None, max_receives=JOB_MAX_RECEIVES):
+    """Run handle_job(job) for queued jobs until stop is set, or the queue runs dry with idle_exit. Returns attempts made
+
+    fail_job(job, error) is called when a job's last attempt raises.
+    """
+    stop = stop or threading.Event()
+    processed = 0
+    in_flight = {}
+    logger.info(f"Worker started with concurrency {concurrency}")
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while not stop.is_set():
+            free = concurrency - len(in_flight)
+            messages = queue.receive(max_messages=free, visibility_timeout=JOB_VISIBILITY_TIMEOUT) if free else []
+            for message in messages:
+                in_flight[pool.submit(handle_job, message[1])] = message
+
+            if not in_flight:
+                if idle_exit:
+                    break
+                stop.wait(1)
+                continue
+
+            # Go straight back for more work while there are free slots and jobs waiting
+            timeout = 0 if messages and len(in_flight) < concurrency else 1
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                finish_job(queue, in_flight.pop(future), future, retry_delay, fail_job, max_receives)
+                processed += 1
+
+        # Stopping: let jobs already started finish so they aren't redelivered
+        for future in list(in_flight):
+            future.exception()
+            finish_job(queue, in_flight.pop(future), future, retry_delay, fail_job, max_receives)
+            processed += 1
+
+    logger.info(f"Worker stopped after {processed} jobs")
+    return processed
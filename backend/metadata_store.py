@@ -0,0 +1,187 @@
+import decimal
+import json
+import os
+import threading
+from logger import logger
+from aws_clients import get_client, get_resource
+
+# Document metadata (visit_count, last_accessed, indexed_status, ...) lives
+# behind a small store interface. DynamoDB gives atomic counters; the S3 JSON
+# store keeps the original read-modify-write layout for deployments without
+# the table, and the in-memory store is for local runs and tests.
+METADATA_TABLE_NAME = os.environ.get('METADATA_TABLE_NAME')
+S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
+
+def from_dynamodb(item):
+    """Convert DynamoDB Decimals back to int/float"""
+    converted = {}
+    for key, value in item.items():
+        if isinstance(value, decimal.Decimal):
+            value = int(value) if value % 1 == 0 else float(value)
+        converted[key] = value
+    return converted
+
+class MetadataStore:
+    """Interface for document metadata backends"""
+
+    def get(self, url_hash):
+        """Return the metadata dict, or None if the document is unknown"""
+        raise NotImplementedError
+
+    def create(self, url_hash, metadata):
+        """Create metadata if it doesn't exist yet. Returns False if another request created it first"""
+        raise NotImplementedError
+
+    def update(self, url_hash, set_fields=None, increments=None, current=None):
+        """Set fields and add to counters in one write. Returns the new metadata, or None if missing.
+
+        current is the caller's already loaded copy, used by stores that can't update in place.
+        """
+        raise NotImplementedError
+
+class DynamoDBMetadataStore(MetadataStore):
+    """Metadata in DynamoDB, updated atomically with UpdateItem SET/ADD"""
+
+    def __init__(self, table_name=METADATA_TABLE_NAME, dynamodb=None):
+        dynamodb = dynamodb or get_resource('dynamodb')
+        self.table = dynamodb.Table(table_name)
+
+    def get(self, url_hash):
+        response = self.table.get_item(Key={'url_hash': url_hash})
+        item = response.get('Item')
+        return from_dynamodb(item) if item else None
+
+    def create(self, url_hash, metadata):
+        try:
+            self.table.put_item(
+                Item={**metadata, 'url_hash': url_hash},
+                ConditionExpression='attribute_not_exists(url_hash)'
+            )
+            return True
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return False
+
+    def update(self, url_hash, set_fields=None, increments=None, current=None):
+        names = {}
+        values = {}
+        set_parts = []
+        add_parts = []
+        for i, (field, value) in enumerate((set_fields or {}).items()):
+            names[f"#s{i}"] = field
+            values[f":s{i}"] = value
+            set_parts.append(f"#s{i} = :s{i}")
+        for i, (field, amount) in enumerate((increments or {}).items()):
+            names[f"#a{i}"] = field
+            values[f":a{i}"] = amount
+            add_parts.append(f"#a{i} :a{i}")
+        if not set_parts and not add_parts:
+            return current
+
+        expression = ' '.join(
+            part for part in [
+                'SET ' + ', '.join(set_parts) if set_parts else '',
+                'ADD ' + ', '.join(add_parts) if add_parts else ''
+            ] if part
+        )
+        try:
+            response = self.table.update_item(
+                Key={'url_hash': url_hash},
+                UpdateExpression=expression,
+                ConditionExpression='attribute_exists(url_hash)',
+                ExpressionAttributeNames=names,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW'
+            )
+            return from_dynamodb(response.get('Attributes', {}))
+        except self.table.meta.client.exceptions.ConditionalCheckFailedException:
+            return None
+
+class InMemoryMetadataStore(MetadataStore):
+    """Process-local metadata store for tests and local runs"""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, url_hash):
+        with self._lock:
+            item = self._items.get(url_hash)
+            return dict(item) if item else None
+
+    def create(self, url_hash, metadata):
+        with self._lock:
+            if url_hash in self._items:
+                return False
+            self._items[url_hash] = dict(metadata)
+            return True
+
+    def update(self, url_hash, set_fields=None, increments=None, current=None):
+        with self._lock:
+            item = self._items.get(url_hash)
+            if item is None:
+                return None
+            item.update(set_fields or {})
+            for field, amount in (increments or {}).items():
+                item[field] = item.get(field, 0) + amount
+            return dict(item)
+
+class S3MetadataStore(MetadataStore):
+    """Original layout: one JSON object per document under shared/metadata/ (not atomic)"""
+
+    def __init__(self, bucket_name=S3_BUCKET_NAME, s3_client=None):
+        self.bucket_name = bucket_name
+        self.s3 = s3_client or get_client('s3')
+
+    def key(self, url_hash):
+        return f"shared/metadata/{url_hash}-meta.json"
+
+    def get(self, url_hash):
+        if not self.bucket_name:
+            logger.error("S3_BUCKET_NAME environment variable not set")
+            return None
+        try:
+            obj = self.s3.get_object(Bucket=self.bucket_name, Key=self.key(url_hash))
+            return json.loads(obj['Body'].read().decode('utf-8'))
+        except Exception as e:
+            if not any(marker in str(e) for marker in ('NoSuchKey', 'Not Found', '404')):
+                logger.error(f"Error checking document existence: {str(e)}")
+            return None
+
+    def put(self, url_hash, metadata):
+        self.s3.put_object(
+            Bucket=self.bucket_name,
+            Key=self.key(url_hash),
+            Body=json.dumps(metadata),
+            ContentType='application/json'
+        )
+
+    def create(self, url_hash, metadata):
+        self.put(url_hash, metadata)
+        return True
+
+    def update(self, url_hash, set_fields=None, increments=None, current=None):
+        metadata = dict(current) if current is not None else self.get(url_hash)
+        if metadata is None:
+            return None
+        metadata.update(set_fields or {})
+        for field, amount in (increments or {}).items():
+            metadata[field] = metadata.get(field, 0) + amount
+        self.put(url_hash, metadata)
+        return metadata
+
+_store = None
+
+def get_metadata_store():
+    """Return the configured store: DynamoDB when METADATA_TABLE_NAME is set, otherwise S3"""
+    global _store
+    if _store is None:
+        if METADATA_TABLE_NAME:
+            _store = DynamoDBMetadataStore(METADATA_TABLE_NAME)
+        else:
+            _store = S3MetadataStore(S3_BUCKET_NAME)
+    return _store
+
+def set_metadata_store(store):
+    """Swap the store, e.g. for an InMemoryMetadataStore in tests"""
+    global _store
+    _store = store
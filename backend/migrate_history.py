@@ -0,0 +1,68 @@
+import argparse
+import hashlib
+import json
+import boto3
+from logger import logger
+from user_history import build_history_item, SUMMARY_KIND, CHAT_KIND
+
+# One-off migration from the old layout (summaries/chat_history lists on the
+# user-data item) to one history item per entry. Sort key suffixes are derived
+# from the entry contents, so re-running the script overwrites instead of
+# duplicating.
+LIST_ATTRIBUTES = {'summaries': SUMMARY_KIND, 'chat_history': CHAT_KIND}
+
+def entry_suffix(entry):
+    """Stable sort key suffix for a migrated entry"""
+    payload = json.dumps(entry, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:8]
+
+def migrate_user(user_item, history_table):
+    """Copy one user's list attributes into the history table. Returns the number of entries written"""
+    written = 0
+    with history_table.batch_writer(overwrite_by_pkeys=['user_id', 'sk']) as batch:
+        for attribute, kind in LIST_ATTRIBUTES.items():
+            for entry in user_item.get(attribute) or []:
+                batch.put_item(Item=build_history_item(user_item['user_id'], kind, entry, entry_suffix(entry)))
+                written += 1
+    return written
+
+def remove_lists(user_table, user_id):
+    """Drop the migrated list attributes from the user-data item"""
+    user_table.update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='REMOVE summaries, chat_history'
+    )
+
+def migrate(user_table_name, history_table_name, remove=False):
+    """Scan the user table and migrate every user's history"""
+    dynamodb = boto3.resource('dynamodb')
+    user_table = dynamodb.Table(user_table_name)
+    history_table = dynamodb.Table(history_table_name)
+
+    users = entries = 0
+    params = {'ProjectionExpression': 'user_id, summaries, chat_history'}
+    while True:
+        response = user_table.scan(**params)
+        for item in response.get('Items', []):
+            if not any(item.get(attribute) for attribute in LIST_ATTRIBUTES):
+                continue
+            written = migrate_user(item, history_table)
+            if remove:
+                remove_lists(user_table, item['user_id'])
+            users += 1
+            entries += written
+            logger.info(f"Migrated {written} history entries for user {item['user_id']}")
+        if 'LastEvaluatedKey' not in response:
+            break
+        params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    logger.info(f"Migration complete: {entries} entries for {users} users")
+    return users, entries
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate list-based user history to the history table")
+    parser.add_argument('--user-table', default='brevity-cloud-user-data')
+    parser.add_argument('--history-table', default='brevity-cloud-user-history')
+    parser.add_argument('--remove-lists', action='store_true', help="Remove the old list attributes after copying")
+    args = parser.parse_args()
+    migrate(args.user_table, args.history_table, args.remove_lists)
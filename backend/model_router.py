@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+from collections import namedtuple
+from logger import logger
+
+# Picks the Bedrock model for a call from a route table, cheapest route first.
+# A route serves an action ('summarize', 'chat' or 'map' for map-reduce chunk
+# summaries) when the prompt's token estimate is within its max_input_tokens.
+# With a latency SLO the first eligible route expected to meet it wins,
+# otherwise the fastest eligible one. MODEL_ROUTES (a JSON list in the same
+# shape as DEFAULT_ROUTES) replaces the table.
+# The default models support prompt caching and are called through their US
+# cross-region inference profiles; outside the US, set MODEL_ROUTES with the
+# matching profile ids (eu., apac.).
+CHARS_PER_TOKEN = 4
+DEFAULT_MAX_TOKENS = 500 # For a route that lists an action without a max_tokens entry
+DEFAULT_LATENCY_SLO_MS = int(os.environ['DEFAULT_LATENCY_SLO_MS']) if os.environ.get('DEFAULT_LATENCY_SLO_MS') else None
+
+DEFAULT_ROUTES = [
+    {
+        'name': 'fast',
+        'model_id': 'us.anthropic.claude-3-5-haiku-20241022-v1:0',
+        'actions': ['summarize', 'chat', 'map'],
+        'max_input_tokens': 2000,
+        'max_tokens': {'summarize': 400, 'chat': 800, 'map': 200},
+        'expected_latency_ms': 2000
+    },
+    {
+        'name': 'standard',
+        'model_id': 'us.anthropic.claude-3-7-sonnet-20250219-v1:0',
+        'actions': ['summarize', 'chat', 'map'],
+        'max_input_tokens': None,
+        'max_tokens': {'summarize': 500, 'chat': 1000, 'map': 200},
+        'expected_latency_ms': 6000
+    }
+]
+
+# Models that accept Bedrock prompt-cache checkpoints (cache_control on a content block),
+# by base model id so any inference profile of them matches
+PROMPT_CACHE_MODELS = frozenset(filter(None, os.environ.get(
+    'PROMPT_CACHE_MODELS',
+    'anthropic.claude-3-5-haiku-20241022-v1:0,anthropic.claude-3-7-sonnet-20250219-v1:0'
+).split(',')))
+
+Route = namedtuple('Route', ['name', 'model_id', 'actions', 'max_input_tokens', 'max_tokens', 'expected_latency_ms'])
+
+def load_routes(config=None):
+    """Parse the route table from MODEL_ROUTES, falling back to DEFAULT_ROUTES"""
+    if config is None:
+        config = json.loads(os.environ['MODEL_ROUTES']) if os.environ.get('MODEL_ROUTES') else DEFAULT_ROUTES
+    return [Route(**route) for route in config]
+
+ROUTES = load_routes()
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def routes_fingerprint(routes=None):
+    """Short hash of the route table, for cache keys that depend on which models can answer"""
+    routes = ROUTES if routes is None else routes
+    return hashlib.md5(json.dumps([route._asdict() for route in routes], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+def select_route(input_tokens, action, latency_slo_ms=None, routes=None):
+    """Return the Route that should serve a prompt of input_tokens for action"""
+    routes = ROUTES if routes is None else routes
+    serving = [route for route in routes if action in route.actions]
+    if not serving:
+        raise ValueError(f"No model route serves action: {action}")
+
+    candidates = [
+        route for route in serving
+        if route.max_input_tokens is None or input_tokens <= route.max_input_tokens
+    ] or serving[-1:] # Larger than every limit: use the last (largest) route
+
+    latency_slo_ms = latency_slo_ms or DEFAULT_LATENCY_SLO_MS
+    if latency_slo_ms:
+        within_slo = [route for route in candidates if route.expected_latency_ms <= latency_slo_ms]
+        return within_slo[0] if within_slo else min(candidates, key=lambda route: route.expected_latency_ms)
+    return candidates[0]
+
+def supports_prompt_cache(model_id):
+    """True for cache-capable models, called directly or through an inference profile (us., eu., ...)"""
+    return model_id in PROMPT_CACHE_MODELS or model_id.split('.', 1)[-1] in PROMPT_CACHE_MODELS
+
+def max_tokens_for(route, action):
+    return route.max_tokens.get(action, DEFAULT_MAX_TOKENS)
+
+def route_request(prompt, action, invoke, latency_slo_ms=None, routes=None, system=None):
+    """Call invoke(prompt, max_tokens=..., model_id=..., system=...) on the selected route. Returns (result, route)"""
+    input_tokens = estimate_tokens(prompt) + estimate_tokens(system or '')
+    route = select_route(input_tokens, action, latency_slo_ms, routes)
+    logger.info(f"Routing {action} ({input_tokens} tokens) to {route.name} ({route.model_id})")
+    return invoke(prompt, max_tokens=max_tokens_for(route, action), model_id=route.model_id, system=system), route
@@ -3,7 +3,7 @@ $tempDir = "lambda_package"
 New-Item -ItemType Directory -Path $tempDir -Force
 
 # Copy source files
-Copy-Item -Path "summarize.py", "clean_text.py", "logger.py", "kendra_indexing.py", "s3_helper.py" -Destination $tempDir
+Copy-Item -Path "summarize.py", "clean_text.py", "logger.py", "kendra_indexing.py", "s3_helper.py", "lru_cache.py", "summary_cache.py", "ingestion_queue.py", "job_queue.py", "metadata_store.py", "user_history.py", "aws_clients.py", "token_verifier.py", "html_extraction.py", "chunker.py", "vector_index.py", "bm25_index.py", "bedrock_gateway.py", "model_router.py" -Destination $tempDir
 
 # Install dependencies
 pip install -r requirements.txt -t $tempDir
@@ -2,10 +2,13 @@
 
 # Create a temporary directory for packaging
 mkdir -p lambda_package
-cp summarize.py clean_text.py logger.py kendra_indexing.py s3_helper.py lambda_package/ 
+cp summarize.py clean_text.py logger.py kendra_indexing.py s3_helper.py lru_cache.py summary_cache.py ingestion_queue.py job_queue.py metadata_store.py user_history.py aws_clients.py token_verifier.py html_extraction.py chunker.py vector_index.py bm25_index.py bedrock_gateway.py model_router.py lambda_package/ 
 
 # Install dependencies
 pip install boto3 beautifulsoup4 python-jose -t lambda_package/
+# lxml is a C extension, so fetch the wheel built for the Lambda runtime
+pip install lxml --platform manylinux2014_x86_64 --python-version 3.9 --only-binary=:all: -t lambda_package/ || echo "lxml unavailable, extraction will use BeautifulSoup"
+pip install numpy --platform manylinux2014_x86_64 --python-version 3.9 --only-binary=:all: -t lambda_package/ || echo "numpy unavailable, local vector retrieval disabled"
 
 # Create zip file
 cd lambda_package
@@ -3,7 +3,7 @@ $tempDir = "auth_package"
 New-Item -ItemType Directory -Path $tempDir -Force
 
 # Copy source files
-Copy-Item -Path "auth.py" -Destination $tempDir
+Copy-Item -Path "auth.py", "aws_clients.py", "logger.py" -Destination $tempDir
 
 # Install dependencies
 pip install -r requirements_auth.txt -t $tempDir
@@ -2,7 +2,7 @@
 
 # Create a temporary directory for packaging
 mkdir -p auth_package
-cp auth.py auth_package/
+cp auth.py aws_clients.py logger.py auth_package/
 
 # Install dependencies
 pip install boto3 python-jose -t auth_package/
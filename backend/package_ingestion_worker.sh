@@ -0,0 +1,19 @@
+#!/bin/bash
+set -e
+
+# Script to package the Kendra ingestion worker Lambda function
+
+LAMBDA_FUNC_NAME="ingestion_worker"
+OUTPUT_ZIP="../infrastructure/lambda_function_${LAMBDA_FUNC_NAME}.zip"
+
+echo "Removing old zip file if exists..."
+rm -f "$OUTPUT_ZIP"
+
+echo "Creating deployment package for $LAMBDA_FUNC_NAME..."
+
+# Zip the worker and the shared modules it imports
+zip -j "$OUTPUT_ZIP" "${LAMBDA_FUNC_NAME}.py" kendra_indexing.py chunker.py lru_cache.py s3_helper.py metadata_store.py aws_clients.py logger.py
+
+# Add dependencies if any (boto3 is included in Lambda runtime)
+
+echo "Lambda function $LAMBDA_FUNC_NAME packaged successfully: $OUTPUT_ZIP"
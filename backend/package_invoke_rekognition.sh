@@ -11,8 +11,8 @@ rm -f "$OUTPUT_ZIP"
 
 echo "Creating deployment package for $LAMBDA_FUNC_NAME..."
 
-# Zip the lambda handler file
-zip -j "$OUTPUT_ZIP" "${LAMBDA_FUNC_NAME}.py"
+# Zip the handler and the shared modules it imports
+zip -j "$OUTPUT_ZIP" "${LAMBDA_FUNC_NAME}.py" job_status.py aws_clients.py logger.py
 
 # Add dependencies if any (boto3 is included in Lambda runtime, so usually not needed for simple invokers)
 # If you add other dependencies:
@@ -1,27 +1,34 @@
 import json
-import boto3
 import base64
 import os
 import io
 import requests
+import signal
 import sys
+import threading
 from logger import logger
+from aws_clients import get_client
+from job_status import set_job_status, RUNNING, COMPLETED, FAILED
 
 # --- Configuration --- 
 IMAGE_URL_ENV_VAR = 'IMAGE_URL'
 JOB_ID_ENV_VAR = 'JOB_ID' # Passed from invoker Lambda
 S3_BUCKET_ENV_VAR = 'S3_BUCKET' # Bucket for output
 OUTPUT_PREFIX = "rekognition-results"
+# Failures retrying won't fix: the image itself was rejected
+PERMANENT_REKOGNITION_ERRORS = {
+    'InvalidImageFormatException', 'ImageTooLargeException', 'InvalidParameterException', 'InvalidS3ObjectException'
+}
+RETRYABLE_HTTP_STATUSES = {408, 425, 429}
 
-# Initialize AWS clients
-rekognition = boto3.client('rekognition')
-s3 = boto3.client('s3')
+# Shared across jobs so worker mode reuses connections
+http = requests.Session()
 
 def detect_text_from_url(image_url):
     """Downloads image from URL and detects text using Rekognition."""
     try:
         logger.info(f"Fetching image from URL: {image_url}")
-        response = requests.get(image_url, stream=True, timeout=15) # Increased timeout slightly
+        response = http.get(image_url, stream=True, timeout=15) # Increased timeout slightly
         response.raise_for_status() 
 
         content_type = response.headers.get('content-type')
@@ -32,7 +39,7 @@ def detect_text_from_url(image_url):
         image_bytes = response.content
         logger.info(f"Image downloaded successfully, size: {len(image_bytes)} bytes")
 
-        rekognition_response = rekognition.detect_text(Image={'Bytes': image_bytes})
+        rekognition_response = get_client('rekognition').detect_text(Image={'Bytes': image_bytes})
         
         detected_lines = []
         for text_detection in rekognition_response.get('TextDetections', []):
@@ -45,15 +52,59 @@ def detect_text_from_url(image_url):
 
     except requests.exceptions.RequestException as e:
         logger.error(f"Error fetching image from URL {image_url}: {str(e)}", exc_info=True)
-        raise ConnectionError(f"Could not fetch image from URL: {str(e)}")
+        status = getattr(e.response, 'status_code', None)
+        if status and 400 <= status < 500 and status not in RETRYABLE_HTTP_STATUSES:
+            # Missing or forbidden image, fetching it again won't help
+            raise ValueError(f"Could not fetch image from URL: HTTP {status}") from e
+        raise ConnectionError(f"Could not fetch image from URL: {str(e)}") from e
     except ValueError as e:
         raise e 
     except Exception as e:
         logger.error(f"Rekognition error for URL {image_url}: {str(e)}", exc_info=True)
-        raise RuntimeError(f"Failed to detect text using Rekognition: {str(e)}")
+        code = (getattr(e, 'response', None) or {}).get('Error', {}).get('Code')
+        if code in PERMANENT_REKOGNITION_ERRORS:
+            raise ValueError(f"Rekognition rejected the image: {code}") from e
+        raise RuntimeError(f"Failed to detect text using Rekognition: {str(e)}") from e
+
+def save_result(job_id, s3_bucket, detected_text):
+    output_key = f"{OUTPUT_PREFIX}/{job_id}.txt"
+    logger.info(f"Saving detected text to s3://{s3_bucket}/{output_key}")
+    get_client('s3').put_object(
+        Bucket=s3_bucket,
+        Key=output_key,
+        Body=detected_text.encode('utf-8'), # Encode string to bytes
+        ContentType='text/plain'
+    )
+    set_job_status(job_id, COMPLETED, 'rekognition', result_key=output_key)
+
+def process_job(job):
+    """Worker mode: detect text for one queued {'job_id', 'image_url', 'bucket'} job"""
+    set_job_status(job['job_id'], RUNNING, 'rekognition')
+    try:
+        detected_text = detect_text_from_url(job['image_url'])
+    except ValueError as e:
+        # Not an image, missing, or rejected by Rekognition; retrying won't help
+        fail_job(job, e)
+        return
+    save_result(job['job_id'], job['bucket'], detected_text)
+
+def fail_job(job, error):
+    """Worker mode: record a job that failed for good, including before it is dead-lettered"""
+    logger.error(f"Rekognition job {job['job_id']} failed: {str(error)}")
+    set_job_status(job['job_id'], FAILED, 'rekognition', error=str(error))
 
 # --- Main execution block for ECS Task --- 
 if __name__ == "__main__":
+    from media_worker import get_job_queue, run_worker
+
+    queue = get_job_queue()
+    if queue is not None:
+        logger.info("Starting Rekognition worker...")
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set()) # ECS stops tasks with SIGTERM
+        run_worker(queue, process_job, stop=stop, fail_job=fail_job)
+        sys.exit(0)
+
     logger.info("Starting Rekognition ECS Task...")
     
     image_url = os.environ.get(IMAGE_URL_ENV_VAR)
@@ -70,20 +121,13 @@ if __name__ == "__main__":
         sys.exit(1) 
         
     logger.info(f"Processing image URL: {image_url} for Job ID: {job_id}")
-    output_key = f"{OUTPUT_PREFIX}/{job_id}.txt"
     
     try:
         detected_text_result = detect_text_from_url(image_url)
         
         # Save result to S3
         try:
-            logger.info(f"Saving detected text to s3://{s3_bucket}/{output_key}")
-            s3.put_object(
-                Bucket=s3_bucket,
-                Key=output_key,
-                Body=detected_text_result.encode('utf-8'), # Encode string to bytes
-                ContentType='text/plain'
-            )
+            save_result(job_id, s3_bucket, detected_text_result)
             logger.info("Successfully saved result to S3.")
         except Exception as s3_e:
             logger.error(f"Failed to save result to S3: {s3_e}", exc_info=True)
@@ -95,7 +139,7 @@ if __name__ == "__main__":
         
     except (ValueError, ConnectionError, RuntimeError) as e:
         logger.error(f"Rekognition task failed: {str(e)}")
-        # TODO: Optionally write failure status/reason to S3/DynamoDB?
+        set_job_status(job_id, FAILED, 'rekognition', error=str(e))
         sys.exit(1) 
     except Exception as e:
         logger.error(f"An unexpected error occurred: {str(e)}", exc_info=True)
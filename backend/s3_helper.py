@@ -1,13 +1,13 @@
-import boto3
 import hashlib
 import json
 import os
 from urllib.parse import urlparse
 import time
 from logger import logger
+from metadata_store import get_metadata_store
+from aws_clients import get_client
 
 # Initializing S3 client
-s3 = boto3.client('s3')
 S3_BUCKET_NAME = os.environ.get('S3_BUCKET_NAME')
 
 def generate_url_hash(url):
@@ -18,183 +18,336 @@ def generate_url_hash(url):
     # Generate MD5 hash
     return hashlib.md5(normalized_url.encode('utf-8')).hexdigest()
 
-def check_document_exists(url_hash):
-    if not S3_BUCKET_NAME:
-        logger.error("S3_BUCKET_NAME environment variable not set")
-        return None
-        
-    metadata_key = f"shared/metadata/{url_hash}-meta.json"
-    
-    try:
-        # Check if metadata file exists
-        response = s3.head_object(Bucket=S3_BUCKET_NAME, Key=metadata_key)
-        
-        # If it exists, get the metadata file
-        metadata_obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=metadata_key)
-        metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
-        
-        return metadata
-    
-    except Exception as e:
-        if 'Not Found' in str(e) or '404' in str(e):
-            # Document doesn't exist
-            return None
+# Local directory for derived document artifacts (retrieval indexes) when running offline
+DOCUMENT_ARTIFACT_DIR = os.environ.get('DOCUMENT_ARTIFACT_DIR')
+
+CONTENT_REFRESH_SECONDS = 604800  # Refresh stored content older than 7 days
+LAST_ACCESSED_COALESCE_SECONDS = int(os.environ.get('LAST_ACCESSED_COALESCE_SECONDS', 60))
+
+def is_not_found(error):
+    return 'NoSuchKey' in str(error) or 'Not Found' in str(error) or '404' in str(error)
+
+class DocumentSession:
+    """Request-scoped view of one shared document.
+
+    Metadata and content are each read at most once, changes are tracked in
+    memory and flush() writes them back with one content PUT and one
+    metadata update. Visits are sent to the metadata store as an atomic
+    increment rather than a rewritten count.
+    """
+
+    def __init__(self, url_hash, store=None):
+        self.url_hash = url_hash
+        self.content_key = f"shared/websites/{url_hash}.json"
+        self.store = store or get_metadata_store()
+        self._metadata = None
+        self._metadata_loaded = False
+        self._content = None
+        self._content_loaded = False
+        self._dirty_fields = set()
+        self._content_dirty = False
+        self._is_new = False
+        self._visit_recorded = False
+        self._pending_visits = 0
+
+    def get_metadata(self):
+        """Return the metadata dict, or None if the document has never been stored"""
+        if not self._metadata_loaded:
+            self._metadata_loaded = True
+            try:
+                self._metadata = self.store.get(self.url_hash)
+            except Exception as e:
+                logger.error(f"Error checking document existence: {str(e)}")
+                self._metadata = None
+        return self._metadata
+
+    def get_content(self):
+        """Return the stored content dict (url, title, cleaned_text, raw_text), or None"""
+        if not self._content_loaded:
+            self._content_loaded = True
+            if not S3_BUCKET_NAME:
+                logger.error("S3_BUCKET_NAME environment variable not set")
+                return None
+            try:
+                obj = get_client('s3').get_object(Bucket=S3_BUCKET_NAME, Key=self.content_key)
+                self._content = json.loads(obj['Body'].read().decode('utf-8'))
+            except Exception as e:
+                logger.error(f"Error retrieving document from S3: {str(e)}")
+                self._content = None
+        return self._content
+
+    def exists(self):
+        return self.get_metadata() is not None
+
+    def update_metadata(self, **fields):
+        """Change metadata fields in memory, to be written on flush()"""
+        if self.get_metadata() is None:
+            self._metadata = {}
+        self._metadata.update(fields)
+        self._dirty_fields.update(fields)
+
+    def set_content(self, url, title, cleaned_text, raw_text=None):
+        self._content = {
+            'url': url,
+            'title': title,
+            'cleaned_text': cleaned_text,
+            'raw_text': raw_text if raw_text else None
+        }
+        self._content_loaded = True
+        self._content_dirty = True
+
+    def record_visit(self):
+        """Count this request as one visit, no matter how many times it touches the document"""
+        if self._visit_recorded or not self.exists():
+            return
+        self._visit_recorded = True
+        self._pending_visits += 1
+
+        # Coalesce last_accessed writes, hot pages don't need second precision
+        now = int(time.time())
+        if now - self._metadata.get('last_accessed', 0) >= LAST_ACCESSED_COALESCE_SECONDS:
+            self.update_metadata(last_accessed=now)
+
+    def store_content(self, url, title, cleaned_text, raw_text=None):
+        """Create the document, or record a visit and refresh stale content"""
+        now = int(time.time())
+        if self.exists():
+            self.record_visit()
+
+            # Check if content should be refreshed (e.g., if it's older than a week)
+            if now - self._metadata.get('last_updated', 0) > CONTENT_REFRESH_SECONDS:
+                self.set_content(url, title, cleaned_text, raw_text)
+                self.update_metadata(last_updated=now)
+
+                # Content changed underneath any cached summaries, in both tiers
+                from summary_cache import invalidate_summaries
+                invalidate_summaries(self.url_hash)
+
+            logger.info(f"Updated existing document for URL: {url}")
         else:
-            logger.error(f"Error checking document existence: {str(e)}")
-            return None
+            self.set_content(url, title, cleaned_text, raw_text)
+            self.update_metadata(
+                url=url,
+                title=title,
+                last_updated=now,
+                last_accessed=now,
+                visit_count=1,
+                indexed_status='pending'
+            )
+            # create() writes all of it; dirty fields now track changes made after creation
+            self._dirty_fields.clear()
+            self._is_new = True
+            self._visit_recorded = True
+            logger.info(f"Created new document for URL: {url}")
+        return self.url_hash
+
+    def store_passage_index(self):
+        """Build the BM25 passage index once, when content is (re)written"""
+        try:
+            from bm25_index import store_bm25_index
+
+            if self._content.get('cleaned_text'):
+                store_bm25_index(self.url_hash, self._content['cleaned_text'])
+        except Exception as e:
+            logger.warning(f"Error building passage index for {self.url_hash}: {str(e)}")
+
+    def flush(self):
+        """Write dirty content and metadata back. Returns the number of writes made"""
+        writes = 0
+        try:
+            if self._content_dirty and S3_BUCKET_NAME:
+                get_client('s3').put_object(
+                    Bucket=S3_BUCKET_NAME,
+                    Key=self.content_key,
+                    Body=json.dumps(self._content),
+                    ContentType='application/json'
+                )
+                self._content_dirty = False
+                writes += 1
+                self.store_passage_index()
+
+            if self._is_new:
+                if not self.store.create(self.url_hash, self._metadata):
+                    # Another request created it first: count ours as a visit and keep
+                    # the changes made since creation (e.g. indexed_status/queued_at)
+                    fields = {field: self._metadata[field] for field in self._dirty_fields}
+                    fields['last_accessed'] = self._metadata['last_accessed']
+                    self._metadata = self.store.update(
+                        self.url_hash,
+                        set_fields=fields,
+                        increments={'visit_count': 1}
+                    ) or self._metadata
+                self._is_new = False
+                self._dirty_fields.clear()
+                writes += 1
+            elif self._dirty_fields or self._pending_visits:
+                updated = self.store.update(
+                    self.url_hash,
+                    set_fields={field: self._metadata[field] for field in self._dirty_fields},
+                    increments={'visit_count': self._pending_visits} if self._pending_visits else None,
+                    current=self._metadata
+                )
+                if updated is not None:
+                    self._metadata = updated
+                self._dirty_fields.clear()
+                self._pending_visits = 0
+                writes += 1
+        except Exception as e:
+            logger.error(f"Error flushing document {self.url_hash}: {str(e)}")
+        return writes
+
+def check_document_exists(url_hash, session=None):
+    session = session or DocumentSession(url_hash)
+    return session.get_metadata()
         
-def store_document(url, title, cleaned_text, raw_text=None):
+def store_document(url, title, cleaned_text, raw_text=None, session=None):
+    """Store page content. When a session is passed the writes are deferred to session.flush()"""
     if not S3_BUCKET_NAME:
         logger.error("S3_BUCKET_NAME environment variable not set")
         return None
-    
+
     url_hash = generate_url_hash(url)
-    
-    # Define the S3 keys
-    content_key = f"shared/websites/{url_hash}.json"
-    metadata_key = f"shared/metadata/{url_hash}-meta.json"
-    
+    owns_session = session is None
+    session = session or DocumentSession(url_hash)
+
     try:
-        # Check if document already exists
-        existing_metadata = check_document_exists(url_hash)
-        
-        if existing_metadata:
-            # Document exists, update metadata
-            existing_metadata['visit_count'] = existing_metadata.get('visit_count', 0) + 1
-            existing_metadata['last_accessed'] = int(time.time())
-            
-            # Check if content should be refreshed (e.g., if it's older than a week)
-            if int(time.time()) - existing_metadata.get('last_updated', 0) > 604800:  # 7 days in seconds
-                # Update content
-                content_data = {
-                    'url': url,
-                    'title': title,
-                    'cleaned_text': cleaned_text,
-                    'raw_text': raw_text if raw_text else None
-                }
-                
-                s3.put_object(
-                    Bucket=S3_BUCKET_NAME,
-                    Key=content_key,
-                    Body=json.dumps(content_data),
-                    ContentType='application/json'
-                )
-                
-                existing_metadata['last_updated'] = int(time.time())
-                
-            # Update metadata file
-            s3.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=metadata_key,
-                Body=json.dumps(existing_metadata),
-                ContentType='application/json'
-            )
-            
-            logger.info(f"Updated existing document for URL: {url}")
-            return url_hash
-            
-        else:
-            # Document doesn't exist, create new files
-            # Create content file
-            content_data = {
-                'url': url,
-                'title': title,
-                'cleaned_text': cleaned_text,
-                'raw_text': raw_text if raw_text else None
-            }
-            
-            s3.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=content_key,
-                Body=json.dumps(content_data),
-                ContentType='application/json'
-            )
-            
-            # Create metadata file
-            metadata = {
-                'url': url,
-                'title': title,
-                'last_updated': int(time.time()),
-                'last_accessed': int(time.time()),
-                'visit_count': 1,
-                'indexed_status': 'pending'
-            }
-            
-            s3.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=metadata_key,
-                Body=json.dumps(metadata),
-                ContentType='application/json'
-            )
-            
-            logger.info(f"Created new document for URL: {url}")
-            return url_hash
-            
+        session.store_content(url, title, cleaned_text, raw_text)
+        if owns_session:
+            session.flush()
+        return url_hash
     except Exception as e:
         logger.error(f"Error storing document in S3: {str(e)}")
         return None
     
-def get_document(url_hash):
-    if not S3_BUCKET_NAME:
-        logger.error("S3_BUCKET_NAME environment variable not set")
+def get_document(url_hash, session=None):
+    """Get page content and count the access. When a session is passed the metadata write is deferred"""
+    owns_session = session is None
+    session = session or DocumentSession(url_hash)
+
+    content_data = session.get_content()
+    if content_data is None:
         return None
-        
-    content_key = f"shared/websites/{url_hash}.json"
+
+    # Update the metadata to reflect this access
+    session.record_visit()
+    if owns_session:
+        session.flush()
+    return content_data
     
+def update_indexed_status(url_hash, status='complete', session=None):
+    fields = {'indexed_status': status}
+    if status == 'queued':
+        # Lets later requests spot a job that was lost and enqueue it again
+        fields['queued_at'] = int(time.time())
+
+    if session is not None:
+        if not session.exists():
+            logger.error(f"Error updating indexed status for {url_hash}: metadata not found")
+            return False
+        session.update_metadata(**fields)
+        return True
+
+    # Standalone callers (the ingestion worker) write straight to the store
     try:
-        # Get the content file
-        content_obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=content_key)
-        content_data = json.loads(content_obj['Body'].read().decode('utf-8'))
-        
-        # Update the metadata to reflect this access
-        metadata_key = f"shared/metadata/{url_hash}-meta.json"
-        try:
-            metadata_obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=metadata_key)
-            metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
-            
-            metadata['last_accessed'] = int(time.time())
-            metadata['visit_count'] = metadata.get('visit_count', 0) + 1
-            
-            s3.put_object(
-                Bucket=S3_BUCKET_NAME,
-                Key=metadata_key,
-                Body=json.dumps(metadata),
-                ContentType='application/json'
-            )
-        except Exception as e:
-            logger.warning(f"Could not update metadata for {url_hash}: {str(e)}")
-        
-        return content_data
-        
+        if get_metadata_store().update(url_hash, set_fields=fields) is None:
+            logger.error(f"Error updating indexed status for {url_hash}: metadata not found")
+            return False
+        return True
     except Exception as e:
-        logger.error(f"Error retrieving document from S3: {str(e)}")
+        logger.error(f"Error updating indexed status for {url_hash}: {str(e)}")
+        return False
+
+def get_document_content(url_hash):
+    """Read the stored page content without counting it as a visit"""
+    return DocumentSession(url_hash).get_content()
+
+def get_summary_cache_key(url_hash, cache_key):
+    return f"shared/summaries/{url_hash}/{cache_key}.json"
+
+def read_cached_summary(url_hash, cache_key):
+    if not S3_BUCKET_NAME:
         return None
-    
-def update_indexed_status(url_hash, status='complete'):
+
+    try:
+        obj = get_client('s3').get_object(Bucket=S3_BUCKET_NAME, Key=get_summary_cache_key(url_hash, cache_key))
+        return json.loads(obj['Body'].read().decode('utf-8'))
+    except Exception as e:
+        if not is_not_found(e):
+            logger.warning(f"Error reading cached summary for {url_hash}: {str(e)}")
+        return None
+
+def write_cached_summary(url_hash, cache_key, entry):
     if not S3_BUCKET_NAME:
-        logger.error("S3_BUCKET_NAME environment variable not set")
         return False
-        
-    metadata_key = f"shared/metadata/{url_hash}-meta.json"
-    
+
     try:
-        # Get the current metadata
-        metadata_obj = s3.get_object(Bucket=S3_BUCKET_NAME, Key=metadata_key)
-        metadata = json.loads(metadata_obj['Body'].read().decode('utf-8'))
-        
-        # Update the indexed status
-        metadata['indexed_status'] = status
-        
-        # Write back the updated metadata
-        s3.put_object(
+        get_client('s3').put_object(
             Bucket=S3_BUCKET_NAME,
-            Key=metadata_key,
-            Body=json.dumps(metadata),
+            Key=get_summary_cache_key(url_hash, cache_key),
+            Body=json.dumps(entry),
             ContentType='application/json'
         )
-        
         return True
-        
     except Exception as e:
-        logger.error(f"Error updating indexed status for {url_hash}: {str(e)}")
-        return False
\ No newline at end of file
+        logger.warning(f"Error writing cached summary for {url_hash}: {str(e)}")
+        return False
+
+def delete_cached_summaries(url_hash):
+    """Remove every cached summary stored for a document"""
+    if not S3_BUCKET_NAME:
+        return False
+
+    prefix = f"shared/summaries/{url_hash}/"
+    try:
+        response = get_client('s3').list_objects_v2(Bucket=S3_BUCKET_NAME, Prefix=prefix)
+        keys = [{'Key': obj['Key']} for obj in response.get('Contents', [])]
+        if keys:
+            get_client('s3').delete_objects(Bucket=S3_BUCKET_NAME, Delete={'Objects': keys, 'Quiet': True})
+            logger.info(f"Invalidated {len(keys)} cached summaries for {url_hash}")
+        return True
+    except Exception as e:
+        logger.warning(f"Error invalidating cached summaries for {url_hash}: {str(e)}")
+        return False
+
+def get_document_artifact_key(url_hash, suffix):
+    """Derived files live next to the document, e.g. shared/websites/{hash}.vectors.npy"""
+    return f"shared/websites/{url_hash}{suffix}"
+
+def read_document_artifact(url_hash, suffix):
+    """Return the artifact's bytes, or None if it doesn't exist"""
+    key = get_document_artifact_key(url_hash, suffix)
+    if DOCUMENT_ARTIFACT_DIR:
+        path = os.path.join(DOCUMENT_ARTIFACT_DIR, key)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+    if not S3_BUCKET_NAME:
+        return None
+
+    try:
+        obj = get_client('s3').get_object(Bucket=S3_BUCKET_NAME, Key=key)
+        return obj['Body'].read()
+    except Exception as e:
+        if not is_not_found(e):
+            logger.warning(f"Error reading {key}: {str(e)}")
+        return None
+
+def write_document_artifact(url_hash, suffix, body, content_type='application/octet-stream'):
+    """Store an artifact next to the document. Returns True on success"""
+    key = get_document_artifact_key(url_hash, suffix)
+    try:
+        if DOCUMENT_ARTIFACT_DIR:
+            path = os.path.join(DOCUMENT_ARTIFACT_DIR, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(body)
+            return True
+        if not S3_BUCKET_NAME:
+            return False
+
+        get_client('s3').put_object(Bucket=S3_BUCKET_NAME, Key=key, Body=body, ContentType=content_type)
+        return True
+    except Exception as e:
+        logger.warning(f"Error writing {key}: {str(e)}")
+        return False
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import threading
+from logger import logger
+
+# Streaming speech recognizers for transcribe_stream.py. A recognizer turns an
+# async iterator of 16-bit little-endian mono PCM chunks into transcript
+# events, {'type': 'partial' | 'final', 'text': ...}, yielded as soon as the
+# backend produces them. STREAM_RECOGNIZER picks the backend: 'amazon'
+# (Amazon Transcribe streaming) or 'fake', which replays canned transcripts
+# for local runs and tests.
+STREAM_RECOGNIZER = os.environ.get('STREAM_RECOGNIZER', 'amazon')
+STREAM_LANGUAGE_CODE = os.environ.get('STREAM_LANGUAGE_CODE', 'en-US')
+FAKE_TRANSCRIPTS_FILE = os.environ.get('FAKE_TRANSCRIPTS_FILE') # JSON list of transcripts
+FAKE_CHUNKS_PER_WORD = int(os.environ.get('FAKE_CHUNKS_PER_WORD', 2))
+
+DEFAULT_FAKE_TRANSCRIPTS = [
+    "What is this page about?",
+    "Summarize the main points in three bullets.",
+    "Who is the author of this article?"
+]
+
+class FakeRecognizer:
+    """Replays canned transcripts, one per stream, revealing a word every few audio chunks"""
+
+    def __init__(self, transcripts=None, chunks_per_word=FAKE_CHUNKS_PER_WORD):
+        if transcripts is None and FAKE_TRANSCRIPTS_FILE:
+            with open(FAKE_TRANSCRIPTS_FILE) as f:
+                transcripts = json.load(f)
+        self.transcripts = transcripts or DEFAULT_FAKE_TRANSCRIPTS
+        self.chunks_per_word = max(1, chunks_per_word)
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next_transcript(self):
+        with self._lock:
+            transcript = self.transcripts[self._next % len(self.transcripts)]
+            self._next += 1
+        return transcript
+
+    async def recognize(self, audio, sample_rate, language_code=STREAM_LANGUAGE_CODE):
+        words = self.next_transcript().split()
+        chunks = 0
+        revealed = 0
+        async for _ in audio:
+            chunks += 1
+            shown = min(len(words), chunks // self.chunks_per_word)
+            if shown > revealed:
+                revealed = shown
+                yield {'type': 'partial', 'text': ' '.join(words[:shown])}
+        if chunks:
+            yield {'type': 'final', 'text': ' '.join(words)}
+
+class AmazonTranscribeRecognizer:
+    """Amazon Transcribe streaming over HTTP/2 (amazon-transcribe SDK)"""
+
+    def __init__(self, region=None):
+        self.region = region or os.environ.get('AWS_REGION', 'us-east-1')
+
+    async def recognize(self, audio, sample_rate, language_code=STREAM_LANGUAGE_CODE):
+        # Imported lazily: only the streaming service image installs the SDK
+        from amazon_transcribe.client import TranscribeStreamingClient
+        from amazon_transcribe.model import TranscriptEvent
+
+        client = TranscribeStreamingClient(region=self.region)
+        stream = await client.start_stream_transcription(
+            language_code=language_code,
+            media_sample_rate_hz=sample_rate,
+            media_encoding='pcm'
+        )
+
+        async def send_audio():
+            async for chunk in audio:
+                await stream.input_stream.send_audio_event(audio_chunk=chunk)
+            await stream.input_stream.end_stream()
+
+        sender = asyncio.ensure_future(send_audio())
+        try:
+            async for event in stream.output_stream:
+                if not isinstance(event, TranscriptEvent):
+                    continue
+                for result in event.transcript.results:
+                    if not result.alternatives:
+                        continue
+                    yield {
+                        'type': 'partial' if result.is_partial else 'final',
+                        'text': result.alternatives[0].transcript
+                    }
+            await sender
+        finally:
+            if not sender.done():
+                sender.cancel()
+
+RECOGNIZERS = {
+    'amazon': AmazonTranscribeRecognizer,
+    'fake': FakeRecognizer
+}
+
+def get_recognizer(name=STREAM_RECOGNIZER):
+    """Build the configured recognizer backend"""
+    try:
+        recognizer_class = RECOGNIZERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown STREAM_RECOGNIZER: {name}")
+    logger.info(f"Using {name} streaming recognizer")
+    return recognizer_class()
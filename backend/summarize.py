@@ -1,30 +1,102 @@
 import json
-import boto3
 import os
 import time
 import re
 import decimal
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 from clean_text import clean_text, extract_main_content
+from chunker import iter_chunks
+from vector_index import retrieve_passages
+from bm25_index import select_passages
 from logger import logger
-from kendra_indexing import generate_document_id, split_into_chunks, index_in_kendra, query_kendra
-from s3_helper import generate_url_hash, check_document_exists, store_document, get_document
-
-# Initialize AWS clients
-cognito_idp = boto3.client('cognito-idp')
-dynamodb = boto3.resource('dynamodb')
-bedrock_runtime = boto3.client(
-    service_name='bedrock-runtime',
-    region_name=os.environ.get('AWS_REGION', 'us-east-1')
+from kendra_indexing import (
+    generate_document_id, split_into_chunks, index_in_kendra, query_kendra,
+    chunk_document_id, wait_for_index_ready, KENDRA_WAIT_BUDGET, KendraUnavailable
 )
+from s3_helper import generate_url_hash, store_document, get_document, update_indexed_status, DocumentSession
+from ingestion_queue import enqueue_ingestion, get_ingestion_queue, is_queued
+from summary_cache import make_cache_key, get_cached_summary, put_cached_summary
+from user_history import add_history_entry, query_history, SUMMARY_KIND, CHAT_KIND, HISTORY_KINDS
+from aws_clients import get_client
+from bedrock_gateway import get_bedrock_gateway, log_bedrock_metrics, BedrockUnavailable, BEDROCK_CONCURRENCY
+from model_router import route_request, select_route, max_tokens_for, routes_fingerprint, supports_prompt_cache
+from token_verifier import get_token_verifier, user_from_claims, TokenInvalid, VerificationUnavailable
 
 # Constants
+# Default model and response length; summarize/chat calls pick theirs from model_router's route table
 BEDROCK_MODEL = 'anthropic.claude-3-sonnet-20240229-v1:0'
 MAX_TOKENS = 500
 TEMPERATURE = 0.7
+CHAT_ERROR_MESSAGE = "I apologize, but I'm having trouble generating a response. Please try again."
+
+# Bump SUMMARY_PROMPT_VERSION whenever the template changes so cached summaries
+# produced by the old prompt are no longer served
+SUMMARY_PROMPT_VERSION = 'v2'
+SUMMARY_PROMPT_TEMPLATE = """Please provide a concise summary of the following text in 3-5 sentences, focusing on the main points:
+
+{text}
+
+Please provide a clear, well-structured summary that captures the essential information in 3-5 sentences."""
+
+# Long pages are summarized map-reduce style: every chunk is summarized
+# concurrently, then the partial summaries are reduced into the final one.
+# Map chunks are sized so their prompts stay on the fast route. Up to
+# SUMMARY_MAP_CONCURRENCY calls run at once, and only as many chunks go to
+# Bedrock as the gateway can admit before the SUMMARY_MAP_BUDGET deadline;
+# the rest, and calls that haven't come back by then, are summarized
+# extractively. Such a degraded summary is served but never cached.
+CHARS_PER_TOKEN = 4
+MAX_PROMPT_TOKENS = int(os.environ.get('MAX_PROMPT_TOKENS', 2700))  # Roughly the old 2000 word cap
+SUMMARY_CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 2000))
+SUMMARY_MAP_CONCURRENCY = int(os.environ.get('SUMMARY_MAP_CONCURRENCY', BEDROCK_CONCURRENCY))
+SUMMARY_MAP_BUDGET = float(os.environ.get('SUMMARY_MAP_BUDGET', 10)) # Seconds, leaves the final call room under API Gateway's 30s
+SUMMARY_MAP_MAX_TOKENS = 200
+MAX_REDUCE_LEVELS = 3
+CHAT_PROMPT_OVERHEAD_TOKENS = 100 # Chat prompt template around the context and question
+CHAT_QUESTION_TOKENS = 400 # Longer questions are truncated
+CHAT_CONTEXT_TOKENS = MAX_PROMPT_TOKENS - CHAT_PROMPT_OVERHEAD_TOKENS - CHAT_QUESTION_TOKENS
+
+# Chat prompts are split so everything that stays the same across turns on a
+# page (instructions and context) is a system prefix, and only the question
+# changes. Models that support it get a prompt-cache checkpoint on the prefix.
+# The context gets a fixed CHAT_CONTEXT_TOKENS budget whatever the question's
+# length, so the same page context always gives the same prefix and later
+# turns read it from Bedrock's cache. Passages picked for the question
+# (Kendra, vector or BM25) differ per turn and are simply not cache hits.
+CHAT_SYSTEM_TEMPLATE = """You are an AI assistant helping with questions about a webpage. Use the following context to answer the user's question. Only use information from the provided context.
+
+Context:
+{context}"""
+
+CHAT_QUESTION_TEMPLATE = """User Question:
+{query}
+
+Please provide a clear and concise answer based solely on the context provided."""
+
+MAP_PROMPT_TEMPLATE = """The following is one section of a longer document. Summarize this section in 2-3 sentences, keeping the key facts, names and figures:
+
+{text}"""
+
+REDUCE_PROMPT_TEMPLATE = """The following are summaries of consecutive sections of a single document. Combine them into a concise summary of the whole document in 3-5 sentences, focusing on the main points:
+
+{text}
+
+Please provide a clear, well-structured summary that captures the essential information in 3-5 sentences."""
+
+MAP_PROMPT_OVERHEAD_TOKENS = (len(MAP_PROMPT_TEMPLATE.format(text='')) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+# Partial summaries are only mapped again if they don't fit the final reduce call
+REDUCE_INPUT_TOKENS = MAX_PROMPT_TOKENS - (len(REDUCE_PROMPT_TEMPLATE.format(text='')) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
 
-USER_TABLE_NAME = os.environ.get('USER_TABLE_NAME', 'brevity-cloud-user-data')
-user_table = dynamodb.Table(USER_TABLE_NAME)
 MAX_HISTORY_ITEMS = 5 # Max number of summaries/chats to return
+BEDROCK_TIME_RESERVE = 20 # Seconds of the invocation kept free for Bedrock after waiting on Kendra
+
+class BadRequest(ValueError):
+    """Missing or invalid request input, answered with 400"""
+
+class Unauthorized(Exception):
+    """Missing, invalid or expired credentials, answered with 401"""
 
 # Helper class to convert DynamoDB Decimal to JSON serializable type (int/float)
 class DecimalEncoder(json.JSONEncoder):
@@ -38,12 +110,19 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(o)
 
 def verify_token(token):
-    """Verify JWT token with Cognito."""
+    """Verify JWT token locally against the Cognito JWKS, falling back to get_user."""
+    if token.startswith('Bearer '):
+        token = token.split(' ')[1]
     try:
+        return user_from_claims(get_token_verifier().verify(token))
+    except TokenInvalid as e:
+        logger.error(f"Token verification error: {str(e)}")
+        return None
+    except VerificationUnavailable as e:
+        logger.warning(f"Local token verification unavailable, using get_user: {str(e)}")
 
-        if token.startswith('Bearer '):
-            token = token.split(' ')[1]
-        response = cognito_idp.get_user(AccessToken=token)
+    try:
+        response = get_client('cognito-idp').get_user(AccessToken=token)
         user_attributes = {attr['Name']: attr['Value'] for attr in response.get('UserAttributes', [])}
         return {
             'user_id': response.get('Username'),
@@ -54,277 +133,598 @@ def verify_token(token):
         logger.error(f"Token verification error: {str(e)}")
         return None
 
-def call_bedrock(prompt, max_tokens=MAX_TOKENS, temperature=TEMPERATURE):
-    """Make a call to Bedrock's Claude model"""
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) that never re-splits the text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def build_bedrock_body(prompt, max_tokens, temperature, system=None, cache_system=False):
+    """Build the Claude 3 messages request body, truncating very long prompts.
+
+    system is sent as is; callers keep it within their own budget so a cached
+    prefix doesn't change with the prompt.
+    """
+    max_chars = MAX_PROMPT_TOKENS * CHARS_PER_TOKEN
+    if len(prompt) > max_chars:
+        prompt = prompt[:max_chars]
+
+    body = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "messages": [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    }
+    if system:
+        block = {"type": "text", "text": system}
+        if cache_system:
+            block["cache_control"] = {"type": "ephemeral"}
+        body["system"] = [block]
+    return json.dumps(body)
+
+def log_cache_usage(usage, model_id):
+    """Log prompt-cache reads/writes reported by Bedrock, if any"""
+    if usage and (usage.get('cache_read_input_tokens') or usage.get('cache_creation_input_tokens')):
+        logger.info(f"Prompt cache on {model_id}: read {usage.get('cache_read_input_tokens', 0)}, "
+                    f"written {usage.get('cache_creation_input_tokens', 0)}, uncached {usage.get('input_tokens', 0)} tokens")
+
+def call_bedrock(prompt, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, model_id=BEDROCK_MODEL, system=None, deadline=None):
+    """Make a call to Bedrock's Claude model, giving up at deadline (time.time()) if one is set"""
     try:
-        if len(prompt.split()) > 2000:
-            prompt = " ".join(prompt.split()[:2000])
-            
-        response = bedrock_runtime.invoke_model(
-            modelId=BEDROCK_MODEL,
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": max_tokens,
-                "temperature": temperature,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
+        response_body = get_bedrock_gateway().invoke(
+            model_id,
+            build_bedrock_body(prompt, max_tokens, temperature, system, supports_prompt_cache(model_id)),
+            estimate_tokens(prompt) + estimate_tokens(system or '') + max_tokens,
+            deadline
         )
-        response_body = json.loads(response.get('body').read())
+        log_cache_usage(response_body.get('usage'), model_id)
 
-        
         # Handle Claude 3 response format
         if isinstance(response_body.get('content'), list):
             for content in response_body.get('content', []):
                 if content.get('type') == 'text':
                     return content.get('text', '').strip()
         return ''
+    except BedrockUnavailable as e:
+        # Expected backpressure, the caller falls back
+        logger.warning(f"Bedrock unavailable: {str(e)}")
+        return None
     except Exception as e:
         logger.error(f"Bedrock API error: {str(e)}", exc_info=True)
         return None
 
-def handle_summarize(cleaned_text, title, url, kendra_index_id=None, use_kendra=True):
+def call_bedrock_stream(prompt, max_tokens=MAX_TOKENS, temperature=TEMPERATURE, model_id=BEDROCK_MODEL, system=None):
+    """Stream a completion from Bedrock's Claude model, yielding text deltas as they arrive"""
+    response = get_bedrock_gateway().invoke_stream(
+        model_id,
+        build_bedrock_body(prompt, max_tokens, temperature, system, supports_prompt_cache(model_id)),
+        estimate_tokens(prompt) + estimate_tokens(system or '') + max_tokens
+    )
+
+    for event in response.get('body'):
+        chunk = event.get('chunk')
+        if not chunk:
+            continue
+        payload = json.loads(chunk.get('bytes'))
+        if payload.get('type') == 'message_start':
+            log_cache_usage(payload.get('message', {}).get('usage'), model_id)
+        # Claude 3 streams content_block_delta events carrying the text
+        if payload.get('type') == 'content_block_delta':
+            text = payload.get('delta', {}).get('text')
+            if text:
+                yield text
+
+def call_bedrock_routed(prompt, action, latency_slo_ms=None, system=None):
+    """call_bedrock on the model route selected for this prompt. Returns (text, route name)"""
+    text, route = route_request(prompt, action, call_bedrock, latency_slo_ms, system=system)
+    return text, route.name
+
+def open_routed_stream(prompt, action, latency_slo_ms=None, system=None):
+    """call_bedrock_stream on the model route selected for this prompt. Returns (deltas, route name)"""
+    input_tokens = estimate_tokens(prompt) + estimate_tokens(system or '')
+    route = select_route(input_tokens, action, latency_slo_ms)
+    logger.info(f"Routing streamed {action} ({input_tokens} tokens) to {route.name} ({route.model_id})")
+    deltas = call_bedrock_stream(prompt, max_tokens=max_tokens_for(route, action), model_id=route.model_id, system=system)
+    return deltas, route.name
+
+def extractive_summary(text):
+    """Crude fallback summary used when Bedrock is unavailable"""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return ' '.join(sentences[:min(5, len(sentences) // 3)])
+
+def map_chunk_tokens():
+    """Largest chunk whose map prompt still fits the route a short map call goes to"""
+    limit = select_route(0, 'map').max_input_tokens
+    if limit is None:
+        return SUMMARY_CHUNK_TOKENS
+    return max(1, min(SUMMARY_CHUNK_TOKENS, limit - MAP_PROMPT_OVERHEAD_TOKENS))
+
+def split_for_summary(text, chunk_tokens=SUMMARY_CHUNK_TOKENS):
+    """Cut text into chunks that each fit the per-call token budget"""
+    return [chunk.text for chunk in iter_chunks(text, max_tokens=chunk_tokens, chars_per_token=CHARS_PER_TOKEN)]
+
+def summarize_chunks(chunks, concurrency=SUMMARY_MAP_CONCURRENCY, deadline=None):
+    """Map step: summarize chunks with a bounded pool of concurrent Bedrock calls
+
+    Only as many chunks as the gateway can admit before the deadline are sent;
+    those, and calls still running at the deadline, get extractive summaries.
+    Returns (summaries, number of chunks that fell back).
+    """
+    deadline = deadline or time.time() + SUMMARY_MAP_BUDGET
+    prompts = [MAP_PROMPT_TEMPLATE.format(text=chunk) for chunk in chunks]
+    call_tokens = max(estimate_tokens(prompt) for prompt in prompts) + SUMMARY_MAP_MAX_TOKENS
+    max_calls = min(len(prompts), get_bedrock_gateway().capacity(call_tokens, max(0, deadline - time.time())))
+    if len(prompts) > max_calls:
+        logger.info(f"Gateway capacity allows {max_calls} of {len(prompts)} map calls, summarizing the rest extractively")
+
+    results = [None] * len(prompts)
+    if max_calls:
+        # Calls not yet started when the deadline passes don't start at all, and
+        # the gateway stops running ones from taking capacity after it
+        stop = threading.Event()
+        invoke = partial(call_bedrock, deadline=deadline)
+        summarize_one = lambda prompt: None if stop.is_set() else route_request(prompt, 'map', invoke)[0]
+        pool = ThreadPoolExecutor(max_workers=min(concurrency, max_calls))
+        try:
+            futures = {pool.submit(summarize_one, prompt): i for i, prompt in enumerate(prompts[:max_calls])}
+            done, pending = wait(futures, timeout=max(0, deadline - time.time()))
+            for future in done:
+                results[futures[future]] = future.result()
+            if pending:
+                logger.warning(f"{len(pending)} map calls missed the summary deadline, using extractive summaries")
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # Keep failed chunks represented so the reduce step still covers the whole page
+    fallback_chars = SUMMARY_MAP_MAX_TOKENS * CHARS_PER_TOKEN
+    fallbacks = sum(1 for result in results if not result)
+    for _ in range(fallbacks):
+        get_bedrock_gateway().record_fallback('summary map chunk')
+    summaries = [
+        result or (extractive_summary(chunk) or chunk)[:fallback_chars]
+        for result, chunk in zip(results, chunks)
+    ]
+    return summaries, fallbacks
+
+def build_summary_prompt(text, concurrency=SUMMARY_MAP_CONCURRENCY, deadline=None):
+    """Build the final summary prompt, map-reducing text that exceeds the per-call budget
+
+    Returns (prompt, degraded), degraded when any chunk was summarized extractively.
+    """
+    deadline = deadline or time.time() + SUMMARY_MAP_BUDGET
+    level = 0
+    limit = SUMMARY_CHUNK_TOKENS
+    degraded = False
+    while estimate_tokens(text) > limit and level < MAX_REDUCE_LEVELS:
+        if level and time.time() >= deadline:
+            logger.warning(f"Summary deadline reached after {level} map-reduce levels, reducing what there is")
+            break
+        chunks = split_for_summary(text, map_chunk_tokens())
+        logger.info(f"Map-reduce level {level + 1}: summarizing {len(chunks)} chunks")
+        summaries, fallbacks = summarize_chunks(chunks, concurrency, deadline)
+        text = "\n\n".join(summaries)
+        degraded = degraded or fallbacks > 0
+        level += 1
+        limit = REDUCE_INPUT_TOKENS
+
+    if level == 0:
+        return SUMMARY_PROMPT_TEMPLATE.format(text=text), degraded
+    return REDUCE_PROMPT_TEMPLATE.format(text=text), degraded
+
+def prepare_summarize(cleaned_text, title, url, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET):
+    """Store the page and resolve the text to summarize.
+
+    Returns a dict with either a cached 'summary' or the 'prompt' to send to
+    Bedrock along with the 'fallback_text' for extractive summarization.
+    If a new document is not searchable in Kendra within wait_budget seconds
+    the cleaned text is summarized directly instead.
+    """
+    url_hash = generate_url_hash(url)
+    session = DocumentSession(url_hash)
     try:
-        url_hash = generate_url_hash(url)
-        existing_doc = check_document_exists(url_hash)
-        
-        store_document(url, title, cleaned_text)
-        
-        kendra_text = None
-        kendra_used = False
-        
-        if kendra_index_id and use_kendra:
-            logger.info(f"Using Kendra")
-            try:
-                doc_id = url_hash
-                
-                if not existing_doc or existing_doc.get('indexed_status') != 'complete':
-                    chunks = split_into_chunks(cleaned_text)
-                    index_responses = index_in_kendra(chunks, doc_id, url, kendra_index_id)
-                    
-                    logger.info("Waiting for Kendra indexing to complete...")
-                    
-                    max_retries = 5
-                    base_wait_time = 5  # Start with 5 seconds
-                    for retry in range(max_retries):
-                        # Wait with exponential backoff
-                        wait_time = base_wait_time * (2 ** retry)
-                        time.sleep(wait_time)
-                        
-                        try:
-                            test_query = query_kendra(doc_id, kendra_index_id)
-                            if test_query:
-                                logger.info(f"Kendra indexing complete after {wait_time} seconds")
-                                break
-                            else:
-                                logger.info(f"Kendra indexing still in progress, retry {retry+1}/{max_retries}")
-                        except Exception as e:
-                            logger.warning(f"Error checking Kendra indexing status: {str(e)}")
-                
-                kendra_text = query_kendra(doc_id, kendra_index_id)
-                
-                if kendra_text:
-                    kendra_used = True
+        return resolve_summarize(session, cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget)
+    finally:
+        # At most one content and one metadata write per request
+        session.flush()
+
+def resolve_summarize(session, cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget):
+    url_hash = session.url_hash
+    existing_doc = session.get_metadata()
+    
+    store_document(url, title, cleaned_text, session=session)
+
+    # Identical page content already summarized (possibly by another user). The
+    # route isn't known until the prompt is built, so the key covers the route table
+    cache_key = make_cache_key(
+        url_hash, cleaned_text, routes_fingerprint(), SUMMARY_PROMPT_VERSION,
+        MAX_TOKENS, TEMPERATURE, variant='kendra' if use_kendra else 'bedrock'
+    )
+    cached = get_cached_summary(url_hash, cache_key)
+    if cached:
+        return {'summary': cached['summary'], 'used_kendra': cached['used_kendra']}
+    
+    kendra_text = None
+    kendra_used = False
+    kendra_ready = True
+    
+    if kendra_index_id and use_kendra:
+        logger.info(f"Using Kendra")
+        try:
+            doc_id = url_hash
+            
+            if not existing_doc or existing_doc.get('indexed_status') != 'complete':
+                chunks = split_into_chunks(cleaned_text)
+                queue = get_ingestion_queue()
+                if is_queued(existing_doc):
+                    logger.info(f"Kendra ingestion of {doc_id} already queued")
+                elif queue is not None:
+                    if existing_doc and existing_doc.get('indexed_status') == 'queued':
+                        logger.warning(f"Kendra ingestion of {doc_id} queued too long ago, enqueueing it again")
+                    # Metadata has to be in S3 before the worker records its status
+                    update_indexed_status(doc_id, 'queued', session=session)
+                    session.flush()
+                    try:
+                        enqueue_ingestion(doc_id, url, title, chunks, queue=queue)
+                    except Exception:
+                        update_indexed_status(doc_id, 'failed', session=session)
+                        raise
                 else:
-                    logger.warning("Kendra indexing appears to be incomplete. No results returned.")
-                    
-                    if use_kendra:
-                        raise ValueError("Kendra indexing requested but no results available")
+                    # No background queue configured, index inline
+                    index_responses = index_in_kendra(chunks, doc_id, url, kendra_index_id, session=session)
+                
+                logger.info(f"Waiting up to {wait_budget}s for Kendra indexing to complete...")
+                started = time.time()
+                document_ids = [chunk_document_id(doc_id, i) for i in range(len(chunks))]
+                kendra_ready = wait_for_index_ready(kendra_index_id, document_ids=document_ids, wait_budget=wait_budget)
+                logger.info(f"Kendra ready={kendra_ready} after {time.time() - started:.2f} seconds")
+            
+            if kendra_ready:
+                kendra_text = query_kendra(doc_id, kendra_index_id, session=session)
             
-            except Exception as e:
-                logger.error(f"Kendra processing error: {str(e)}", exc_info=True)
+            if kendra_text:
+                kendra_used = True
+            elif kendra_ready:
+                logger.warning("Kendra indexing appears to be incomplete. No results returned.")
                 
                 if use_kendra:
-                    raise ValueError(f"Kendra processing failed: {str(e)}")
-
-        summarization_text = kendra_text if kendra_text else cleaned_text
+                    raise KendraUnavailable("Kendra indexing requested but no results available")
+            else:
+                logger.info("Kendra wait budget exhausted, summarizing from cleaned text")
         
-        if not kendra_used and not use_kendra:
-            # Create summarization prompt for Bedrock
-            logger.info(f"Using Bedrock")
-            prompt = f"""Please provide a concise summary of the following text in 3-5 sentences, focusing on the main points:
-
-{summarization_text}
-
-Please provide a clear, well-structured summary that captures the essential information in 3-5 sentences."""
-
-            # Get summary from Bedrock
-            summary = call_bedrock(prompt)
-            if not summary:
-                # Fallback to extractive summarization
-                sentences = re.split(r'(?<=[.!?])\s+', cleaned_text)
-                summary = ' '.join(sentences[:min(5, len(sentences) // 3)])
-                
-            return summary, False  # Bedrock was used
+        except Exception as e:
+            logger.error(f"Kendra processing error: {str(e)}", exc_info=True)
             
-        elif kendra_used:
-            # Create summarization prompt with Kendra-enhanced content
-            prompt = f"""Please provide a concise summary of the following text in 3-5 sentences, focusing on the main points:
+            if use_kendra:
+                raise KendraUnavailable(f"Kendra processing failed: {str(e)}")
+
+    if not kendra_used and use_kendra and kendra_ready:
+        # Should not reach here if use_kendra=True, but just in case
+        raise KendraUnavailable("Kendra processing was requested but failed")
+
+    if kendra_used:
+        # Create summarization prompt with Kendra-enhanced content
+        summarization_text = kendra_text
+    else:
+        logger.info(f"Using Bedrock")
+        summarization_text = cleaned_text
+
+    prompt, degraded = build_summary_prompt(summarization_text)
+    return {
+        'prompt': prompt,
+        'fallback_text': summarization_text,
+        'used_kendra': kendra_used,
+        'url_hash': url_hash,
+        # Don't cache a text-only summary under the Kendra variant
+        'cache_key': cache_key if kendra_ready else None,
+        # Part of the page was summarized extractively; serve it but don't cache it
+        'degraded': degraded
+    }
 
-{summarization_text}
+def handle_summarize(cleaned_text, title, url, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET, latency_slo_ms=None):
+    """Summarize the page. Returns (summary, used_kendra, model route that served it)"""
+    try:
+        plan = prepare_summarize(cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget)
+        if 'summary' in plan:
+            return plan['summary'], plan['used_kendra'], 'cache'
+
+        # Get summary from Bedrock
+        summary, route = call_bedrock_routed(plan['prompt'], 'summarize', latency_slo_ms)
+        if not summary:
+            # Fallback to extractive summarization
+            get_bedrock_gateway().record_fallback('summarize')
+            summary = extractive_summary(plan['fallback_text'])
+            route = 'extractive'
+        elif plan['cache_key'] and not plan['degraded']:
+            put_cached_summary(plan['url_hash'], plan['cache_key'], summary, plan['used_kendra'])
+            
+        logger.info(f"Summary served by route {route}")
+        return summary, plan['used_kendra'], route
 
-Please provide a clear, well-structured summary that captures the essential information in 3-5 sentences."""
+    except Exception as e:
+        logger.error(f"Summarization error: {str(e)}", exc_info=True)
+        raise
 
-            # Get summary from Bedrock
-            summary = call_bedrock(prompt)
-            if not summary:
-                # Fallback to extractive summarization
-                sentences = re.split(r'(?<=[.!?])\s+', kendra_text)
-                summary = ' '.join(sentences[:min(5, len(sentences) // 3)])
-                
-            return summary, True  # Kendra was used
-            
-        else:
-            # Should not reach here if use_kendra=True, but just in case
-            raise ValueError("Kendra processing was requested but failed")
+def handle_summarize_stream(cleaned_text, title, url, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET, latency_slo_ms=None):
+    """Streaming variant of handle_summarize.
 
+    Yields {'type': 'delta', 'text': ...} events as Bedrock produces tokens and
+    finishes with a single {'type': 'done', 'summary': ..., 'used_kendra': ..., 'model_route': ...}.
+    If the stream breaks after some text was sent, an {'type': 'error'} event
+    precedes a done event flagged 'incomplete', and nothing is cached.
+    """
+    try:
+        plan = prepare_summarize(cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget)
     except Exception as e:
         logger.error(f"Summarization error: {str(e)}", exc_info=True)
         raise
 
-def handle_chat(query, context, url=None, kendra_index_id=None, use_kendra=True):
-    """Handle chat request with S3 integration and proper Kendra processing"""
+    if 'summary' in plan:
+        yield {'type': 'delta', 'text': plan['summary']}
+        yield {'type': 'done', 'summary': plan['summary'], 'used_kendra': plan['used_kendra'], 'model_route': 'cache'}
+        return
+
+    parts = []
+    route = None
+    failed = False
     try:
-        context_doc_id = None
-        if url:
-            context_doc_id = generate_url_hash(url)
-            
-            existing_doc = check_document_exists(context_doc_id)
-            if existing_doc:
-                s3_doc = get_document(context_doc_id)
-                if s3_doc and s3_doc.get('cleaned_text'):
-                    context = s3_doc.get('cleaned_text')
-        elif context:
-            context_doc_id = generate_document_id(context)
-        
-        kendra_context = None
-        kendra_used = False
+        deltas, route = open_routed_stream(plan['prompt'], 'summarize', latency_slo_ms)
+        for text in deltas:
+            parts.append(text)
+            yield {'type': 'delta', 'text': text}
+    except BedrockUnavailable as e:
+        logger.warning(f"Bedrock unavailable: {str(e)}")
+        failed = True
+    except Exception as e:
+        logger.error(f"Bedrock streaming error: {str(e)}", exc_info=True)
+        failed = True
+
+    summary = ''.join(parts).strip()
+    if not parts:
+        # Nothing was streamed, fall back to extractive summarization
+        get_bedrock_gateway().record_fallback('summarize stream')
+        summary = extractive_summary(plan['fallback_text'])
+        route = 'extractive'
+        yield {'type': 'delta', 'text': summary}
+    elif failed:
+        # Part of the summary already went out; flag it rather than cache a truncated one
+        yield {'type': 'error', 'error': 'Summary generation was interrupted'}
+        yield {'type': 'done', 'summary': summary, 'used_kendra': plan['used_kendra'], 'model_route': route, 'incomplete': True}
+        return
+    elif summary and plan['cache_key'] and not plan['degraded']:
+        put_cached_summary(plan['url_hash'], plan['cache_key'], summary, plan['used_kendra'])
+
+    logger.info(f"Summary served by route {route}")
+    yield {'type': 'done', 'summary': summary, 'used_kendra': plan['used_kendra'], 'model_route': route}
+
+def prepare_chat(query, context, url=None, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET, use_vector=False):
+    """Resolve the chat context and build the Bedrock prompt. Returns (system, prompt, kendra_used)"""
+    context_text, kendra_used = resolve_chat_context(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector)
+    system = CHAT_SYSTEM_TEMPLATE.format(context=context_text[:CHAT_CONTEXT_TOKENS * CHARS_PER_TOKEN])
+    prompt = CHAT_QUESTION_TEMPLATE.format(query=query[:CHAT_QUESTION_TOKENS * CHARS_PER_TOKEN])
+    return system, prompt, kendra_used
+
+def resolve_chat_context(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector):
+    """Pick the context to answer from. Returns (context_text, kendra_used)
+
+    With use_vector the context is narrowed to the passages closest to the query
+    from the local vector index instead of querying Kendra.
+    """
+    context_doc_id = None
+    session = None
+    if url:
+        context_doc_id = generate_url_hash(url)
+        session = DocumentSession(context_doc_id)
         
-        if kendra_index_id and context_doc_id and use_kendra:
-            logger.info(f"Using Kendra")
-            try:
-                indexed_in_kendra = False
-                if url:
-                    existing_doc = check_document_exists(context_doc_id)
-                    if existing_doc and existing_doc.get('indexed_status') == 'complete':
-                        indexed_in_kendra = True
-                
-                if not indexed_in_kendra and url:
-                    logger.info(f"Document {url} not yet indexed in Kendra, waiting for indexing...")
-                    
-                    max_retries = 5
-                    base_wait_time = 5  # Start with 5 seconds
-                    for retry in range(max_retries):
-                        # Wait with exponential backoff
-                        wait_time = base_wait_time * (2 ** retry)
-                        time.sleep(wait_time)
-                        
-                        # Check if document is now indexed
-                        existing_doc = check_document_exists(context_doc_id)
-                        if existing_doc and existing_doc.get('indexed_status') == 'complete':
-                            indexed_in_kendra = True
-                            logger.info(f"Document now indexed in Kendra after {wait_time} seconds")
-                            break
-                        else:
-                            logger.info(f"Document indexing still in progress, retry {retry+1}/{max_retries}")
-                
+        existing_doc = session.get_metadata()
+        if existing_doc:
+            s3_doc = get_document(context_doc_id, session=session)
+            if s3_doc and s3_doc.get('cleaned_text'):
+                context = s3_doc.get('cleaned_text')
+            # The visit is the only write, later steps just read the session
+            session.flush()
+    elif context:
+        context_doc_id = generate_document_id(context)
+
+    if use_vector and context_doc_id and context:
+        # Only shared URL documents get their index persisted next to the document
+        passages = retrieve_passages(context_doc_id, context, query, persist=bool(url))
+        if passages:
+            context = '\n\n'.join(passages)
+            logger.info(f"Using {len(passages)} passages from the local vector index")
+    
+    kendra_context = None
+    kendra_used = False
+    kendra_ready = True
+    
+    if kendra_index_id and context_doc_id and use_kendra:
+        logger.info(f"Using Kendra")
+        try:
+            indexed_in_kendra = False
+            if url:
+                existing_doc = session.get_metadata()
+                if existing_doc and existing_doc.get('indexed_status') == 'complete':
+                    indexed_in_kendra = True
+            
+            if not indexed_in_kendra and url:
+                logger.info(f"Document {url} not yet indexed in Kendra, waiting up to {wait_budget}s...")
+                indexed_in_kendra = wait_for_index_ready(kendra_index_id, url_hash=context_doc_id, wait_budget=wait_budget)
+                kendra_ready = indexed_in_kendra
+            
+            if kendra_ready:
                 # Query Kendra with the specific question
-                kendra_context = query_kendra(context_doc_id, kendra_index_id, query)
-                
-                if kendra_context:
-                    kendra_used = True
-                    logger.info("Successfully retrieved context from Kendra")
-                else:
-                    logger.warning("Kendra query returned no results")
-                    
-                    if use_kendra:
-                        raise ValueError("Kendra was requested but no results available")
-                
-            except Exception as e:
-                logger.error(f"Kendra query error: {str(e)}", exc_info=True)
+                kendra_context = query_kendra(context_doc_id, kendra_index_id, query, session=session)
+            
+            if kendra_context:
+                kendra_used = True
+                logger.info("Successfully retrieved context from Kendra")
+            elif not kendra_ready:
+                logger.info("Kendra wait budget exhausted, answering from the page context")
+            else:
+                logger.warning("Kendra query returned no results")
                 
                 if use_kendra:
-                    raise ValueError(f"Kendra processing failed: {str(e)}")
+                    raise KendraUnavailable("Kendra was requested but no results available")
+            
+        except Exception as e:
+            logger.error(f"Kendra query error: {str(e)}", exc_info=True)
+            
+            if use_kendra:
+                raise KendraUnavailable(f"Kendra processing failed: {str(e)}")
 
-        context_text = kendra_context if kendra_used else context
-        
-        # Only proceed with Bedrock if Kendra succeeded or if fallback is allowed
-        if kendra_used or not use_kendra:
-            logger.info(f"Using Bedrock")
-            # Create chat prompt
-            prompt = f"""You are an AI assistant helping with questions about a webpage. Use the following context to answer the user's question. Only use information from the provided context.
+    # Only proceed with Bedrock if Kendra succeeded or if fallback is allowed
+    if not kendra_used and use_kendra and kendra_ready:
+        # Should not reach here if use_kendra=True, but just in case
+        raise KendraUnavailable("Kendra processing was requested but failed")
 
-Context:
-{context_text}
+    context_text = kendra_context if kendra_used else context
+    if not kendra_used and not use_vector and context_doc_id and context and estimate_tokens(context) > CHAT_CONTEXT_TOKENS:
+        # Without Kendra, send the passages that match the question rather than the first N words
+        passages = select_passages(context_doc_id, context, query, CHAT_CONTEXT_TOKENS, persist=bool(url))
+        if passages:
+            context_text = '\n\n'.join(passages)
+            logger.info(f"Using {len(passages)} BM25 passages as chat context")
 
-User Question:
-{query}
+    return context_text, kendra_used
 
-Please provide a clear and concise answer based solely on the context provided."""
+def handle_chat(query, context, url=None, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET, use_vector=False, latency_slo_ms=None):
+    """Handle chat request with S3 integration and proper Kendra processing"""
+    try:
+        system, prompt, kendra_used = prepare_chat(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector)
 
-            # Get response from Bedrock
-            response = call_bedrock(prompt, max_tokens=1000)  # Longer response for chat
-            if not response:
-                return "I apologize, but I'm having trouble generating a response. Please try again.", kendra_used
+        # Get response from Bedrock
+        logger.info(f"Using Bedrock")
+        response, route = call_bedrock_routed(prompt, 'chat', latency_slo_ms, system)
+        logger.info(f"Chat served by route {route}")
+        if not response:
+            get_bedrock_gateway().record_fallback('chat')
+            return CHAT_ERROR_MESSAGE, kendra_used, 'error'
 
-            return response, kendra_used
-        else:
-            # Should not reach here if use_kendra=True, but just in case
-            raise ValueError("Kendra processing was requested but failed")
+        return response, kendra_used, route
 
     except Exception as e:
         logger.error(f"Chat error: {str(e)}", exc_info=True)
         raise
 
-def get_user_history(user_id):
-    """Retrieve user summaries and chat history from DynamoDB."""
-    logger.info(f"Fetching history for user_id: {user_id}")
+def handle_chat_stream(query, context, url=None, kendra_index_id=None, use_kendra=True, wait_budget=KENDRA_WAIT_BUDGET, use_vector=False, latency_slo_ms=None):
+    """Streaming variant of handle_chat, yielding the same events as handle_summarize_stream"""
     try:
-        response = user_table.get_item(
-            Key={'user_id': user_id},
-            ProjectionExpression='summaries, chat_history' # Only get necessary fields
-        )
-        
-        item = response.get('Item', {})
-        
-        # Get summaries, sort by timestamp descending, take latest N
-        summaries = sorted(
-            item.get('summaries', []),
-            key=lambda x: x.get('timestamp', 0), 
-            reverse=True
-        )[:MAX_HISTORY_ITEMS]
-        
-        # Get chat history, sort by timestamp descending, take latest N
-        chat_history = sorted(
-            item.get('chat_history', []),
-            key=lambda x: x.get('timestamp', 0),
-            reverse=True
-        )[:MAX_HISTORY_ITEMS]
-        
-        logger.info(f"Found {len(summaries)} summaries and {len(chat_history)} chat items.")
-        
-        # *** No need to convert here if using the custom encoder later ***
-        # Convert timestamps (optional here, can be handled by encoder)
-        # for summary in summaries:
-        #     if 'timestamp' in summary and isinstance(summary['timestamp'], decimal.Decimal):
-        #         summary['timestamp'] = int(summary['timestamp'])
-        # for chat in chat_history:
-        #      if 'timestamp' in chat and isinstance(chat['timestamp'], decimal.Decimal):
-        #          chat['timestamp'] = int(chat['timestamp'])
-            
-        return {
-            'summaries': summaries,
-            'chat_history': chat_history
-        }
-        
+        system, prompt, kendra_used = prepare_chat(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector)
+    except Exception as e:
+        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        raise
+
+    parts = []
+    route = None
+    failed = False
+    try:
+        deltas, route = open_routed_stream(prompt, 'chat', latency_slo_ms, system)
+        for text in deltas:
+            parts.append(text)
+            yield {'type': 'delta', 'text': text}
+    except BedrockUnavailable as e:
+        logger.warning(f"Bedrock unavailable: {str(e)}")
+        failed = True
     except Exception as e:
-        logger.error(f"DynamoDB get_item error for user {user_id}: {str(e)}", exc_info=True)
-        # Return empty history on error, or re-raise depending on desired behavior
-        return {'summaries': [], 'chat_history': []} 
+        logger.error(f"Bedrock streaming error: {str(e)}", exc_info=True)
+        failed = True
+
+    response = ''.join(parts).strip()
+    if not parts:
+        get_bedrock_gateway().record_fallback('chat stream')
+        response = CHAT_ERROR_MESSAGE
+        route = 'error'
+        yield {'type': 'delta', 'text': response}
+    elif failed:
+        yield {'type': 'error', 'error': 'Response generation was interrupted'}
+        yield {'type': 'done', 'response': response, 'used_kendra': kendra_used, 'model_route': route, 'incomplete': True}
+        return
+
+    logger.info(f"Chat served by route {route}")
+    yield {'type': 'done', 'response': response, 'used_kendra': kendra_used, 'model_route': route}
+
+def save_summary_history(user_id, url, title, summary):
+    """Add a summary entry to the user's history"""
+    try:
+        add_history_entry(user_id, SUMMARY_KIND, {
+            'url': url,
+            'title': title or url,
+            'summary': summary
+        })
+        logger.info(f"Summary saved for user {user_id}")
+    except Exception as e:
+        logger.error(f"DynamoDB summary save error: {str(e)}")
+
+def save_chat_history(user_id, query, chat_response, url, title):
+    """Add a chat exchange to the user's history"""
+    try:
+        add_history_entry(user_id, CHAT_KIND, {
+            'query': query,
+            'response': chat_response, # Store the actual response
+            'url': url or '',
+            'title': title
+        })
+        logger.info(f"Chat saved for user {user_id}")
+    except Exception as e:
+         logger.error(f"DynamoDB chat save error: {str(e)}")
+
+def get_wait_budget(lambda_context):
+    """Cap the Kendra wait budget by the time left in this invocation"""
+    budget = KENDRA_WAIT_BUDGET
+    if lambda_context is not None and hasattr(lambda_context, 'get_remaining_time_in_millis'):
+        remaining = lambda_context.get_remaining_time_in_millis() / 1000 - BEDROCK_TIME_RESERVE
+        budget = max(0, min(budget, remaining))
+    return budget
+
+def build_ndjson_response(events, headers):
+    """Frame streaming events as newline-delimited JSON
+
+    API Gateway HTTP APIs buffer Lambda responses, so the whole body still
+    arrives at once: this only changes the framing, not time to first token.
+    The side panel stays on the JSON responses until a streaming front end
+    (e.g. a response-streaming Function URL) exists.
+    """
+    return {
+        'statusCode': 200,
+        'headers': {**headers, 'Content-Type': 'application/x-ndjson'},
+        'body': ''.join(json.dumps(event) + '\n' for event in events)
+    }
+
+def error_response(status_code, message, headers):
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': json.dumps({'error': message})
+    }
+
+def get_user_history(user_id, history_type=None, limit=MAX_HISTORY_ITEMS, cursor=None):
+    """Retrieve the newest summaries and chat history, one page per type.
+
+    With history_type ('summary' or 'chat') only that type is returned and cursor
+    continues from the previous page.
+    """
+    logger.info(f"Fetching history for user_id: {user_id}")
+    kinds = {'summaries': ('summary', SUMMARY_KIND), 'chat_history': ('chat', CHAT_KIND)}
+    if history_type:
+        kinds = {name: kind for name, kind in kinds.items() if kind[0] == history_type}
+
+    history = {}
+    for name, (type_name, kind) in kinds.items():
+        try:
+            entries, next_cursor = query_history(user_id, kind, limit, cursor if history_type else None)
+        except ValueError as e:
+            raise BadRequest(str(e)) # Bad cursor, reported to the caller
+        except Exception as e:
+            logger.error(f"DynamoDB history query error for user {user_id}: {str(e)}", exc_info=True)
+            entries, next_cursor = [], None
+        history[name] = entries
+        history[f"{type_name}_cursor"] = next_cursor
+
+    logger.info(f"Found {len(history.get('summaries', []))} summaries and {len(history.get('chat_history', []))} chat items.")
+    return history
 
 def lambda_handler(event, context):
     """Main Lambda handler"""
@@ -345,18 +745,26 @@ def lambda_handler(event, context):
     try:
         auth_header = event.get('headers', {}).get('authorization') # Use lowercase 'authorization'
         if not auth_header:
-             raise ValueError("Missing Authorization header")
+             raise Unauthorized("Missing Authorization header")
              
         user_data = verify_token(auth_header)
         if not user_data or not user_data.get('user_id'):
-            raise ValueError("Invalid or expired token")
+            raise Unauthorized("Invalid or expired token")
         
         user_id = user_data['user_id']
         
         # --- Handle GET /history --- 
         if http_method == 'GET' and path.endswith('/history'):
             logger.info(f"Handling GET /history for user: {user_id}")
-            history_data = get_user_history(user_id)
+            params = event.get('queryStringParameters') or {}
+            history_type = params.get('type')
+            if history_type and history_type not in HISTORY_KINDS:
+                raise BadRequest(f"Unknown history type: {history_type}")
+            try:
+                limit = int(params.get('limit', MAX_HISTORY_ITEMS))
+            except ValueError:
+                raise BadRequest("history limit must be an integer")
+            history_data = get_user_history(user_id, history_type, limit, params.get('cursor'))
             return {
                 'statusCode': 200,
                 'headers': headers,
@@ -365,47 +773,54 @@ def lambda_handler(event, context):
 
         # --- Handle POST /summarize (and /chat) --- 
         elif http_method == 'POST' and path.endswith('/summarize'):
-            body = json.loads(event.get('body', '{}'))
+            try:
+                body = json.loads(event.get('body') or '{}')
+            except ValueError:
+                raise BadRequest("Request body must be JSON")
             action = body.get('action', 'summarize')
             kendra_index_id = os.environ.get('KENDRA_INDEX_ID')
             use_kendra = body.get('use_kendra', True) 
+            # use_kendra="vector" answers chat from the local vector index instead of Kendra
+            use_vector = use_kendra == 'vector'
+            if use_vector:
+                use_kendra = False
+            wait_budget = get_wait_budget(context)
+
+            stream = body.get('stream', False)
+            # Optional latency target in ms, steers model routing towards faster models
+            latency_slo_ms = body.get('latency_slo_ms')
+            if latency_slo_ms is not None and not isinstance(latency_slo_ms, (int, float)):
+                raise BadRequest("latency_slo_ms must be a number of milliseconds")
 
             if action == 'summarize':
                 # Handle summarization request
                 url = body.get('url')
                 title = body.get('title', '')
                 content = body.get('text', '')
+                if not content and body.get('html'):
+                    # Raw page uploads are extracted server-side
+                    content = extract_main_content(body['html'])
                 
                 if not content:
-                    raise ValueError("No content provided for summarization")
+                    raise BadRequest("No content provided for summarization")
                     
                 # Clean the text
-                cleaned_text = clean_text(content)
+                cleaned_text = clean_text(content, preserve_paragraphs=True)
                 logger.info(f"Cleaned text length: {len(cleaned_text)}")
+
+                if stream:
+                    events = list(handle_summarize_stream(cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget, latency_slo_ms))
+                    if not events[-1].get('incomplete'):
+                        save_summary_history(user_id, url, title, events[-1]['summary'])
+                    return build_ndjson_response(events, headers)
                 
                 # Get summary
-                summary, used_kendra = handle_summarize(cleaned_text, title, url, kendra_index_id, use_kendra)
+                summary, used_kendra, model_route = handle_summarize(cleaned_text, title, url, kendra_index_id, use_kendra, wait_budget, latency_slo_ms)
                 
                 # Save summary to DynamoDB
-                try:
-                    user_table.update_item(
-                        Key={'user_id': user_id},
-                        UpdateExpression='SET summaries = list_append(if_not_exists(summaries, :empty_list), :new_summary)',
-                        ExpressionAttributeValues={
-                            ':empty_list': [],
-                            ':new_summary': [{
-                                'timestamp': int(time.time()),
-                                'url': url,
-                                'title': title or url,
-                                'summary': summary
-                            }]
-                        }
-                    )
-                    logger.info(f"Summary saved for user {user_id}")
-                except Exception as e:
-                    logger.error(f"DynamoDB summary save error: {str(e)}")
-
-                response_body = {'summary': summary, 'used_kendra': used_kendra}
+                save_summary_history(user_id, url, title, summary)
+
+                response_body = {'summary': summary, 'used_kendra': used_kendra, 'model_route': model_route}
                 
             elif action == 'chat':
                 # Handle chat request
@@ -415,34 +830,23 @@ def lambda_handler(event, context):
                 
 
                 if not query or not context:
-                    raise ValueError("Query and context are required for chat")
+                    raise BadRequest("Query and context are required for chat")
+
+                if stream:
+                    events = list(handle_chat_stream(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector, latency_slo_ms))
+                    if not events[-1].get('incomplete'):
+                        save_chat_history(user_id, query, events[-1]['response'], url, body.get('title', ''))
+                    return build_ndjson_response(events, headers)
                 
                 # Get chat response
-                chat_response, used_kendra = handle_chat(query, context, url, kendra_index_id, use_kendra)
+                chat_response, used_kendra, model_route = handle_chat(query, context, url, kendra_index_id, use_kendra, wait_budget, use_vector, latency_slo_ms)
                 
                 # Save chat to DynamoDB
-                try:
-                    user_table.update_item(
-                        Key={'user_id': user_id},
-                        UpdateExpression='SET chat_history = list_append(if_not_exists(chat_history, :empty_list), :new_chat)',
-                        ExpressionAttributeValues={
-                            ':empty_list': [],
-                            ':new_chat': [{
-                                'timestamp': int(time.time()),
-                                'query': query,
-                                'response': chat_response, # Store the actual response
-                                'url': url or '',
-                                'title': body.get('title', '')
-                            }]
-                        }
-                    )
-                    logger.info(f"Chat saved for user {user_id}")
-                except Exception as e:
-                     logger.error(f"DynamoDB chat save error: {str(e)}")
+                save_chat_history(user_id, query, chat_response, url, body.get('title', ''))
                      
-                response_body = {'response': chat_response, 'used_kendra': used_kendra}
+                response_body = {'response': chat_response, 'used_kendra': used_kendra, 'model_route': model_route}
             else:
-                raise ValueError(f"Invalid action: {action}")
+                raise BadRequest(f"Invalid action: {action}")
 
             return {
                 'statusCode': 200,
@@ -458,18 +862,17 @@ def lambda_handler(event, context):
                  'body': json.dumps({'error': 'Not Found'})
              }
 
-    except ValueError as e: # Catch auth/input validation errors specifically
-        logger.error(f"Authorization or input error: {str(e)}", exc_info=True)
-        status_code = 400 if "Missing" in str(e) else 401 # 400 for missing, 401 for invalid
-        return {
-            'statusCode': status_code,
-            'headers': headers,
-            'body': json.dumps({'error': str(e)})
-        }
+    except BadRequest as e:
+        logger.warning(f"Invalid request: {str(e)}")
+        return error_response(400, str(e), headers)
+    except Unauthorized as e:
+        logger.warning(f"Authorization error: {str(e)}")
+        return error_response(401, str(e), headers)
+    except KendraUnavailable as e:
+        logger.error(f"Kendra error: {str(e)}")
+        return error_response(502, str(e), headers)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
-        return {
-            'statusCode': 500,
-            'headers': headers,
-            'body': json.dumps({'error': f'Internal server error: {str(e)}'})
-        }
\ No newline at end of file
+        return error_response(500, f'Internal server error: {str(e)}', headers)
+    finally:
+        log_bedrock_metrics()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import time
+from logger import logger
+from lru_cache import LRUCache
+from s3_helper import read_cached_summary, write_cached_summary, delete_cached_summaries
+
+# Summaries are content addressed, so a hit is only possible for identical
+# cleaned text + model + prompt settings. The TTL bounds how long a stale
+# prompt/model combination can keep serving old output.
+SUMMARY_CACHE_TTL = int(os.environ.get('SUMMARY_CACHE_TTL', 86400))  # 1 day
+LOCAL_CACHE_SIZE = int(os.environ.get('SUMMARY_CACHE_LOCAL_SIZE', 256))
+
+# Process-local tier, survives between warm Lambda invocations
+_local_cache = LRUCache(max_size=LOCAL_CACHE_SIZE, ttl=SUMMARY_CACHE_TTL)
+
+def make_cache_key(url_hash, cleaned_text, model_id, prompt_version, max_tokens, temperature, variant=''):
+    """Build a content-addressed key for a summary request"""
+    text_hash = hashlib.sha256(cleaned_text.encode('utf-8')).hexdigest()
+    key_material = json.dumps([url_hash, text_hash, model_id, prompt_version, max_tokens, temperature, variant])
+    return hashlib.sha256(key_material.encode('utf-8')).hexdigest()
+
+def get_cached_summary(url_hash, cache_key):
+    """Look up a summary in the local tier, then the shared S3 tier"""
+    entry = _local_cache.get((url_hash, cache_key))
+    if entry:
+        logger.info(f"Summary cache hit (local) for {url_hash}")
+        return entry
+
+    entry = read_cached_summary(url_hash, cache_key)
+    if not entry:
+        return None
+
+    expires_at = entry.get('created_at', 0) + SUMMARY_CACHE_TTL
+    if expires_at <= time.time():
+        logger.info(f"Summary cache entry expired for {url_hash}")
+        return None
+
+    _local_cache.put((url_hash, cache_key), entry, expires_at=expires_at)
+    logger.info(f"Summary cache hit (shared) for {url_hash}")
+    return entry
+
+def put_cached_summary(url_hash, cache_key, summary, used_kendra):
+    """Store a freshly generated summary in both tiers"""
+    entry = {
+        'summary': summary,
+        'used_kendra': used_kendra,
+        'created_at': int(time.time())
+    }
+    _local_cache.put((url_hash, cache_key), entry, expires_at=entry['created_at'] + SUMMARY_CACHE_TTL)
+    write_cached_summary(url_hash, cache_key, entry)
+
+def invalidate_summaries(url_hash):
+    """Drop every cached summary for a URL (both tiers)"""
+    _local_cache.drop_where(lambda key: key[0] == url_hash)
+    delete_cached_summaries(url_hash)
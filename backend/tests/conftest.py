@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The backend modules are flat files imported by name, as in the Lambda zips
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AWS_REGION', 'us-east-1')
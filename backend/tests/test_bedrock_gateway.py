@@ -0,0 +1,167 @@
+import io
+import json
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+import bedrock_gateway
+from bedrock_gateway import BedrockGateway, BedrockUnavailable, CircuitBreaker, TokenBucket, MIN_RATE_FRACTION, RETRY_BASE_DELAY
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+def client_error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'InvokeModel')
+
+class StubClient:
+    """bedrock-runtime stand-in that raises the queued errors, then answers"""
+
+    def __init__(self, errors=(), payload=None):
+        self.errors = list(errors)
+        self.payload = payload or {'content': [{'type': 'text', 'text': 'ok'}]}
+        self.calls = []
+
+    def invoke_model(self, modelId, body):
+        self.calls.append((modelId, json.loads(body)))
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'body': io.BytesIO(json.dumps(self.payload).encode('utf-8'))}
+
+def make_gateway(client, max_attempts=4):
+    sleeps = []
+    gateway = BedrockGateway(client=client, max_attempts=max_attempts, queue_timeout=1, sleep=sleeps.append)
+    return gateway, sleeps
+
+def test_bucket_allows_burst_then_rejects_past_timeout():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock) # 1 per second, 10 second burst
+    for _ in range(10):
+        assert bucket.acquire(1, timeout=0) == 0
+    with pytest.raises(BedrockUnavailable):
+        bucket.acquire(1, timeout=0.5)
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    bucket.acquire(10, timeout=0)
+    clock.advance(3)
+    bucket.acquire(3, timeout=0)
+    with pytest.raises(BedrockUnavailable):
+        bucket.acquire(1, timeout=0.5)
+
+def test_bucket_lets_oversized_requests_through():
+    bucket = TokenBucket(60, clock=FakeClock())
+    assert bucket.acquire(1000, timeout=0) == 0
+
+def test_bucket_reports_what_it_can_admit():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock) # 10 token burst, 1 per second
+    assert bucket.admits(1) == 10
+    assert bucket.admits(1, within=5) == 15
+    assert bucket.admits(4) == 2
+    bucket.acquire(10, timeout=0)
+    assert bucket.admits(1) == 0
+
+def test_bucket_rate_adapts_to_throttling():
+    bucket = TokenBucket(600, clock=FakeClock())
+    bucket.slow_down()
+    assert bucket.rate == pytest.approx(bucket.max_rate / 2)
+    for _ in range(20):
+        bucket.slow_down()
+    assert bucket.rate == pytest.approx(bucket.max_rate * MIN_RATE_FRACTION)
+    for _ in range(40):
+        bucket.speed_up()
+    assert bucket.rate == pytest.approx(bucket.max_rate)
+
+def test_throttling_is_retried_with_backoff():
+    client = StubClient([client_error('ThrottlingException'), client_error('ThrottlingException')])
+    gateway, sleeps = make_gateway(client)
+    assert gateway.invoke('model', '{}', 10)['content'][0]['text'] == 'ok'
+    assert len(client.calls) == 3
+    assert len(sleeps) == 2 and all(delay >= 0 for delay in sleeps)
+    metrics = gateway.metrics.snapshot()
+    assert metrics['throttles'] == 2 and metrics['retries'] == 2 and metrics['requests'] == 1
+    assert gateway.token_bucket.rate < gateway.token_bucket.max_rate
+
+def test_deadline_stops_calls_and_retries(monkeypatch):
+    client = StubClient([client_error('ThrottlingException')] * 10)
+    gateway, sleeps = make_gateway(client)
+    with pytest.raises(BedrockUnavailable):
+        gateway.invoke('model', '{}', 10, deadline=time.time() - 1)
+    assert client.calls == []
+
+    # The backoff would end past the deadline, so the first throttle is final
+    monkeypatch.setattr(bedrock_gateway.random, 'uniform', lambda low, high: high)
+    with pytest.raises(ClientError):
+        gateway.invoke('model', '{}', 10, deadline=time.time() + RETRY_BASE_DELAY / 2)
+    assert len(client.calls) == 1 and sleeps == []
+
+def test_capacity_is_the_tighter_bucket():
+    gateway = BedrockGateway(client=StubClient(), requests_per_minute=60, tokens_per_minute=6000)
+    assert gateway.capacity(100) == 10 # 10 request burst, 1000 token burst
+    assert gateway.capacity(500) == 2
+    assert gateway.capacity(100, within=10) == 20
+
+def test_validation_errors_fail_fast():
+    client = StubClient([client_error('ValidationException')])
+    gateway, sleeps = make_gateway(client)
+    with pytest.raises(ClientError):
+        gateway.invoke('model', '{}', 10)
+    assert len(client.calls) == 1 and sleeps == []
+    assert gateway.breaker.state == 'closed'
+
+def test_gives_up_after_max_attempts():
+    client = StubClient([client_error('ServiceUnavailableException')] * 3)
+    gateway, sleeps = make_gateway(client, max_attempts=3)
+    with pytest.raises(ClientError):
+        gateway.invoke('model', '{}', 10)
+    assert len(client.calls) == 3 and len(sleeps) == 2
+    assert gateway.metrics.snapshot()['failures'] == 1
+
+def test_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_seconds=30, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    clock.advance(30)
+    assert breaker.state == 'half-open'
+    assert breaker.allow()
+    assert not breaker.allow() # Only one trial call at a time
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+def test_open_breaker_rejects_without_calling_bedrock():
+    client = StubClient([client_error('ThrottlingException')] * 10)
+    gateway, _ = make_gateway(client, max_attempts=1)
+    gateway.breaker = CircuitBreaker(threshold=2, clock=FakeClock())
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            gateway.invoke('model', '{}', 10)
+    calls = len(client.calls)
+    with pytest.raises(BedrockUnavailable):
+        gateway.invoke('model', '{}', 10)
+    assert len(client.calls) == calls
+    assert gateway.metrics.snapshot()['rejected'] == 1
+
+def test_embedder_goes_through_the_gateway():
+    np = pytest.importorskip('numpy')
+    from vector_index import BedrockEmbedder
+
+    client = StubClient([client_error('ThrottlingException')], payload={'embedding': [3.0, 4.0]})
+    gateway, sleeps = make_gateway(client)
+    matrix = BedrockEmbedder(model_id='titan', gateway=gateway).embed(['first chunk', 'second chunk'])
+    assert matrix.shape == (2, 2)
+    assert np.allclose(matrix[0], [0.6, 0.8])
+    assert len(client.calls) == 3 and len(sleeps) == 1
+    assert {call[1]['inputText'] for call in client.calls} == {'first chunk', 'second chunk'}
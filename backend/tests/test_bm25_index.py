@@ -0,0 +1,97 @@
+import pytest
+
+import bm25_index
+import s3_helper
+from bm25_index import BM25Index, BM25_SUFFIX, get_bm25_index, select_passages, tokenize
+
+CHUNKS = [
+    "Glaciers carve valleys as the ice slowly moves downhill over many centuries.",
+    "Espresso is brewed by forcing hot water through finely ground coffee beans.",
+    "Coffee roasting darkens the beans and espresso blends are roasted longer. Coffee coffee coffee.",
+    "Tide pools hold crabs, anemones and snails between the high and low tides."
+]
+
+def make_text():
+    """One chunk per CHUNKS entry at chunk_chars=100"""
+    return "\n\n".join(CHUNKS)
+
+def chunk_text(index, chunk_id):
+    return index.text[index.chunk_offsets[2 * chunk_id]:index.chunk_offsets[2 * chunk_id + 1]]
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(s3_helper, 'DOCUMENT_ARTIFACT_DIR', str(tmp_path))
+    monkeypatch.setattr(bm25_index, '_indexes', bm25_index.LRUCache(max_size=64))
+    return tmp_path
+
+def test_tokenize_drops_stopwords():
+    assert tokenize("What is the Espresso of it, Coffee?") == ['espresso', 'coffee']
+
+def test_scores_rank_matching_chunks():
+    index = BM25Index.build(make_text(), chunk_chars=100)
+    assert len(index.chunk_lengths) == len(CHUNKS)
+
+    scores = index.score("coffee")
+    assert set(scores) == {1, 2}
+    # Higher term frequency wins
+    assert scores[2] > scores[1] > 0
+    assert "Coffee roasting" in chunk_text(index, 2)
+
+    scores = index.score("glaciers espresso")
+    assert set(scores) == {0, 1, 2}
+    # A rarer term is worth more than a common one
+    assert scores[0] > scores[2]
+
+def test_select_passages_respects_budget_and_document_order():
+    index = BM25Index.build(make_text(), chunk_chars=100)
+    one_chunk = max(len(chunk) for chunk in CHUNKS) // 4 + 1
+
+    passages = index.select_passages("coffee espresso", one_chunk)
+    assert len(passages) == 1 and passages[0].startswith("Coffee roasting")
+
+    passages = index.select_passages("coffee espresso tide pools", one_chunk * 3)
+    assert len(passages) == 3
+    starts = [index.text.index(passage) for passage in passages]
+    assert starts == sorted(starts)
+
+def test_query_without_overlap_selects_nothing():
+    index = BM25Index.build(make_text(), chunk_chars=100)
+    assert index.score("quantum chromodynamics") == {}
+    assert index.select_passages("quantum chromodynamics", 10000) == []
+    assert index.select_passages("the of and", 10000) == [] # Only stopwords
+
+def test_serialization_round_trip():
+    text = make_text()
+    index = BM25Index.build(text, chunk_chars=100)
+    loaded = BM25Index.from_bytes(index.to_bytes(), text)
+
+    assert loaded.terms == index.terms
+    assert loaded.fingerprint == index.fingerprint
+    for name in bm25_index.ARRAYS:
+        assert getattr(loaded, name) == getattr(index, name)
+    assert loaded.score("coffee glaciers") == index.score("coffee glaciers")
+    assert loaded.select_passages("tide pools", 1000) == index.select_passages("tide pools", 1000)
+
+def test_unknown_version_is_ignored(monkeypatch):
+    body = BM25Index.build(make_text(), chunk_chars=100).to_bytes()
+    monkeypatch.setattr(bm25_index, 'BM25_VERSION', bm25_index.BM25_VERSION + 1)
+    assert BM25Index.from_bytes(body) is None
+
+def test_persisted_index_is_reused_until_content_changes(artifact_dir, monkeypatch):
+    text = make_text()
+    index = get_bm25_index('doc-1', text)
+    assert list(artifact_dir.rglob(f"*{BM25_SUFFIX}"))
+
+    # A fresh container loads the stored index instead of rebuilding it
+    monkeypatch.setattr(bm25_index, '_indexes', bm25_index.LRUCache(max_size=64))
+    builds = []
+    original_build = BM25Index.build.__func__
+    monkeypatch.setattr(BM25Index, 'build', classmethod(lambda cls, *args, **kwargs: builds.append(1) or original_build(cls, *args, **kwargs)))
+    loaded = get_bm25_index('doc-1', text)
+    assert builds == [] and loaded.terms == index.terms
+
+    changed = get_bm25_index('doc-1', text + "\n\nVolcanoes erupt.")
+    assert builds == [1] and 'volcanoes' in changed.terms
+
+def test_select_passages_without_overlap_returns_empty(artifact_dir):
+    assert select_passages('doc-1', make_text(), "quantum chromodynamics", 1000, persist=False) == []
@@ -0,0 +1,24 @@
+import json
+
+import summarize
+
+PAGE = "The council approved the new library budget after a long debate. " * 400 # Longer than the context budget
+
+def test_prefix_does_not_depend_on_the_question():
+    short, _, _ = summarize.prepare_chat('Why?', PAGE[:2000], use_kendra=False)
+    long, _, _ = summarize.prepare_chat('Why? ' * 500, PAGE[:2000], use_kendra=False)
+    assert short == long
+
+def test_context_and_question_are_truncated_to_fixed_budgets(monkeypatch):
+    # No document id for BM25 to work with, so the whole page is the context
+    monkeypatch.setattr(summarize, 'generate_document_id', lambda context: None)
+    system, prompt, _ = summarize.prepare_chat('x' * 10000, PAGE, use_kendra=False)
+    assert summarize.estimate_tokens(system) <= summarize.CHAT_CONTEXT_TOKENS + summarize.CHAT_PROMPT_OVERHEAD_TOKENS
+    assert summarize.estimate_tokens(prompt) <= summarize.CHAT_QUESTION_TOKENS + summarize.CHAT_PROMPT_OVERHEAD_TOKENS
+    assert summarize.estimate_tokens(system + prompt) <= summarize.MAX_PROMPT_TOKENS
+
+def test_system_prefix_is_sent_whole_with_a_checkpoint():
+    system = 'context ' * 2000
+    body = json.loads(summarize.build_bedrock_body('q' * 20000, 100, 0.5, system, cache_system=True))
+    assert body['system'] == [{'type': 'text', 'text': system, 'cache_control': {'type': 'ephemeral'}}]
+    assert len(body['messages'][0]['content']) == summarize.MAX_PROMPT_TOKENS * summarize.CHARS_PER_TOKEN
@@ -0,0 +1,54 @@
+from hypothesis import given, settings, strategies as st
+
+from chunker import iter_chunks
+
+# Short alphabets so paragraph breaks, sentence ends and oversized words all
+# show up in small examples
+texts = st.text(alphabet=st.sampled_from(list('abc .!?\n\t')), max_size=400)
+budgets = st.integers(min_value=1, max_value=60)
+
+def covered(chunks, length):
+    positions = [False] * length
+    for chunk in chunks:
+        for i in range(chunk.start, chunk.end):
+            positions[i] = True
+    return positions
+
+@settings(max_examples=500)
+@given(texts, budgets)
+def test_chunks_fit_and_are_slices(text, max_chars):
+    for chunk in iter_chunks(text, max_chars):
+        assert 0 < len(chunk.text) <= max_chars
+        assert text[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+
+@settings(max_examples=500)
+@given(texts, budgets)
+def test_chunks_cover_all_text_in_order(text, max_chars):
+    chunks = list(iter_chunks(text, max_chars))
+    positions = covered(chunks, len(text))
+    assert all(positions[i] for i, char in enumerate(text) if not char.isspace())
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous.end <= current.start
+
+@settings(max_examples=500)
+@given(texts, budgets, st.integers(min_value=0, max_value=80))
+def test_overlap_is_bounded(text, max_chars, overlap):
+    chunks = list(iter_chunks(text, max_chars, overlap=overlap))
+    positions = covered(chunks, len(text))
+    assert all(positions[i] for i, char in enumerate(text) if not char.isspace())
+    for previous, current in zip(chunks, chunks[1:]):
+        assert len(current.text) <= max_chars
+        assert previous.start < current.start
+        assert previous.end - current.start <= min(overlap, max_chars - 1)
+
+@settings(max_examples=300)
+@given(texts, st.integers(min_value=1, max_value=15), st.integers(min_value=1, max_value=6))
+def test_token_budget(text, max_tokens, chars_per_token):
+    for chunk in iter_chunks(text, max_tokens=max_tokens, chars_per_token=chars_per_token):
+        assert len(chunk.text) <= max_tokens * chars_per_token
+
+@given(texts)
+def test_blank_text_has_no_chunks(text):
+    if not text.strip():
+        assert list(iter_chunks(text, 10)) == []
@@ -0,0 +1,41 @@
+from hypothesis import given, settings, strategies as st
+
+from clean_text import clean_text, iter_clean_text
+
+texts = st.text(alphabet=st.sampled_from(list('ab. \n\t\r\x0b')), max_size=300)
+
+@given(texts, st.booleans())
+def test_words_are_kept_in_order(text, preserve_paragraphs):
+    assert clean_text(text, preserve_paragraphs).split() == text.split()
+
+@given(texts)
+def test_default_mode_collapses_all_whitespace(text):
+    cleaned = clean_text(text)
+    assert cleaned == cleaned.strip()
+    assert all(char == ' ' for char in cleaned if char.isspace())
+    assert '  ' not in cleaned
+
+@given(texts)
+def test_paragraph_mode_only_keeps_paragraph_breaks(text):
+    cleaned = clean_text(text, preserve_paragraphs=True)
+    assert cleaned == cleaned.strip()
+    for paragraph in cleaned.split('\n\n') if cleaned else []:
+        assert paragraph and paragraph == ' '.join(paragraph.split())
+    assert ' '.join(cleaned.split()) == clean_text(text)
+
+@given(texts, st.booleans())
+def test_idempotent(text, preserve_paragraphs):
+    cleaned = clean_text(text, preserve_paragraphs)
+    assert clean_text(cleaned, preserve_paragraphs) == cleaned
+
+@settings(max_examples=500)
+@given(texts, st.booleans(), st.integers(min_value=1, max_value=32))
+def test_streaming_matches_clean_text(text, preserve_paragraphs, window_size):
+    streamed = ''.join(iter_clean_text(text, preserve_paragraphs, window_size=window_size))
+    assert streamed == clean_text(text, preserve_paragraphs)
+
+@settings(max_examples=500)
+@given(st.lists(texts, max_size=8), st.booleans())
+def test_streaming_over_pieces_matches_clean_text(pieces, preserve_paragraphs):
+    streamed = ''.join(iter_clean_text(iter(pieces), preserve_paragraphs))
+    assert streamed == clean_text(''.join(pieces), preserve_paragraphs)
@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+
+import pytest
+
+import ingestion_worker
+import kendra_indexing
+import summarize
+from ingestion_queue import build_ingestion_job, enqueue_ingestion, is_queued, INGESTION_QUEUED_TTL, MAX_MESSAGE_BYTES
+from job_queue import SQLiteJobQueue, SQSJobQueue
+from metadata_store import InMemoryMetadataStore, set_metadata_store
+from s3_helper import generate_url_hash
+
+URL = 'https://example.com/article'
+URL_HASH = generate_url_hash(URL)
+
+class StubKendra:
+    """Kendra stand-in recording batch_put_document calls and failing the queued ids once each"""
+
+    def __init__(self, fail_ids=()):
+        self.fail_ids = set(fail_ids)
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def batch_put_document(self, IndexId, Documents):
+        with self.lock:
+            self.batches.append([document['Id'] for document in Documents])
+            failed = [{'Id': document['Id'], 'ErrorMessage': 'busy'} for document in Documents if document['Id'] in self.fail_ids]
+            self.fail_ids -= {failure['Id'] for failure in failed}
+        return {'FailedDocuments': failed}
+
+class StubSQS:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, QueueUrl, MessageBody):
+        self.sent.append((QueueUrl, json.loads(MessageBody)))
+
+@pytest.fixture
+def store(monkeypatch):
+    store = InMemoryMetadataStore()
+    store.create(URL_HASH, {'url': URL, 'visit_count': 1, 'indexed_status': 'queued', 'queued_at': int(time.time())})
+    set_metadata_store(store)
+    monkeypatch.setattr(kendra_indexing.random, 'uniform', lambda low, high: 0) # No retry backoff
+    yield store
+    set_metadata_store(None)
+
+def test_jobs_go_to_sqs_as_json():
+    sqs = StubSQS()
+    assert enqueue_ingestion(URL_HASH, URL, 'Title', ['one', 'two'], queue=SQSJobQueue('queue-url', sqs_client=sqs))
+    assert sqs.sent[0][0] == 'queue-url'
+    assert sqs.sent[0][1]['url_hash'] == URL_HASH and sqs.sent[0][1]['chunks'] == ['one', 'two']
+
+def test_oversized_chunk_lists_are_left_for_the_worker():
+    job = build_ingestion_job(URL_HASH, URL, 'Title', ['x' * MAX_MESSAGE_BYTES])
+    assert job['chunks'] is None
+
+def test_worker_batches_chunks_and_records_status_once(store, monkeypatch):
+    updates = []
+    monkeypatch.setattr(kendra_indexing, 'update_indexed_status', lambda url_hash, status, session=None: updates.append((url_hash, status)) or True)
+    kendra = StubKendra()
+    chunks = [f"chunk {i}" for i in range(25)]
+    assert ingestion_worker.process_job(build_ingestion_job(URL_HASH, URL, 'Title', chunks), 'index', kendra)
+    assert sorted(len(batch) for batch in kendra.batches) == [5, 10, 10]
+    assert updates == [(URL_HASH, 'complete')]
+
+def test_worker_retries_failed_documents(store):
+    kendra = StubKendra(fail_ids=[f"{URL_HASH}_chunk_3", f"{URL_HASH}_chunk_7"])
+    assert ingestion_worker.process_job(build_ingestion_job(URL_HASH, URL, 'Title', [f"chunk {i}" for i in range(12)]), 'index', kendra)
+    assert kendra.batches[-1] == [f"{URL_HASH}_chunk_3", f"{URL_HASH}_chunk_7"]
+    assert store.get(URL_HASH)['indexed_status'] == 'complete'
+
+def test_worker_marks_documents_failed_after_retries(store):
+    kendra = StubKendra()
+    kendra.batch_put_document = lambda IndexId, Documents: {'FailedDocuments': [{'Id': Documents[0]['Id'], 'ErrorMessage': 'bad'}]}
+    assert not ingestion_worker.process_job(build_ingestion_job(URL_HASH, URL, 'Title', ['only chunk']), 'index', kendra)
+    assert store.get(URL_HASH)['indexed_status'] == 'failed'
+
+def test_worker_without_chunks_or_stored_content_fails_the_document(store):
+    job = dict(build_ingestion_job(URL_HASH, URL, 'Title', []), chunks=None)
+    assert not ingestion_worker.process_job(job, 'index', StubKendra())
+    assert store.get(URL_HASH)['indexed_status'] == 'failed'
+
+def test_sqs_handler_reports_only_failed_records(monkeypatch):
+    monkeypatch.setattr(ingestion_worker, 'process_job', lambda job: job['url_hash'] == 'ok')
+    event = {'Records': [
+        {'messageId': 'm1', 'body': json.dumps({'url_hash': 'ok'})},
+        {'messageId': 'm2', 'body': json.dumps({'url_hash': 'bad'})},
+        {'messageId': 'm3', 'body': 'not json'}
+    ]}
+    assert ingestion_worker.lambda_handler(event, None) == {'batchItemFailures': [{'itemIdentifier': 'm2'}, {'itemIdentifier': 'm3'}]}
+
+def test_drain_acks_successes_and_delays_failures(monkeypatch):
+    queue = SQLiteJobQueue(':memory:')
+    for url_hash in ('ok', 'bad', 'ok'):
+        queue.enqueue({'url_hash': url_hash})
+    monkeypatch.setattr(ingestion_worker, 'process_job', lambda job, index_id, kendra_client: job['url_hash'] == 'ok')
+    assert ingestion_worker.drain(queue, retry_delay=60) == 3
+    assert len(queue) == 1 and queue.receive() == [] # The failure waits out its retry delay
+
+def test_queued_status_expires():
+    now = time.time()
+    assert is_queued({'indexed_status': 'queued', 'queued_at': now - 10}, now)
+    assert not is_queued({'indexed_status': 'queued', 'queued_at': now - INGESTION_QUEUED_TTL - 1}, now)
+    assert not is_queued({'indexed_status': 'queued'}, now) # Written before queued_at existed
+    assert not is_queued({'indexed_status': 'complete', 'queued_at': now}, now)
+
+@pytest.mark.parametrize('queued_ago, enqueued', [(10, 0), (INGESTION_QUEUED_TTL + 60, 1)])
+def test_summarize_enqueues_stale_jobs_again(store, monkeypatch, queued_ago, enqueued):
+    store.update(URL_HASH, set_fields={'queued_at': int(time.time()) - queued_ago})
+    queue = SQLiteJobQueue(':memory:')
+    monkeypatch.setattr(summarize, 'get_ingestion_queue', lambda: queue)
+    monkeypatch.setattr(summarize, 'wait_for_index_ready', lambda *args, **kwargs: False)
+    plan = summarize.prepare_summarize('Some page text. ' * 50, 'Title', URL, kendra_index_id='index', wait_budget=0)
+    assert len(queue) == enqueued
+    assert plan['used_kendra'] is False and plan['cache_key'] is None
+    if enqueued:
+        assert store.get(URL_HASH)['queued_at'] >= int(time.time()) - 5
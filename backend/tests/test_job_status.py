@@ -0,0 +1,46 @@
+import re
+
+import pytest
+from botocore.exceptions import ClientError
+
+from job_status import set_job_status, PENDING, RUNNING, COMPLETED, FAILED
+
+class FakeTable:
+    """Holds items by job_id and applies the attribute_not_exists/#status IN condition set_job_status sends"""
+
+    def __init__(self):
+        self.items = {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues, ConditionExpression=None):
+        item = self.items.get(Key['job_id'])
+        if ConditionExpression and item is not None:
+            allowed = [ExpressionAttributeValues[name] for name in re.findall(r':\w+', ConditionExpression)]
+            if item['status'] not in allowed:
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'x'}}, 'UpdateItem')
+        item = self.items.setdefault(Key['job_id'], dict(Key))
+        for assignment in UpdateExpression[len('SET '):].split(', '):
+            name, value = assignment.split(' = ')
+            item[ExpressionAttributeNames[name]] = ExpressionAttributeValues[value]
+
+def statuses_after(*writes):
+    table = FakeTable()
+    results = [set_job_status('job-1', status, 'rekognition', table=table) for status in writes]
+    return results, table.items['job-1']['status']
+
+def test_job_moves_forwards():
+    assert statuses_after(PENDING, RUNNING, COMPLETED) == ([True, True, True], COMPLETED)
+
+def test_late_pending_does_not_undo_running():
+    assert statuses_after(RUNNING, PENDING) == ([True, False], RUNNING)
+
+@pytest.mark.parametrize('terminal', [COMPLETED, FAILED])
+def test_finished_jobs_stay_finished(terminal):
+    assert statuses_after(PENDING, terminal, RUNNING, PENDING) == ([True, True, False, False], terminal)
+
+def test_redelivered_job_can_be_marked_running_again():
+    assert statuses_after(PENDING, RUNNING, RUNNING) == ([True, True, True], RUNNING)
+
+def test_no_table_is_a_no_op(monkeypatch):
+    import job_status
+    monkeypatch.setattr(job_status, 'get_job_table', lambda: None)
+    assert set_job_status('job-1', PENDING) is False
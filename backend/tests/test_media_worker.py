@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+import requests
+from botocore.exceptions import ClientError
+
+import rekognition
+from job_queue import SQLiteJobQueue
+from media_worker import run_worker
+
+JOB = {'job_id': 'job-1', 'image_url': 'https://example.com/a.png', 'bucket': 'results'}
+
+class FakeResponse:
+    def __init__(self, status_code=200, content_type='image/png'):
+        self.status_code = status_code
+        self.headers = {'content-type': content_type}
+        self.content = b'png'
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+class FakeHttp:
+    def __init__(self, response=None, error=None):
+        self.response = response or FakeResponse()
+        self.error = error
+
+    def get(self, url, **kwargs):
+        if self.error:
+            raise self.error
+        return self.response
+
+class FakeClients:
+    """get_client stand-in: a Rekognition that answers or raises, and an S3 that records puts"""
+
+    def __init__(self, rekognition_error=None):
+        self.rekognition_error = rekognition_error
+        self.puts = {}
+
+    def __call__(self, service):
+        return self
+
+    def detect_text(self, Image):
+        if self.rekognition_error:
+            raise ClientError({'Error': {'Code': self.rekognition_error, 'Message': 'x'}}, 'DetectText')
+        return {'TextDetections': [{'Type': 'LINE', 'DetectedText': 'hello'}, {'Type': 'WORD', 'DetectedText': 'hello'}]}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.puts[Key] = Body
+
+@pytest.fixture
+def statuses(monkeypatch):
+    writes = []
+    monkeypatch.setattr(rekognition, 'set_job_status', lambda job_id, status, job_type, **kwargs: writes.append((job_id, status)))
+    return writes
+
+def use_fakes(monkeypatch, http, clients=None):
+    clients = clients or FakeClients()
+    monkeypatch.setattr(rekognition, 'http', http)
+    monkeypatch.setattr(rekognition, 'get_client', clients)
+    return clients
+
+def test_detected_lines_are_saved(monkeypatch, statuses):
+    clients = use_fakes(monkeypatch, FakeHttp())
+    rekognition.process_job(JOB)
+    assert clients.puts['rekognition-results/job-1.txt'] == b'hello'
+    assert statuses == [('job-1', 'RUNNING'), ('job-1', 'COMPLETED')]
+
+@pytest.mark.parametrize('http, clients', [
+    (FakeHttp(FakeResponse(404)), None),
+    (FakeHttp(FakeResponse(403)), None),
+    (FakeHttp(FakeResponse(content_type='text/html')), None),
+    (FakeHttp(), FakeClients('InvalidImageFormatException')),
+    (FakeHttp(), FakeClients('ImageTooLargeException')),
+])
+def test_permanent_failures_are_recorded_without_retrying(monkeypatch, statuses, http, clients):
+    use_fakes(monkeypatch, http, clients)
+    rekognition.process_job(JOB) # Doesn't raise, so the message is acked
+    assert statuses[-1] == ('job-1', 'FAILED')
+
+@pytest.mark.parametrize('http, clients, error', [
+    (FakeHttp(FakeResponse(503)), None, ConnectionError),
+    (FakeHttp(FakeResponse(429)), None, ConnectionError),
+    (FakeHttp(error=requests.exceptions.ConnectTimeout('timed out')), None, ConnectionError),
+    (FakeHttp(), FakeClients('ThrottlingException'), RuntimeError),
+])
+def test_transient_failures_are_retried(monkeypatch, statuses, http, clients, error):
+    use_fakes(monkeypatch, http, clients)
+    with pytest.raises(error):
+        rekognition.process_job(JOB)
+    assert statuses == [('job-1', 'RUNNING')]
+
+def test_last_attempt_records_failure_before_dead_lettering():
+    queue = SQLiteJobQueue(':memory:')
+    queue.enqueue(JOB)
+    attempts = []
+    failures = []
+    stop = threading.Event()
+
+    def handle_job(job):
+        attempts.append(job['job_id'])
+        raise ConnectionError('image host down')
+
+    def fail_job(job, error):
+        failures.append((job['job_id'], str(error)))
+        stop.set()
+
+    run_worker(queue, handle_job, concurrency=1, stop=stop, retry_delay=0, fail_job=fail_job, max_receives=3)
+    assert attempts == ['job-1'] * 3
+    assert failures == [('job-1', 'image host down')]
+
+def test_successful_jobs_are_acked():
+    queue = SQLiteJobQueue(':memory:')
+    for n in range(5):
+        queue.enqueue({'n': n})
+    seen = []
+    assert run_worker(queue, lambda job: seen.append(job['n']), concurrency=2, idle_exit=True) == 5
+    assert sorted(seen) == list(range(5)) and len(queue) == 0
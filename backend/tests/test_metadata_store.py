@@ -0,0 +1,93 @@
+import threading
+
+from metadata_store import InMemoryMetadataStore
+from s3_helper import DocumentSession, update_indexed_status
+
+URL = 'https://example.com/article'
+
+def run_concurrently(target, count=16):
+    start = threading.Barrier(count)
+    results = []
+
+    def run():
+        start.wait()
+        results.append(target())
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_only_one_concurrent_create_wins():
+    store = InMemoryMetadataStore()
+    results = run_concurrently(lambda: store.create('doc', {'visit_count': 1}))
+    assert results.count(True) == 1
+    assert store.get('doc') == {'visit_count': 1}
+
+def test_concurrent_increments_are_not_lost():
+    store = InMemoryMetadataStore()
+    store.create('doc', {'visit_count': 0})
+
+    def visit():
+        for _ in range(100):
+            store.update('doc', set_fields={'last_accessed': 1}, increments={'visit_count': 1})
+
+    run_concurrently(visit)
+    assert store.get('doc')['visit_count'] == 1600
+
+def test_update_of_missing_document_returns_none():
+    store = InMemoryMetadataStore()
+    assert store.update('doc', set_fields={'indexed_status': 'complete'}) is None
+    assert store.get('doc') is None
+
+def test_returned_metadata_is_a_copy():
+    store = InMemoryMetadataStore()
+    store.create('doc', {'visit_count': 1})
+    store.get('doc')['visit_count'] = 99
+    assert store.get('doc')['visit_count'] == 1
+
+def test_visits_from_many_sessions_are_all_counted():
+    store = InMemoryMetadataStore()
+
+    def visit():
+        session = DocumentSession('doc', store=store)
+        session.get_metadata()
+        session.record_visit()
+        return session.flush()
+
+    creator = DocumentSession('doc', store=store)
+    creator.store_content(URL, 'Title', 'text')
+    creator.flush()
+    run_concurrently(visit)
+    assert store.get('doc')['visit_count'] == 17
+
+def test_losing_a_create_race_keeps_later_field_changes():
+    store = InMemoryMetadataStore()
+    winner = DocumentSession('doc', store=store)
+    loser = DocumentSession('doc', store=store)
+    winner.store_content(URL, 'Title', 'text')
+    loser.store_content(URL, 'Title', 'text') # Both saw no document
+    update_indexed_status('doc', 'queued', session=loser)
+
+    winner.flush()
+    loser.flush()
+    metadata = store.get('doc')
+    assert metadata['visit_count'] == 2
+    assert metadata['indexed_status'] == 'queued' and metadata['queued_at']
+    assert loser.get_metadata() == metadata
+
+def test_losing_a_create_race_without_changes_only_counts_a_visit():
+    store = InMemoryMetadataStore()
+    winner = DocumentSession('doc', store=store)
+    loser = DocumentSession('doc', store=store)
+    winner.store_content(URL, 'Title', 'text')
+    loser.store_content(URL, 'Title', 'text')
+    winner.flush()
+    update_indexed_status('doc', 'complete', session=winner)
+    winner.flush()
+
+    loser.flush()
+    metadata = store.get('doc')
+    assert metadata['visit_count'] == 2 and metadata['indexed_status'] == 'complete'
@@ -0,0 +1,64 @@
+import pytest
+
+from model_router import load_routes, route_request, select_route, max_tokens_for, routes_fingerprint, supports_prompt_cache, DEFAULT_ROUTES
+
+ROUTES = load_routes(DEFAULT_ROUTES)
+
+class FakeInvoke:
+    """Records the arguments route_request passes to the Bedrock call"""
+
+    def __init__(self, result='answer'):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, prompt, max_tokens, model_id, system=None):
+        self.calls.append({'prompt': prompt, 'max_tokens': max_tokens, 'model_id': model_id, 'system': system})
+        return self.result
+
+def test_short_prompts_take_the_fast_route():
+    invoke = FakeInvoke()
+    result, route = route_request('x' * 4000, 'summarize', invoke, routes=ROUTES)
+    assert result == 'answer' and route.name == 'fast'
+    assert invoke.calls == [{'prompt': 'x' * 4000, 'max_tokens': 400, 'model_id': route.model_id, 'system': None}]
+
+def test_long_prompts_take_the_standard_route():
+    invoke = FakeInvoke()
+    _, route = route_request('x' * 8004, 'summarize', invoke, routes=ROUTES)
+    assert route.name == 'standard'
+    assert invoke.calls[0]['max_tokens'] == 500
+
+def test_system_prefix_counts_towards_the_input():
+    invoke = FakeInvoke()
+    _, route = route_request('question', 'chat', invoke, routes=ROUTES, system='c' * 8000)
+    assert route.name == 'standard'
+    assert invoke.calls[0]['system'] == 'c' * 8000 and invoke.calls[0]['max_tokens'] == 1000
+
+def test_latency_slo_prefers_routes_that_meet_it():
+    assert select_route(5000, 'chat', latency_slo_ms=3000, routes=ROUTES).name == 'standard' # Only route that fits
+    assert select_route(100, 'chat', latency_slo_ms=10000, routes=ROUTES).name == 'fast'
+    fast_first = load_routes([dict(route, max_input_tokens=None) for route in DEFAULT_ROUTES])
+    assert select_route(5000, 'chat', latency_slo_ms=3000, routes=fast_first).name == 'fast'
+
+def test_slo_nobody_meets_picks_the_fastest_eligible_route():
+    routes = load_routes([dict(route, max_input_tokens=None) for route in reversed(DEFAULT_ROUTES)])
+    assert select_route(100, 'summarize', latency_slo_ms=500, routes=routes).name == 'fast'
+
+def test_unknown_action_is_rejected():
+    with pytest.raises(ValueError):
+        select_route(10, 'translate', routes=ROUTES)
+
+def test_map_budget_comes_from_the_route():
+    route = select_route(10, 'map', routes=ROUTES)
+    assert max_tokens_for(route, 'map') == 200
+    assert max_tokens_for(route, 'other') == 500
+
+def test_fingerprint_tracks_the_route_table():
+    changed = load_routes([dict(DEFAULT_ROUTES[0], model_id='other-model'), DEFAULT_ROUTES[1]])
+    assert routes_fingerprint(ROUTES) == routes_fingerprint(load_routes(DEFAULT_ROUTES))
+    assert routes_fingerprint(ROUTES) != routes_fingerprint(changed)
+
+def test_default_routes_support_prompt_caching():
+    assert all(supports_prompt_cache(route.model_id) for route in ROUTES)
+    assert supports_prompt_cache('anthropic.claude-3-7-sonnet-20250219-v1:0')
+    assert supports_prompt_cache('eu.anthropic.claude-3-7-sonnet-20250219-v1:0')
+    assert not supports_prompt_cache('anthropic.claude-3-haiku-20240307-v1:0')
@@ -0,0 +1,88 @@
+import io
+import json
+import threading
+import time
+
+import pytest
+
+import summarize
+from bedrock_gateway import BedrockGateway, set_bedrock_gateway
+
+class SlowClient:
+    """bedrock-runtime stand-in answering every call after latency seconds"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, modelId, body):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        payload = {'content': [{'type': 'text', 'text': 'Section summary.'}]}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+def long_page(words=50000):
+    sentence = 'The committee reviewed the annual budget and approved new funding for schools.'
+    return ' '.join([sentence] * (words // len(sentence.split())))
+
+@pytest.fixture
+def gateway():
+    def use(client, **limits):
+        gateway = BedrockGateway(client=client, **limits)
+        set_bedrock_gateway(gateway)
+        return gateway
+    yield use
+    set_bedrock_gateway(None)
+
+def test_long_page_is_fully_mapped_with_default_limits(gateway):
+    client = SlowClient()
+    gateway(client)
+    prompt, degraded = summarize.build_summary_prompt(long_page(), deadline=time.time() + 10)
+    assert not degraded
+    assert prompt.startswith('The following are summaries')
+    assert client.calls > 30 # Every chunk went to Bedrock
+
+def test_map_calls_are_bounded_by_gateway_capacity(gateway):
+    client = SlowClient()
+    gateway(client, requests_per_minute=60) # 10 request burst, 1 per second after that
+    chunks = ['Some text about budgets. ' * 20] * 30
+    summaries, fallbacks = summarize.summarize_chunks(chunks, concurrency=8, deadline=time.time() + 2)
+    assert len(summaries) == 30 and all(summaries)
+    assert client.calls <= 12
+    assert fallbacks == 30 - client.calls
+
+def test_calls_stop_taking_capacity_at_the_deadline(gateway):
+    client = SlowClient(latency=0.5)
+    gw = gateway(client)
+    chunks = ['Some text about budgets. ' * 20] * 20
+    started = time.time()
+    summaries, fallbacks = summarize.summarize_chunks(chunks, concurrency=4, deadline=time.time() + 0.7)
+    assert time.time() - started < 1.5
+    assert fallbacks == 16 # Only the first wave of 4 finished
+    time.sleep(1) # Running calls finish, queued ones never start
+    assert client.calls == 8
+    assert gw.metrics.snapshot()['requests'] == 8
+
+def test_backpressure_is_logged_without_traceback(gateway, caplog):
+    gw = gateway(SlowClient())
+    for _ in range(gw.breaker.threshold):
+        gw.breaker.record_failure()
+    assert summarize.call_bedrock('Summarize this.') is None
+    records = [record for record in caplog.records if 'Bedrock unavailable' in record.getMessage()]
+    assert records and all(record.levelname == 'WARNING' and not record.exc_info for record in records)
+
+def test_degraded_summary_is_not_cached(monkeypatch):
+    writes = []
+    monkeypatch.setattr(summarize, 'prepare_summarize', lambda *args: {
+        'prompt': 'p', 'fallback_text': 'text', 'used_kendra': False, 'url_hash': 'h', 'cache_key': 'k', 'degraded': True
+    })
+    monkeypatch.setattr(summarize, 'call_bedrock_routed', lambda *args: ('summary', 'fast'))
+    monkeypatch.setattr(summarize, 'open_routed_stream', lambda *args: (iter(['sum', 'mary']), 'fast'))
+    monkeypatch.setattr(summarize, 'put_cached_summary', lambda *args: writes.append(args))
+    assert summarize.handle_summarize('text', 'title', 'https://example.com', use_kendra=False) == ('summary', False, 'fast')
+    assert writes == []
+    events = list(summarize.handle_summarize_stream('text', 'title', 'https://example.com', use_kendra=False))
+    assert events[-1] == {'type': 'done', 'summary': 'summary', 'used_kendra': False, 'model_route': 'fast'}
+    assert writes == []
@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+pytest.importorskip('jose')
+rsa = pytest.importorskip('rsa')
+from jose import jwk, jwt
+
+from token_verifier import TokenVerifier, TokenInvalid, VerificationUnavailable, user_from_claims
+
+CLIENT_ID = 'test-client'
+KID = 'test-key'
+
+def make_key():
+    _, private_key = rsa.newkeys(1024)
+    return private_key.save_pkcs1().decode()
+
+@pytest.fixture(scope='module')
+def signing_key():
+    return make_key()
+
+@pytest.fixture(scope='module')
+def other_key():
+    return make_key()
+
+@pytest.fixture(scope='module')
+def jwks_server(signing_key):
+    """Serve the signing key's JWKS the way a Cognito user pool does"""
+    public = jwk.construct(signing_key, 'RS256').public_key().to_dict()
+    body = json.dumps({'keys': [{**public, 'kid': KID, 'use': 'sig'}]}).encode()
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path != '/pool/.well-known/jwks.json':
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/pool", requests
+    server.shutdown()
+
+@pytest.fixture
+def verifier(jwks_server):
+    issuer, _ = jwks_server
+    return TokenVerifier(client_id=CLIENT_ID, jwks_file=None, issuer=issuer)
+
+def make_token(key, issuer, kid=KID, **overrides):
+    now = int(time.time())
+    claims = {
+        'sub': 'user-sub',
+        'username': 'alice',
+        'iss': issuer,
+        'token_use': 'access',
+        'client_id': CLIENT_ID,
+        'iat': now,
+        'exp': now + 3600
+    }
+    claims.update(overrides)
+    return jwt.encode(claims, key, algorithm='RS256', headers={'kid': kid})
+
+def test_valid_access_token(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    claims = verifier.verify(make_token(signing_key, issuer))
+    # Access tokens have no email claim
+    assert user_from_claims(claims) == {'user_id': 'alice', 'email': None}
+
+def test_id_token_is_rejected(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    token = make_token(signing_key, issuer, token_use='id', client_id=None, aud=CLIENT_ID,
+                       **{'cognito:username': 'bob', 'username': None, 'email': 'bob@example.com'})
+    with pytest.raises(TokenInvalid):
+        verifier.verify(token)
+
+def test_missing_client_id_is_rejected(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(signing_key, issuer, client_id=None))
+
+def test_expired_token(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    now = int(time.time())
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(signing_key, issuer, iat=now - 7200, exp=now - 3600))
+
+def test_wrong_audience(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(signing_key, issuer, client_id='another-client'))
+
+def test_wrong_issuer(verifier, signing_key):
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(signing_key, 'https://cognito-idp.us-east-1.amazonaws.com/other-pool'))
+
+def test_bad_signature(verifier, other_key, jwks_server):
+    issuer, _ = jwks_server
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(other_key, issuer))
+
+def test_unknown_kid(verifier, signing_key, jwks_server):
+    issuer, _ = jwks_server
+    with pytest.raises(TokenInvalid):
+        verifier.verify(make_token(signing_key, issuer, kid='rotated-away'))
+
+def test_malformed_token(verifier):
+    with pytest.raises(TokenInvalid):
+        verifier.verify('not-a-jwt')
+
+def test_verified_claims_and_jwks_are_cached(verifier, signing_key, jwks_server):
+    issuer, requests = jwks_server
+    token = make_token(signing_key, issuer)
+    fetches = len(requests)
+    first = verifier.verify(token)
+    second = verifier.verify(make_token(signing_key, issuer, sub='someone-else'))
+    assert verifier.verify(token) is first
+    assert second['sub'] == 'someone-else'
+    assert len(requests) == fetches + 1
+
+def test_unreachable_jwks_is_unavailable(signing_key):
+    verifier = TokenVerifier(client_id=CLIENT_ID, jwks_file=None, issuer='http://127.0.0.1:9/pool')
+    with pytest.raises(VerificationUnavailable):
+        verifier.verify(make_token(signing_key, 'http://127.0.0.1:9/pool'))
+
+def test_jwks_file(tmp_path, signing_key):
+    public = jwk.construct(signing_key, 'RS256').public_key().to_dict()
+    jwks_file = tmp_path / 'jwks.json'
+    jwks_file.write_text(json.dumps({'keys': [{**public, 'kid': KID}]}))
+    issuer = 'https://cognito-idp.us-east-1.amazonaws.com/us-east-1_test'
+    verifier = TokenVerifier(client_id=CLIENT_ID, jwks_file=str(jwks_file), issuer=issuer)
+    assert verifier.verify(make_token(signing_key, issuer))['username'] == 'alice'
@@ -0,0 +1,112 @@
+import io
+import json
+
+from botocore.exceptions import ClientError
+
+import transcribe
+import transcribe_complete
+
+BUCKET = 'media-bucket'
+
+class FakeS3:
+    """In-memory get_object/put_object over one bucket"""
+
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        return {'Body': io.BytesIO(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = Body
+
+class FakeTranscribe:
+    def __init__(self, failure_reason='Unsupported media', start_error=None):
+        self.failure_reason = failure_reason
+        self.start_error = start_error
+        self.started = []
+
+    def get_transcription_job(self, TranscriptionJobName):
+        return {'TranscriptionJob': {'TranscriptionJobName': TranscriptionJobName, 'FailureReason': self.failure_reason}}
+
+    def start_transcription_job(self, **kwargs):
+        if self.start_error:
+            raise ClientError({'Error': {'Code': self.start_error, 'Message': self.start_error}}, 'StartTranscriptionJob')
+        self.started.append(kwargs)
+        return {'TranscriptionJob': {'TranscriptionJobName': kwargs['TranscriptionJobName']}}
+
+def output_json(text):
+    return json.dumps({'results': {'transcripts': [{'transcript': text}]}}).encode('utf-8')
+
+def state_event(job_name, status, reason=None):
+    detail = {'TranscriptionJobName': job_name, 'TranscriptionJobStatus': status}
+    if reason:
+        detail['FailureReason'] = reason
+    return {'source': 'aws.transcribe', 'detail': detail}
+
+def test_completed_event_writes_the_transcript(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3({'transcribe-output/job-1.json': output_json('hello world')})
+    assert transcribe_complete.lambda_handler(state_event('job-1', 'COMPLETED'), None, s3=s3) == {'processed': 1}
+    assert s3.objects['transcribe-results/job-1.txt'] == b'hello world'
+
+def test_failed_event_uses_the_reason_from_the_event(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3()
+    transcribe_complete.lambda_handler(state_event('job-2', 'FAILED', 'Bad audio'), None, s3=s3, transcribe=FakeTranscribe())
+    notice = s3.objects['transcribe-results/job-2.FAILED.txt'].decode('utf-8')
+    assert 'Bad audio' in notice and 'Job Status: FAILED' in notice
+
+def test_failed_event_without_reason_asks_transcribe(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3()
+    transcribe_complete.lambda_handler(state_event('job-3', 'FAILED'), None, s3=s3, transcribe=FakeTranscribe('Unsupported media'))
+    assert 'Unsupported media' in s3.objects['transcribe-results/job-3.FAILED.txt'].decode('utf-8')
+
+def test_missing_output_is_recorded_as_a_failure(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3()
+    transcribe_complete.lambda_handler(state_event('job-4', 'COMPLETED'), None, s3=s3)
+    assert 'transcribe-results/job-4.txt' not in s3.objects
+    assert 'failed to retrieve transcript' in s3.objects['transcribe-results/job-4.FAILED.txt'].decode('utf-8')
+
+def test_unparseable_output_is_recorded_as_a_failure(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3({'transcribe-output/job-5.json': b'{"results": {}}'})
+    transcribe_complete.lambda_handler(state_event('job-5', 'COMPLETED'), None, s3=s3)
+    assert 'transcribe-results/job-5.FAILED.txt' in s3.objects
+
+def test_in_progress_events_are_ignored(monkeypatch):
+    monkeypatch.setattr(transcribe_complete, 'S3_BUCKET', BUCKET)
+    s3 = FakeS3()
+    transcribe_complete.lambda_handler(state_event('job-6', 'IN_PROGRESS'), None, s3=s3)
+    assert s3.objects == {}
+
+def test_output_object_records_complete_only_transcribe_output():
+    s3 = FakeS3({'transcribe-output/job-7.json': output_json('from s3 event')})
+    event = {'Records': [
+        {'s3': {'bucket': {'name': BUCKET}, 'object': {'key': 'transcribe-output/job-7.json'}}},
+        {'s3': {'bucket': {'name': BUCKET}, 'object': {'key': 'temp-audio/other.webm'}}}
+    ]}
+    assert transcribe_complete.lambda_handler(event, None, s3=s3) == {'processed': 1}
+    assert s3.objects['transcribe-results/job-7.txt'] == b'from s3 event'
+
+def test_job_name_from_output_key():
+    assert transcribe_complete.job_name_from_output_key('transcribe-output/transcribe-abc.json') == 'transcribe-abc'
+    assert transcribe_complete.job_name_from_output_key('transcribe-results/transcribe-abc.txt') is None
+
+def test_worker_submits_the_job_with_an_s3_output_location():
+    fake = FakeTranscribe()
+    transcribe.process_job({'job_name': 'job-8', 'bucket': BUCKET, 'key': 'temp-audio/a.webm'}, transcribe=fake, s3=FakeS3())
+    assert fake.started[0]['Media'] == {'MediaFileUri': f's3://{BUCKET}/temp-audio/a.webm'}
+    assert fake.started[0]['OutputKey'] == 'transcribe-output/job-8.json'
+
+def test_worker_records_permanent_start_errors_and_ignores_duplicates():
+    s3 = FakeS3()
+    job = {'job_name': 'job-9', 'bucket': BUCKET, 'key': 'temp-audio/a.webm'}
+    transcribe.process_job(job, transcribe=FakeTranscribe(start_error='ConflictException'), s3=s3)
+    assert s3.objects == {}
+    transcribe.process_job(job, transcribe=FakeTranscribe(start_error='BadRequestException'), s3=s3)
+    assert 'transcribe-results/job-9.FAILED.txt' in s3.objects
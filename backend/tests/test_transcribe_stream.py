@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+import pytest
+
+import transcribe_stream
+from stream_recognizer import FakeRecognizer, get_recognizer
+from token_verifier import TokenInvalid
+
+def verify(token):
+    if token != 'good':
+        raise TokenInvalid('bad token')
+    return {'username': 'alice', 'email': 'alice@example.com'}
+
+async def frames(*messages):
+    for message in messages:
+        yield message
+
+def start(**fields):
+    return json.dumps({'type': 'start', 'token': 'good', 'sample_rate': 16000, **fields})
+
+def run_stream(*messages, recognizer=None):
+    """Serve one stream over the given frames. Returns (transcript, events sent)"""
+    sent = []
+
+    async def send(event):
+        sent.append(event)
+
+    recognizer = recognizer or FakeRecognizer(['hello there world'], chunks_per_word=1)
+    transcript = asyncio.run(transcribe_stream.stream_transcription(frames(*messages), send, recognizer, verify=verify, bucket=None))
+    return transcript, sent
+
+def test_partials_then_final_then_done():
+    transcript, sent = run_stream(start(), b'\0' * 320, b'\0' * 320, b'\0' * 320, json.dumps({'type': 'stop'}))
+    assert transcript == 'hello there world'
+    assert [event['type'] for event in sent] == ['ready', 'partial', 'partial', 'partial', 'final', 'done']
+    assert sent[1]['text'] == 'hello' and sent[-1]['transcript'] == 'hello there world'
+    assert sent[-1]['jobName'] == sent[0]['jobName']
+
+def test_stream_ends_when_the_client_stops_sending():
+    transcript, _ = run_stream(start(), b'\0' * 320)
+    assert transcript == 'hello there world'
+
+def test_unauthorized_start_is_rejected():
+    transcript, sent = run_stream(start(token='bad'), b'\0' * 320)
+    assert transcript is None and sent == [{'type': 'error', 'error': 'Unauthorized'}]
+
+@pytest.mark.parametrize('first', [
+    json.dumps({'type': 'audio'}),
+    json.dumps([]),
+    start(sample_rate=4000),
+    'not json',
+])
+def test_invalid_start_is_rejected(first):
+    transcript, sent = run_stream(first)
+    assert transcript is None
+    assert len(sent) == 1 and sent[0]['error'].startswith('Invalid start message')
+
+@pytest.mark.parametrize('frame', ['[]', '"stop"', '3', 'null', 'not json'])
+def test_non_object_control_frames_get_an_error_and_the_stream_goes_on(frame):
+    transcript, sent = run_stream(start(), b'\0' * 320, frame, b'\0' * 320, b'\0' * 320, json.dumps({'type': 'stop'}))
+    assert transcript == 'hello there world'
+    assert {'type': 'error', 'error': 'Control messages must be JSON objects'} in sent
+    assert sent[-1]['type'] == 'done'
+
+def test_recognizer_failure_is_reported():
+    class BrokenRecognizer:
+        async def recognize(self, audio, sample_rate, language_code):
+            async for _ in audio:
+                raise RuntimeError('recognizer down')
+            yield # Makes this an async generator
+
+    transcript, sent = run_stream(start(), b'\0' * 320, b'\0' * 320, recognizer=BrokenRecognizer())
+    assert transcript is None and sent[-1] == {'type': 'error', 'error': 'Transcription failed'}
+
+def test_fake_recognizer_reveals_words_and_cycles_transcripts():
+    recognizer = FakeRecognizer(['one two', 'three'], chunks_per_word=2)
+
+    async def collect(chunk_count):
+        return [event async for event in recognizer.recognize(frames(*[b'x'] * chunk_count), 16000)]
+
+    assert asyncio.run(collect(4)) == [
+        {'type': 'partial', 'text': 'one'},
+        {'type': 'partial', 'text': 'one two'},
+        {'type': 'final', 'text': 'one two'}
+    ]
+    assert asyncio.run(collect(1)) == [{'type': 'final', 'text': 'three'}]
+    assert asyncio.run(collect(0)) == [] # No audio, no transcript
+
+def test_unknown_recognizer_is_rejected():
+    assert isinstance(get_recognizer('fake'), FakeRecognizer)
+    with pytest.raises(ValueError):
+        get_recognizer('whisper')
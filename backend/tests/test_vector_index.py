@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import s3_helper
+import vector_index
+from vector_index import (
+    HashingEmbedder, VectorIndex, build_vector_index, fingerprint, get_vector_index,
+    load_vector_index, retrieve_passages, VECTORS_META_SUFFIX, VECTORS_SUFFIX
+)
+
+TOPICS = [
+    "Volcanoes erupt molten lava and ash when magma pressure builds beneath the crust.",
+    "Sourdough bread rises slowly because wild yeast ferments the flour and water.",
+    "Penguins huddle together through the Antarctic winter to survive the cold wind.",
+    "Compilers translate source code into machine instructions the processor runs."
+]
+
+def make_document(paragraphs_per_topic=6):
+    """Text whose chunks each cover one topic, in TOPICS order"""
+    return "\n\n".join(" ".join([topic] * paragraphs_per_topic) for topic in TOPICS)
+
+@pytest.fixture
+def artifact_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(s3_helper, 'DOCUMENT_ARTIFACT_DIR', str(tmp_path))
+    monkeypatch.setattr(vector_index, '_indexes', vector_index.LRUCache(max_size=64))
+    return tmp_path
+
+def test_round_trip_through_artifact_dir(artifact_dir):
+    text = make_document()
+    embedder = HashingEmbedder(dimensions=256)
+    index = get_vector_index('doc-1', text, embedder=embedder)
+    assert len(index.offsets) > 1
+
+    files = {path.name for path in artifact_dir.rglob('*') if path.is_file()}
+    assert any(name.endswith(VECTORS_SUFFIX) for name in files)
+    assert any(name.endswith(VECTORS_META_SUFFIX) for name in files)
+
+    loaded = load_vector_index('doc-1', embedder, fingerprint(text))
+    assert loaded.offsets == index.offsets
+    # Stored as float16, so only approximately equal
+    assert np.allclose(loaded.matrix, index.matrix, atol=1e-3)
+    loaded_hits, hits = loaded.search(TOPICS[2]), index.search(TOPICS[2])
+    assert [hit[1:] for hit in loaded_hits] == [hit[1:] for hit in hits]
+    assert [hit[0] for hit in loaded_hits] == pytest.approx([hit[0] for hit in hits], abs=1e-3)
+
+def test_load_rejects_other_content_or_embedder(artifact_dir):
+    text = make_document()
+    embedder = HashingEmbedder(dimensions=256)
+    get_vector_index('doc-1', text, embedder=embedder)
+
+    assert load_vector_index('doc-1', embedder, fingerprint(text + " edited")) is None
+    other = HashingEmbedder(dimensions=256)
+    other.name = 'titan'
+    assert load_vector_index('doc-1', other, fingerprint(text)) is None
+    assert load_vector_index('doc-2', embedder, fingerprint(text)) is None
+
+def test_missing_matrix_is_a_miss(artifact_dir):
+    text = make_document()
+    embedder = HashingEmbedder(dimensions=256)
+    get_vector_index('doc-1', text, embedder=embedder)
+    for path in artifact_dir.rglob(f"*{VECTORS_SUFFIX}"):
+        os.remove(path)
+    assert load_vector_index('doc-1', embedder, fingerprint(text)) is None
+
+def test_search_orders_by_similarity():
+    embedder = HashingEmbedder(dimensions=512)
+    matrix = embedder.embed(TOPICS)
+    offsets = [(i * 100, i * 100 + 100) for i in range(len(TOPICS))]
+    index = VectorIndex(matrix, offsets, embedder)
+
+    hits = index.search("why does sourdough bread rise with wild yeast", top_k=3)
+    assert len(hits) == 3
+    assert hits[0][1] == 100 # The sourdough chunk
+    scores = [score for score, _, _ in hits]
+    assert scores == sorted(scores, reverse=True)
+    assert len(index.search("lava", top_k=10)) == len(TOPICS)
+
+def test_retrieve_passages_returns_best_chunks_in_document_order(artifact_dir):
+    text = make_document()
+    passages = retrieve_passages('doc-1', text, "penguins in the antarctic winter", top_k=1, persist=False)
+    assert len(passages) == 1
+    assert "Penguins" in passages[0]
+
+    passages = retrieve_passages('doc-1', text, "compilers and volcanoes", top_k=len(TOPICS), persist=False)
+    starts = [text.index(passage) for passage in passages]
+    assert starts == sorted(starts)
+
+def test_empty_document():
+    embedder = HashingEmbedder(dimensions=64)
+    index = build_vector_index("", embedder)
+    assert index.offsets == []
+    assert index.search("anything") == []
+
+def test_empty_document_retrieves_nothing(artifact_dir):
+    assert retrieve_passages('empty', "", "anything", persist=False) == []
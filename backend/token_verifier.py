@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.request
+from logger import logger
+from lru_cache import LRUCache
+
+# Verifies Cognito JWTs in-process against the user pool's JWKS instead of
+# calling cognito-idp get_user on every request. Verified tokens are cached
+# until they expire. Callers fall back to get_user only when local
+# verification isn't possible (no pool configured, JWKS unreachable, ...).
+COGNITO_USER_POOL_ID = os.environ.get('COGNITO_USER_POOL_ID')
+COGNITO_CLIENT_ID = os.environ.get('COGNITO_CLIENT_ID')
+COGNITO_JWKS_FILE = os.environ.get('COGNITO_JWKS_FILE') # Local JWKS, e.g. for tests
+JWKS_CACHE_TTL = int(os.environ.get('JWKS_CACHE_TTL', '3600'))
+JWKS_REFRESH_INTERVAL = 60 # Minimum seconds between refetches for an unknown kid
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+CLOCK_SKEW = 30 # Seconds of leeway on exp
+
+class TokenInvalid(Exception):
+    """The token was checked and rejected"""
+
+class VerificationUnavailable(Exception):
+    """The token couldn't be checked locally"""
+
+class TokenVerifier:
+    """Local Cognito JWT verification with cached JWKS and verified claims"""
+
+    def __init__(self, user_pool_id=COGNITO_USER_POOL_ID, client_id=COGNITO_CLIENT_ID,
+                 region=None, jwks_file=COGNITO_JWKS_FILE, issuer=None):
+        region = region or os.environ.get('AWS_REGION', 'us-east-1')
+        self.client_id = client_id
+        self.jwks_file = jwks_file
+        self.issuer = issuer or (f"https://cognito-idp.{region}.amazonaws.com/{user_pool_id}" if user_pool_id else None)
+        self.jwks_url = f"{self.issuer}/.well-known/jwks.json" if self.issuer else None
+        self.tokens = LRUCache(max_size=TOKEN_CACHE_SIZE)
+        self._keys = {}
+        self._keys_loaded_at = 0
+        self._lock = threading.Lock()
+
+    def load_jwks(self):
+        """Read the JWKS from the local file or the user pool endpoint"""
+        if self.jwks_file:
+            with open(self.jwks_file) as f:
+                return json.load(f)
+        if not self.jwks_url:
+            raise VerificationUnavailable("No user pool or JWKS file configured")
+        try:
+            with urllib.request.urlopen(self.jwks_url, timeout=2) as response:
+                return json.loads(response.read())
+        except Exception as e:
+            raise VerificationUnavailable(f"Could not fetch JWKS: {str(e)}")
+
+    def get_key(self, kid):
+        """Return the JWK for kid, refreshing the JWKS when stale or when kid is unknown"""
+        with self._lock:
+            age = time.time() - self._keys_loaded_at
+            if age > JWKS_CACHE_TTL or (kid not in self._keys and age > JWKS_REFRESH_INTERVAL):
+                jwks = self.load_jwks()
+                self._keys = {key['kid']: key for key in jwks.get('keys', [])}
+                self._keys_loaded_at = time.time()
+                logger.info(f"Loaded {len(self._keys)} JWKS keys")
+            key = self._keys.get(kid)
+        if key is None:
+            raise TokenInvalid(f"Unknown signing key {kid}")
+        return key
+
+    def verify(self, token):
+        """Return the verified claims for a token, or raise TokenInvalid/VerificationUnavailable"""
+        cache_key = hashlib.sha256(token.encode('utf-8')).hexdigest()
+        claims = self.tokens.get(cache_key)
+        if claims is not None:
+            return claims
+
+        try:
+            from jose import jwt
+        except ImportError:
+            raise VerificationUnavailable("python-jose is not installed")
+
+        try:
+            header = jwt.get_unverified_header(token)
+        except Exception as e:
+            raise TokenInvalid(f"Malformed token: {str(e)}")
+        if header.get('alg') != 'RS256':
+            raise TokenInvalid(f"Unexpected algorithm {header.get('alg')}")
+
+        key = self.get_key(header.get('kid'))
+        try:
+            # Access tokens carry client_id instead of aud, checked below
+            claims = jwt.decode(
+                token, key, algorithms=['RS256'], issuer=self.issuer,
+                options={'verify_aud': False, 'verify_at_hash': False, 'leeway': CLOCK_SKEW}
+            )
+        except Exception as e:
+            raise TokenInvalid(str(e))
+
+        # Only access tokens, as get_user(AccessToken=...) accepted
+        if claims.get('token_use') != 'access':
+            raise TokenInvalid(f"Unexpected token_use {claims.get('token_use')}")
+        if self.client_id and claims.get('client_id') != self.client_id:
+            raise TokenInvalid("Token was issued for a different client")
+
+        self.tokens.put(cache_key, claims, expires_at=claims['exp'])
+        return claims
+
+def user_from_claims(claims):
+    """Map verified claims to the user dict verify_token returns.
+
+    Access tokens carry no email claim, so email is None unless get_user was used.
+    """
+    return {
+        'user_id': claims.get('username'),
+        'email': claims.get('email')
+    }
+
+_verifier = None
+
+def get_token_verifier():
+    """Per-container verifier, so the JWKS and token caches survive warm starts"""
+    global _verifier
+    if _verifier is None:
+        _verifier = TokenVerifier()
+    return _verifier
@@ -0,0 +1,67 @@
+import json
+import os
+import urllib.parse
+from logger import logger
+from aws_clients import get_client
+from transcribe import save_transcript, save_failure, TRANSCRIBE_OUTPUT_PREFIX
+
+# Completion handler for Transcribe jobs started by transcribe.py. Triggered by
+# the EventBridge "Transcribe Job State Change" event (COMPLETED or FAILED) or
+# by the job's output JSON landing in S3 under transcribe-output/; either way
+# it writes transcribe-results/{job}.txt (or .FAILED.txt) for get_result.
+S3_BUCKET = os.environ.get('S3_BUCKET')
+
+def get_failure_reason(job_name, transcribe=None):
+    transcribe = transcribe or get_client('transcribe')
+    try:
+        job_info = transcribe.get_transcription_job(TranscriptionJobName=job_name)
+        return job_info.get('TranscriptionJob', {}).get('FailureReason', 'Unknown reason')
+    except Exception as e:
+        logger.error(f"Could not get failure reason for job {job_name}: {str(e)}")
+        return 'Could not get reason.'
+
+def handle_job_state(job_name, job_status, bucket, failure_reason=None, s3=None, transcribe=None):
+    """Record the outcome of a finished job"""
+    if job_status == 'COMPLETED':
+        try:
+            save_transcript(job_name, bucket, s3)
+            logger.info(f"Transcript for job {job_name} saved")
+        except Exception as e:
+            logger.error(f"Job {job_name} completed but its transcript could not be saved: {str(e)}", exc_info=True)
+            save_failure(job_name, bucket, job_status, f"Job {job_name} completed but failed to retrieve transcript: {str(e)}", s3)
+    elif job_status == 'FAILED':
+        reason = failure_reason or get_failure_reason(job_name, transcribe)
+        save_failure(job_name, bucket, job_status, f"Transcription job {job_name} failed: {reason}", s3)
+    else:
+        logger.info(f"Ignoring job {job_name} in state {job_status}")
+
+def job_name_from_output_key(key):
+    """transcribe-output/{job}.json -> job, or None for other keys"""
+    prefix = f"{TRANSCRIBE_OUTPUT_PREFIX}/"
+    if not key.startswith(prefix) or not key.endswith('.json'):
+        return None
+    return key[len(prefix):-len('.json')]
+
+def lambda_handler(event, context, s3=None, transcribe=None):
+    logger.info(f"Received event: {json.dumps(event)}")
+
+    if event.get('source') == 'aws.transcribe':
+        detail = event.get('detail', {})
+        handle_job_state(
+            detail['TranscriptionJobName'], detail.get('TranscriptionJobStatus'), S3_BUCKET,
+            detail.get('FailureReason'), s3, transcribe
+        )
+        return {'processed': 1}
+
+    processed = 0
+    for record in event.get('Records', []):
+        bucket = record['s3']['bucket']['name']
+        key = urllib.parse.unquote_plus(record['s3']['object']['key'])
+        job_name = job_name_from_output_key(key)
+        if not job_name:
+            logger.warning(f"Ignoring unexpected object s3://{bucket}/{key}")
+            continue
+        # Transcribe only writes the output object for completed jobs
+        handle_job_state(job_name, 'COMPLETED', bucket, s3=s3, transcribe=transcribe)
+        processed += 1
+    return {'processed': processed}
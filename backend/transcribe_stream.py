@@ -0,0 +1,167 @@
+import asyncio
+import json
+import os
+import signal
+import uuid
+from http import HTTPStatus
+from logger import logger
+from stream_recognizer import get_recognizer, STREAM_LANGUAGE_CODE
+from token_verifier import get_token_verifier, user_from_claims, TokenInvalid, VerificationUnavailable
+from transcribe import put_transcript
+
+# Real-time transcription for the side-panel microphone. The client opens a
+# WebSocket, sends {"type": "start", "token": <Cognito token>, "sample_rate":
+# 16000}, then binary 16-bit mono PCM chunks as they are recorded, then
+# {"type": "stop"}. Partial and final transcripts are pushed back as they
+# arrive from the recognizer, followed by {"type": "done", "transcript": ...}.
+# The final transcript is also written to transcribe-results/{jobName}.txt so
+# get_result can serve it like a batch job.
+STREAM_HOST = os.environ.get('STREAM_HOST', '0.0.0.0')
+STREAM_PORT = int(os.environ.get('STREAM_PORT', 8080))
+S3_BUCKET = os.environ.get('S3_BUCKET')
+DEFAULT_SAMPLE_RATE = 16000
+MIN_SAMPLE_RATE, MAX_SAMPLE_RATE = 8000, 48000 # Transcribe streaming PCM limits
+MAX_STREAM_SECONDS = int(os.environ.get('MAX_STREAM_SECONDS', 300))
+MAX_MESSAGE_BYTES = 64 * 1024
+MAX_BUFFERED_CHUNKS = 50 # Audio waiting for the recognizer before the reader stops reading
+START_TIMEOUT = 10 # Seconds for the client to send its start message
+FINAL_TIMEOUT = 10 # Seconds to wait for the last finals after the audio ends
+
+async def authenticate(token, verify=None):
+    """Verify the client's Cognito token off the event loop (JWKS fetches block)"""
+    verify = verify or get_token_verifier().verify
+    claims = await asyncio.get_running_loop().run_in_executor(None, verify, token)
+    return user_from_claims(claims)
+
+async def read_start(messages, verify=None):
+    """Parse and authenticate the start message. Returns (user, sample_rate, language_code)"""
+    start = json.loads(await asyncio.wait_for(messages.__anext__(), START_TIMEOUT))
+    if not isinstance(start, dict) or start.get('type') != 'start':
+        raise ValueError("First message must be a start message")
+    sample_rate = int(start.get('sample_rate', DEFAULT_SAMPLE_RATE))
+    if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+        raise ValueError(f"sample_rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+    user = await authenticate(start.get('token') or '', verify)
+    return user, sample_rate, start.get('language_code') or STREAM_LANGUAGE_CODE
+
+def parse_control(message):
+    """Decode a text frame, or None if it isn't a JSON object"""
+    try:
+        control = json.loads(message)
+    except ValueError:
+        return None
+    return control if isinstance(control, dict) else None
+
+async def stream_transcription(messages, send, recognizer, verify=None, bucket=S3_BUCKET):
+    """Serve one client stream: messages is an async iterator of its frames, send pushes an event. Returns the transcript"""
+    messages = messages.__aiter__()
+    try:
+        user, sample_rate, language_code = await read_start(messages, verify)
+    except (TokenInvalid, VerificationUnavailable) as e:
+        logger.warning(f"Rejected stream: {str(e)}")
+        await send({'type': 'error', 'error': 'Unauthorized'})
+        return None
+    except (ValueError, TypeError, asyncio.TimeoutError, StopAsyncIteration) as e:
+        logger.warning(f"Invalid stream start: {str(e)}")
+        await send({'type': 'error', 'error': f"Invalid start message: {str(e)}"})
+        return None
+
+    job_name = f"transcribe-stream-{uuid.uuid4()}"
+    logger.info(f"Stream {job_name} started for {user['user_id']} at {sample_rate}Hz")
+    await send({'type': 'ready', 'jobName': job_name})
+
+    audio = asyncio.Queue(maxsize=MAX_BUFFERED_CHUNKS)
+    finals = []
+
+    async def audio_chunks():
+        while True:
+            chunk = await audio.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def forward_events():
+        async for event in recognizer.recognize(audio_chunks(), sample_rate, language_code):
+            if event['type'] == 'final':
+                finals.append(event['text'])
+            await send(event)
+
+    recognizing = asyncio.ensure_future(forward_events())
+    max_bytes = MAX_STREAM_SECONDS * sample_rate * 2
+    received = 0
+    try:
+        async for message in messages:
+            if recognizing.done():
+                break # The recognizer failed; reported below
+            if isinstance(message, str):
+                control = parse_control(message)
+                if control is None:
+                    await send({'type': 'error', 'error': 'Control messages must be JSON objects'})
+                elif control.get('type') == 'stop':
+                    break
+                continue
+            received += len(message)
+            if received > max_bytes:
+                logger.info(f"Stream {job_name} reached {MAX_STREAM_SECONDS}s, ending it")
+                break
+            await asyncio.wait_for(audio.put(message), FINAL_TIMEOUT)
+
+        if not recognizing.done():
+            await asyncio.wait_for(audio.put(None), FINAL_TIMEOUT)
+        await asyncio.wait({recognizing}, timeout=FINAL_TIMEOUT)
+        if not recognizing.done():
+            logger.warning(f"Stream {job_name} recognizer did not finish within {FINAL_TIMEOUT}s")
+        elif recognizing.exception():
+            logger.error(f"Stream {job_name} recognizer error: {str(recognizing.exception())}")
+            await send({'type': 'error', 'error': 'Transcription failed'})
+            return None
+    except (ValueError, asyncio.TimeoutError) as e:
+        logger.error(f"Stream {job_name} aborted: {str(e)}")
+        await send({'type': 'error', 'error': 'Transcription stream aborted'})
+        return None
+    finally:
+        if not recognizing.done():
+            recognizing.cancel()
+
+    transcript = ' '.join(finals)
+    if bucket and transcript:
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, put_transcript, job_name, bucket, transcript)
+        except Exception as e:
+            logger.error(f"Could not save transcript for stream {job_name}: {str(e)}")
+    logger.info(f"Stream {job_name} finished: {received} bytes, {len(finals)} final segments")
+    await send({'type': 'done', 'jobName': job_name, 'transcript': transcript})
+    return transcript
+
+def health_check(path, request_headers):
+    """Answer the load balancer's health check without a WebSocket upgrade"""
+    if path == '/health':
+        return HTTPStatus.OK, [], b'OK\n'
+    return None
+
+async def serve(stop, recognizer=None, host=STREAM_HOST, port=STREAM_PORT):
+    """Run the WebSocket server until the stop future resolves"""
+    import websockets # Only the streaming service image installs it
+
+    recognizer = recognizer or get_recognizer()
+
+    async def handler(websocket):
+        async def send(event):
+            await websocket.send(json.dumps(event))
+        try:
+            await stream_transcription(websocket, send, recognizer)
+        except websockets.ConnectionClosed:
+            logger.info("Client disconnected mid-stream")
+
+    async with websockets.serve(handler, host, port, process_request=health_check, max_size=MAX_MESSAGE_BYTES):
+        logger.info(f"Streaming transcription listening on {host}:{port}")
+        await stop
+
+async def main():
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    loop.add_signal_handler(signal.SIGTERM, lambda: stop.done() or stop.set_result(None))
+    await serve(stop)
+
+if __name__ == "__main__":
+    asyncio.run(main())
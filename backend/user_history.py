@@ -0,0 +1,82 @@
+import base64
+import os
+import time
+import uuid
+from logger import logger
+from aws_clients import get_resource
+
+# One item per history entry, keyed by (user_id, sk) where sk is
+# "<KIND>#<epoch millis>#<suffix>". A Query on begins_with(KIND#) with
+# ScanIndexForward=False returns the newest entries first, so reads cost
+# O(items returned) instead of O(lifetime activity).
+HISTORY_TABLE_NAME = os.environ.get('HISTORY_TABLE_NAME', 'brevity-cloud-user-history')
+SUMMARY_KIND = 'SUMMARY'
+CHAT_KIND = 'CHAT'
+HISTORY_KINDS = {'summary': SUMMARY_KIND, 'chat': CHAT_KIND}
+MAX_PAGE_SIZE = 50
+
+def get_history_table():
+    """The history table, created on first use"""
+    return get_resource('dynamodb').Table(HISTORY_TABLE_NAME)
+
+def make_sort_key(kind, timestamp, suffix=None):
+    """Build a sort key that orders entries of one kind by time"""
+    millis = int(float(timestamp) * 1000)
+    return f"{kind}#{millis:013d}#{suffix or uuid.uuid4().hex[:8]}"
+
+def encode_cursor(last_evaluated_key):
+    """Turn a LastEvaluatedKey into an opaque cursor (the user_id comes from the token)"""
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(last_evaluated_key['sk'].encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, kind):
+    """Return the sort key encoded in a cursor, or None if it isn't valid for this kind"""
+    try:
+        sort_key = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    except Exception:
+        return None
+    return sort_key if sort_key.startswith(f"{kind}#") else None
+
+def build_history_item(user_id, kind, entry, suffix=None):
+    """Create the table item for one history entry"""
+    timestamp = entry.get('timestamp') or int(time.time())
+    item = {key: value for key, value in entry.items() if value is not None}
+    item.update({
+        'user_id': user_id,
+        'sk': make_sort_key(kind, timestamp, suffix),
+        'timestamp': int(timestamp)
+    })
+    return item
+
+def add_history_entry(user_id, kind, entry, table=None):
+    """Write a single history entry"""
+    table = table or get_history_table()
+    table.put_item(Item=build_history_item(user_id, kind, entry))
+
+def query_history(user_id, kind, limit, cursor=None, table=None):
+    """Return (entries, next_cursor) for the newest entries of one kind"""
+    from boto3.dynamodb.conditions import Key
+
+    table = table or get_history_table()
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    params = {
+        'KeyConditionExpression': Key('user_id').eq(user_id) & Key('sk').begins_with(f"{kind}#"),
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if cursor:
+        sort_key = decode_cursor(cursor, kind)
+        if sort_key is None:
+            raise ValueError("Invalid history cursor")
+        params['ExclusiveStartKey'] = {'user_id': user_id, 'sk': sort_key}
+
+    response = table.query(**params)
+    entries = []
+    for item in response.get('Items', []):
+        entry = dict(item)
+        entry.pop('user_id', None)
+        entry.pop('sk', None)
+        entries.append(entry)
+    logger.info(f"History query for {user_id} ({kind}) returned {len(entries)} items")
+    return entries, encode_cursor(response.get('LastEvaluatedKey'))
@@ -0,0 +1,198 @@
+import hashlib
+import io
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from logger import logger
+from lru_cache import LRUCache
+from chunker import iter_chunks
+from s3_helper import read_document_artifact, write_document_artifact
+
+# In-process retrieval for chat context, an alternative to a Kendra query per
+# turn. The document is chunked, each chunk embedded, and the matrix stored as
+# a float16 .npy next to shared/websites/{hash}.json (chunk offsets and the
+# embedder go in a small .json beside it). Queries are a single matrix-vector
+# product. NumPy is optional: without it retrieve_passages returns None and
+# callers keep their current context.
+VECTOR_EMBEDDER = os.environ.get('VECTOR_EMBEDDER', 'hashing')
+VECTOR_DIMENSIONS = int(os.environ.get('VECTOR_DIMENSIONS', 1024))
+VECTOR_EMBEDDING_MODEL = os.environ.get('VECTOR_EMBEDDING_MODEL', 'amazon.titan-embed-text-v1')
+VECTOR_TOP_K = int(os.environ.get('VECTOR_TOP_K', 5))
+VECTOR_EMBED_CONCURRENCY = int(os.environ.get('VECTOR_EMBED_CONCURRENCY', 8))
+VECTOR_CHUNK_CHARS = 1200
+VECTOR_CHUNK_OVERLAP = 200
+VECTORS_SUFFIX = '.vectors.npy'
+VECTORS_META_SUFFIX = '.vectors.json'
+TOKEN_PATTERN = re.compile(r'\w+')
+
+_indexes = LRUCache(max_size=64)
+
+class HashingEmbedder:
+    """Deterministic embedder: signed hashed unigrams and bigrams with log term frequency"""
+
+    name = 'hashing'
+
+    def __init__(self, dimensions=VECTOR_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter((zlib.crc32(feature.encode('utf-8')) for feature in features), dtype=np.uint32, count=len(features))
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimensions, signs)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        return normalize_rows(matrix)
+
+class BedrockEmbedder:
+    """Embeddings from a Bedrock embedding model (Titan by default)
+
+    Titan takes one text per call, so chunks are embedded concurrently through
+    the Bedrock gateway, which paces, retries and circuit-breaks the calls.
+    """
+
+    name = 'titan'
+
+    def __init__(self, model_id=VECTOR_EMBEDDING_MODEL, gateway=None, concurrency=VECTOR_EMBED_CONCURRENCY):
+        self.model_id = model_id
+        self.gateway = gateway
+        self.concurrency = concurrency
+
+    def embed_one(self, text):
+        from bedrock_gateway import get_bedrock_gateway
+
+        gateway = self.gateway or get_bedrock_gateway()
+        body = gateway.invoke(self.model_id, json.dumps({'inputText': text}), len(text) // 4 + 1)
+        return body['embedding']
+
+    def embed(self, texts):
+        import numpy as np
+
+        workers = max(1, min(self.concurrency, len(texts)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(self.embed_one, texts))
+        return normalize_rows(np.array(rows, dtype=np.float32))
+
+EMBEDDERS = {
+    'hashing': HashingEmbedder,
+    'titan': BedrockEmbedder
+}
+
+def get_embedder(name=None):
+    name = name or VECTOR_EMBEDDER
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder: {name}")
+    return EMBEDDERS[name]()
+
+def normalize_rows(matrix):
+    """Scale rows to unit length so a dot product is cosine similarity"""
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def fingerprint(text):
+    return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+class VectorIndex:
+    """Chunk embeddings of one document with their character offsets"""
+
+    def __init__(self, matrix, offsets, embedder):
+        self.matrix = matrix
+        self.offsets = offsets
+        self.embedder = embedder
+
+    def search(self, query, top_k=VECTOR_TOP_K):
+        """Return [(score, start, end)] of the top_k chunks by cosine similarity, best first"""
+        import numpy as np
+
+        if not len(self.offsets):
+            return []
+        scores = self.matrix @ self.embedder.embed([query])[0]
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), int(self.offsets[i][0]), int(self.offsets[i][1])) for i in best]
+
+def build_vector_index(text, embedder):
+    import numpy as np
+
+    chunks = list(iter_chunks(text, VECTOR_CHUNK_CHARS, VECTOR_CHUNK_OVERLAP))
+    if not chunks:
+        return VectorIndex(np.zeros((0, 1), dtype=np.float32), [], embedder)
+    matrix = embedder.embed([chunk.text for chunk in chunks])
+    return VectorIndex(matrix, [(chunk.start, chunk.end) for chunk in chunks], embedder)
+
+def save_vector_index(doc_id, index, text_fingerprint):
+    import numpy as np
+
+    buffer = io.BytesIO()
+    np.save(buffer, index.matrix.astype(np.float16), allow_pickle=False)
+    meta = {'embedder': index.embedder.name, 'fingerprint': text_fingerprint, 'offsets': index.offsets}
+    # Matrix first, so a reader that finds the meta file also finds the vectors
+    if write_document_artifact(doc_id, VECTORS_SUFFIX, buffer.getvalue()):
+        write_document_artifact(doc_id, VECTORS_META_SUFFIX, json.dumps(meta).encode('utf-8'), 'application/json')
+
+def load_vector_index(doc_id, embedder, text_fingerprint):
+    """Load a persisted index, or None if missing or built from other content/embedder"""
+    import numpy as np
+
+    meta_body = read_document_artifact(doc_id, VECTORS_META_SUFFIX)
+    if not meta_body:
+        return None
+    meta = json.loads(meta_body)
+    if meta.get('embedder') != embedder.name or meta.get('fingerprint') != text_fingerprint:
+        return None
+    matrix_body = read_document_artifact(doc_id, VECTORS_SUFFIX)
+    if not matrix_body:
+        return None
+    matrix = np.load(io.BytesIO(matrix_body), allow_pickle=False).astype(np.float32)
+    return VectorIndex(matrix, [tuple(offset) for offset in meta['offsets']], embedder)
+
+def get_vector_index(doc_id, text, embedder=None, persist=True):
+    """Per-container cached index, loaded from storage or built (and persisted) on a miss"""
+    embedder = embedder or get_embedder()
+    text_fingerprint = fingerprint(text)
+    cache_key = (doc_id, embedder.name, text_fingerprint)
+    index = _indexes.get(cache_key)
+    if index is not None:
+        return index
+
+    index = load_vector_index(doc_id, embedder, text_fingerprint) if persist else None
+    if index is None:
+        index = build_vector_index(text, embedder)
+        logger.info(f"Built vector index for {doc_id} with {len(index.offsets)} chunks")
+        if persist:
+            save_vector_index(doc_id, index, text_fingerprint)
+    _indexes.put(cache_key, index)
+    return index
+
+def retrieve_passages(doc_id, text, query, top_k=VECTOR_TOP_K, persist=True):
+    """Return the top_k most similar chunks in document order, or None if retrieval isn't available"""
+    try:
+        index = get_vector_index(doc_id, text, persist=persist)
+        hits = index.search(query, top_k)
+    except ImportError:
+        logger.warning("NumPy is not installed, local vector retrieval unavailable")
+        return None
+    except Exception as e:
+        logger.error(f"Vector retrieval error for {doc_id}: {str(e)}", exc_info=True)
+        return None
+
+    # Overlapping chunks are merged so the prompt doesn't repeat text
+    spans = []
+    for _, start, end in sorted(hits, key=lambda hit: hit[1]):
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    return [text[start:end] for start, end in spans]
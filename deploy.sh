@@ -5,7 +5,7 @@ echo "Checking GitHub CLI login..."
 gh auth status || gh auth login
 
 echo "📦 Downloading latest extension config artifact from GitHub Actions..."
-rm -f api_endpoint.txt cognito_client_id.txt 
+rm -f api_endpoint.txt cognito_client_id.txt stream_endpoint.txt
 gh run download -n extension-config
 
 echo "Download complete. Verifying files..."
@@ -26,6 +26,11 @@ echo "COGNITO_CLIENT_ID: $COGNITO_CLIENT_ID"
 echo "🛠️ Injecting values into extension/sidepanel.js..."
 sed -i '' "s|const API_ENDPOINT = .*|const API_ENDPOINT = '${API_ENDPOINT}';|" extension/sidepanel.js
 sed -i '' "s|const COGNITO_CLIENT_ID = .*|const COGNITO_CLIENT_ID = '${COGNITO_CLIENT_ID}';|" extension/sidepanel.js
+if [[ -f stream_endpoint.txt ]]; then
+  STREAM_ENDPOINT=$(cat stream_endpoint.txt)
+  echo "STREAM_ENDPOINT: $STREAM_ENDPOINT"
+  sed -i '' "s|const STREAM_ENDPOINT = .*|const STREAM_ENDPOINT = '${STREAM_ENDPOINT}';|" extension/sidepanel.js
+fi
 
 echo "Cleaning up any old zip..."
 rm -f chrome-extension*.zip
@@ -37,7 +42,7 @@ zip -r ../chrome-extension-$timestamp.zip .
 cd ..
 
 echo "Cleaning up temp files..."
-rm -f api_endpoint.txt cognito_client_id.txt
+rm -f api_endpoint.txt cognito_client_id.txt stream_endpoint.txt
 
 echo "Done! Chrome Extension is updated"
 
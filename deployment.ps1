@@ -12,7 +12,7 @@ catch {
 
 # Download extension config artifact
 Write-Host "📦 Downloading latest extension config artifact from GitHub Actions..." -ForegroundColor Cyan
-Remove-Item -Path api_endpoint.txt, cognito_client_id.txt -ErrorAction SilentlyContinue
+Remove-Item -Path api_endpoint.txt, cognito_client_id.txt, stream_endpoint.txt -ErrorAction SilentlyContinue
 gh run download -n extension-config
 
 # Verify files
@@ -47,6 +47,11 @@ Write-Host "🛠️ Injecting values into extension/sidepanel.js..." -Foreground
 $sidepanelContent = Get-Content "extension/sidepanel.js" -Raw
 $updatedContent = $sidepanelContent -replace "const API_ENDPOINT = .*", "const API_ENDPOINT = '$API_ENDPOINT';"
 $updatedContent = $updatedContent -replace "const COGNITO_CLIENT_ID = .*", "const COGNITO_CLIENT_ID = '$COGNITO_CLIENT_ID';"
+if (Test-Path "stream_endpoint.txt") {
+    $STREAM_ENDPOINT = (Get-Content "stream_endpoint.txt" -Raw).Trim()
+    Write-Host "Extracted STREAM_ENDPOINT: $STREAM_ENDPOINT" -ForegroundColor Green
+    $updatedContent = $updatedContent -replace "const STREAM_ENDPOINT = .*", "const STREAM_ENDPOINT = '$STREAM_ENDPOINT';"
+}
 Set-Content -Path "extension/sidepanel.js" -Value $updatedContent
 
 # Clean up old zip files
@@ -64,7 +69,7 @@ Compress-Archive -Path * -DestinationPath "../$zipFileName" -Force
 Pop-Location
 
 Write-Host "Cleaning up temp files..." -ForegroundColor Cyan
-Remove-Item -Path api_endpoint.txt, cognito_client_id.txt -ErrorAction SilentlyContinue
+Remove-Item -Path api_endpoint.txt, cognito_client_id.txt, stream_endpoint.txt -ErrorAction SilentlyContinue
 
 Write-Host "Done! Chrome Extension is updated" -ForegroundColor Green
 
@@ -0,0 +1,18 @@
+// AudioWorklet for real-time transcription: converts each block of microphone
+// samples to 16-bit little-endian PCM and posts it to the side panel.
+class PcmRecorderProcessor extends AudioWorkletProcessor {
+    process(inputs) {
+        const channel = inputs[0] && inputs[0][0];
+        if (channel && channel.length) {
+            const pcm = new Int16Array(channel.length);
+            for (let i = 0; i < channel.length; i++) {
+                const sample = Math.max(-1, Math.min(1, channel[i]));
+                pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+            }
+            this.port.postMessage(pcm.buffer, [pcm.buffer]);
+        }
+        return true;
+    }
+}
+
+registerProcessor('pcm-recorder', PcmRecorderProcessor);
@@ -3,6 +3,11 @@ const API_ENDPOINT = 'https://uxi2askv8l.execute-api.us-east-1.amazonaws.com/pro
 const AUTH_ENDPOINT = `${API_ENDPOINT}/auth`;
 const SUMMARIZE_ENDPOINT = `${API_ENDPOINT}/summarize`;
 const COGNITO_CLIENT_ID = '7n6rth0cr5qrivgh19rkujkied';
+// Real-time transcription service (terraform output transcribe_stream_endpoint).
+// Leave empty to upload whole recordings to /transcribe instead.
+const STREAM_ENDPOINT = '';
+const STREAM_SAMPLE_RATE = 16000;
+const STREAM_CHUNK_BYTES = 3200; // 100ms of 16-bit mono audio at 16kHz
 
 // UI Elements
 const authContainer = document.getElementById('authContainer');
@@ -35,6 +40,7 @@ const micBtn = document.getElementById('micBtn');
 let mediaRecorder;
 let audioChunks = [];
 let isRecording = false;
+let streamingSession = null; // Open WebSocket session while streaming the microphone
 const micActiveColor = '#f44336'; // Color for mic when recording
 const micInactiveColor = '#666'; // Default mic color
 
@@ -76,8 +82,9 @@ const kendraModeBtn = document.getElementById('kendraModeBtn');
 const bedrockModeBtn = document.getElementById('bedrockModeBtn');
 let useKendra = true; // Default to Kendra
 
-const POLLING_INTERVAL_MS = 3000; // 3 seconds
+const POLLING_RETRY_MS = 3000; // Pause before retrying after a failed status request
 const POLLING_TIMEOUT_MS = 180000; // 3 minutes
+const RESULT_WAIT_SECONDS = 20; // Server-side long-poll per /results request (MAX_WAIT_SECONDS)
 
 // Check Authentication Status on Load
 chrome.storage.local.get(['isAuthenticated', 'userEmail'], (result) => {
@@ -350,7 +357,7 @@ async function summarizePage() {
         if (response.ok) {
             summaryContent.textContent = data.summary;
         } else {
-            throw new Error(data.message || 'Failed to generate summary');
+            throw new Error(data.message || data.error || 'Failed to generate summary');
         }
     } catch (error) {
         alert('Error: ' + error.message);
@@ -411,7 +418,7 @@ async function sendQuery(query) {
             // Clear input
             queryInput.value = '';
         } else {
-            throw new Error(data.message || 'Failed to get response');
+            throw new Error(data.message || data.error || 'Failed to get response');
         }
     } catch (error) {
         alert('Error: ' + error.message);
@@ -471,33 +478,32 @@ async function transcribeAudio(audioBlob) {
         queryInput.disabled = true;
         queryInput.placeholder = transcribeLoadingText;
 
-        // Convert Blob to base64
-        const reader = new FileReader();
-        reader.readAsDataURL(audioBlob);
-        const base64Audio = await new Promise((resolve, reject) => {
-            reader.onloadend = () => {
-                const base64String = reader.result.split(',', 2)[1];
-                resolve(base64String);
-            };
-            reader.onerror = reject;
-        });
-
         // *** Retrieve ID Token for Authorization ***
         const { idToken } = await chrome.storage.local.get('idToken');
         if (!idToken) {
             throw new Error("Authentication error: Not logged in or ID token missing.");
         }
 
-        const response = await fetch(`${API_ENDPOINT}/transcribe`, {
+        // Phase 1: ask for a presigned upload target for this recording
+        const uploadResponse = await fetch(`${API_ENDPOINT}/transcribe`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
                 'Accept': 'application/json',
-                 // *** Add Authorization header ***
                 'Authorization': `Bearer ${idToken}`
             },
-            body: JSON.stringify({ audio_data: base64Audio })
+            body: JSON.stringify({ size: audioBlob.size })
         });
+        if (!uploadResponse.ok) {
+            const errorData = await uploadResponse.json().catch(() => ({ error: `API Error ${uploadResponse.status}` }));
+            throw new Error(errorData.error || `API Error: ${uploadResponse.status}`);
+        }
+        const { jobName, key, upload } = await uploadResponse.json();
+
+        // Phase 2: upload the Blob straight to S3; the object-created event starts the job
+        const response = upload.method === 'MULTIPART'
+            ? await uploadAudioParts(audioBlob, key, upload, idToken)
+            : await uploadAudioPost(audioBlob, jobName, upload);
 
         // --- Modify to use the async handler --- 
         await handleTranscribeResponse(response); // Assume/create a handler similar to Rekognition's
@@ -514,8 +520,53 @@ async function transcribeAudio(audioBlob) {
     }
 }
 
-// Media Recorder Setup - Modified
-async function setupMediaRecorder() {
+// Upload a recording with the presigned POST returned by /transcribe
+async function uploadAudioPost(audioBlob, jobName, upload) {
+    const form = new FormData();
+    Object.entries(upload.fields).forEach(([name, value]) => form.append(name, value));
+    form.append('file', audioBlob); // Must be the last field
+    const s3Response = await fetch(upload.url, { method: 'POST', body: form });
+    if (!s3Response.ok) {
+        throw new Error(`Audio upload failed: ${s3Response.status}`);
+    }
+    // Same shape as the API's 202 so handleTranscribeResponse can start polling
+    return new Response(JSON.stringify({ jobName }), { status: 202 });
+}
+
+// Upload a large recording part by part, then ask /transcribe to complete it
+async function uploadAudioParts(audioBlob, key, upload, idToken) {
+    const transcribeRequest = (body) => fetch(`${API_ENDPOINT}/transcribe`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Authorization': `Bearer ${idToken}`
+        },
+        body: JSON.stringify({ key, uploadId: upload.uploadId, ...body })
+    });
+
+    try {
+        const parts = [];
+        for (const part of upload.parts) {
+            const start = (part.partNumber - 1) * upload.partSize;
+            const partResponse = await fetch(part.url, {
+                method: 'PUT',
+                body: audioBlob.slice(start, start + upload.partSize)
+            });
+            if (!partResponse.ok) {
+                throw new Error(`Audio upload failed on part ${part.partNumber}: ${partResponse.status}`);
+            }
+            parts.push({ partNumber: part.partNumber, etag: partResponse.headers.get('ETag') });
+        }
+        return await transcribeRequest({ action: 'complete_upload', parts });
+    } catch (error) {
+        transcribeRequest({ action: 'abort_upload' }).catch(() => {});
+        throw error;
+    }
+}
+
+// Microphone permission (via the injected iframe) and stream, or null after telling the user why not
+async function getMicrophoneStream() {
     // 1. Send message to background to trigger iframe injection
     console.log("Sidepanel: Requesting background script to inject permission iframe...");
     try {
@@ -527,7 +578,7 @@ async function setupMediaRecorder() {
     } catch (err) {
          console.error('Sidepanel: Error requesting permission injection:', err);
          alert(`Could not initiate microphone permission request: ${err.message}. Try reloading the page/extension.`);
-         return false; // Indicate failure
+         return null;
     }
     
     // 2. Wait a short moment for the iframe to potentially trigger the prompt
@@ -538,7 +589,29 @@ async function setupMediaRecorder() {
         console.log("Sidepanel: Attempting to get user media stream after iframe injection request...");
         const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
         console.log("Sidepanel: Media stream acquired successfully.");
+        return stream;
+    } catch (err) {
+        console.error('Sidepanel: Error accessing microphone stream:', err);
+        // Check for specific errors
+        if (err.name === 'NotAllowedError' || err.name === 'PermissionDeniedError') {
+             alert('Microphone access was denied. Please grant permission in browser settings and reload the extension.');
+        } else if (err.name === 'NotFoundError' || err.name === 'DevicesNotFoundError'){
+             alert('No microphone found. Please ensure a microphone is connected and enabled.');
+        } else {
+             alert(`Could not access microphone: ${err.message}. Check console for details.`);
+        }
+        return null;
+    }
+}
+
+// Media Recorder Setup - Modified
+async function setupMediaRecorder() {
+    const stream = await getMicrophoneStream();
+    if (!stream) {
+        return false; // Indicate failure
+    }
 
+    try {
         // Check for supported MIME type
         const mimeType = MediaRecorder.isTypeSupported('audio/webm;codecs=opus') 
                          ? 'audio/webm;codecs=opus' 
@@ -580,15 +653,9 @@ async function setupMediaRecorder() {
         return true; // Indicate success
 
     } catch (err) {
-        console.error('Sidepanel: Error accessing microphone stream:', err);
-        // Check for specific errors
-        if (err.name === 'NotAllowedError' || err.name === 'PermissionDeniedError') {
-             alert('Microphone access was denied. Please grant permission in browser settings and reload the extension.');
-        } else if (err.name === 'NotFoundError' || err.name === 'DevicesNotFoundError'){
-             alert('No microphone found. Please ensure a microphone is connected and enabled.');
-        } else {
-             alert(`Could not access microphone: ${err.message}. Check console for details.`);
-        }
+        console.error('Sidepanel: Error setting up MediaRecorder:', err);
+        alert(`Could not start recording: ${err.message}`);
+        stream.getTracks().forEach(track => track.stop());
         return false; // Indicate failure
     }
 }
@@ -640,6 +707,158 @@ function stopRecording() {
     }
 }
 
+// --- Real-time transcription (STREAM_ENDPOINT) ---
+// Streams 16-bit PCM from the microphone over a WebSocket and fills the query
+// input with partial transcripts while the user is still speaking.
+async function startStreamingTranscription() {
+    if (!navigator.mediaDevices || !navigator.mediaDevices.getUserMedia) {
+        alert("Audio recording is not supported by your browser.");
+        return;
+    }
+    if (streamingSession) {
+        console.warn("Already streaming.");
+        return;
+    }
+
+    const { idToken } = await chrome.storage.local.get('idToken');
+    if (!idToken) {
+        alert("Authentication error: Not logged in or ID token missing.");
+        return;
+    }
+    const stream = await getMicrophoneStream();
+    if (!stream) {
+        return;
+    }
+
+    const queryInput = document.getElementById('queryInput');
+    const session = { stream, ready: false, pending: [], pendingBytes: 0, transcript: '' };
+    streamingSession = session;
+    try {
+        session.audioContext = new AudioContext({ sampleRate: STREAM_SAMPLE_RATE });
+        await session.audioContext.audioWorklet.addModule('pcm-recorder-worklet.js');
+        const source = session.audioContext.createMediaStreamSource(stream);
+        const recorder = new AudioWorkletNode(session.audioContext, 'pcm-recorder');
+        recorder.port.onmessage = (event) => {
+            session.pending.push(event.data);
+            session.pendingBytes += event.data.byteLength;
+            sendStreamAudio(session);
+        };
+        source.connect(recorder);
+
+        session.socket = new WebSocket(STREAM_ENDPOINT);
+        session.socket.binaryType = 'arraybuffer';
+        session.socket.onopen = () => {
+            session.socket.send(JSON.stringify({ type: 'start', token: idToken, sample_rate: session.audioContext.sampleRate }));
+        };
+        session.socket.onmessage = (event) => handleStreamEvent(session, JSON.parse(event.data));
+        session.socket.onerror = (event) => console.error('Transcription stream error:', event);
+        session.socket.onclose = () => finishStreamingTranscription(session);
+    } catch (error) {
+        console.error('Could not start streaming transcription:', error);
+        alert(`Could not start transcription: ${error.message}`);
+        finishStreamingTranscription(session);
+        return;
+    }
+
+    isRecording = true;
+    micBtn.querySelector('svg').style.fill = micActiveColor;
+    queryInput.value = '';
+    queryInput.placeholder = "Listening...";
+    console.log("Streaming transcription started");
+}
+
+// Send buffered audio once the server is ready, in chunks of about 100ms
+function sendStreamAudio(session, flush = false) {
+    if (!session.ready || !session.socket || session.socket.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    if (!flush && session.pendingBytes < STREAM_CHUNK_BYTES) {
+        return;
+    }
+    const audio = new Uint8Array(session.pendingBytes);
+    let offset = 0;
+    session.pending.forEach(part => {
+        audio.set(new Uint8Array(part), offset);
+        offset += part.byteLength;
+    });
+    session.pending = [];
+    session.pendingBytes = 0;
+    for (let start = 0; start < audio.byteLength; start += STREAM_CHUNK_BYTES) {
+        session.socket.send(audio.slice(start, start + STREAM_CHUNK_BYTES).buffer);
+    }
+}
+
+function handleStreamEvent(session, event) {
+    const queryInput = document.getElementById('queryInput');
+    switch (event.type) {
+        case 'ready':
+            session.ready = true;
+            sendStreamAudio(session);
+            break;
+        case 'partial':
+            queryInput.value = `${session.transcript} ${event.text}`.trim();
+            break;
+        case 'final':
+            session.transcript = `${session.transcript} ${event.text}`.trim();
+            queryInput.value = session.transcript;
+            break;
+        case 'done':
+            queryInput.value = event.transcript || session.transcript;
+            session.socket.close();
+            break;
+        case 'error':
+            console.error('Transcription stream error:', event.error);
+            displayChatMessage('system', `Transcription error: ${event.error}`);
+            break;
+        default:
+            console.warn('Unexpected transcription stream event:', event);
+    }
+}
+
+// Stop the microphone and wait for the server's last finals and 'done'
+function stopStreamingTranscription() {
+    const session = streamingSession;
+    if (!session) {
+        return;
+    }
+    stopStreamingAudio(session);
+    sendStreamAudio(session, true);
+    if (session.socket && session.socket.readyState === WebSocket.OPEN) {
+        session.socket.send(JSON.stringify({ type: 'stop' }));
+    }
+    isRecording = false;
+    micBtn.querySelector('svg').style.fill = micInactiveColor;
+    micBtn.disabled = true; // Until the stream closes
+    document.getElementById('queryInput').placeholder = "Finishing transcript...";
+    // Don't leave the mic disabled if the server never answers
+    setTimeout(() => finishStreamingTranscription(session), 15000);
+    console.log("Streaming transcription stopped");
+}
+
+function stopStreamingAudio(session) {
+    session.stream.getTracks().forEach(track => track.stop());
+    if (session.audioContext && session.audioContext.state !== 'closed') {
+        session.audioContext.close();
+    }
+}
+
+function finishStreamingTranscription(session) {
+    stopStreamingAudio(session);
+    if (session.socket && session.socket.readyState === WebSocket.OPEN) {
+        session.socket.close();
+    }
+    if (streamingSession !== session) {
+        return;
+    }
+    streamingSession = null;
+    isRecording = false;
+    micBtn.disabled = false;
+    micBtn.querySelector('svg').style.fill = micInactiveColor;
+    const queryInput = document.getElementById('queryInput');
+    queryInput.placeholder = "Ask a question about this page...";
+    queryInput.focus();
+}
+
 // Event Listeners
 loginBtn.addEventListener('click', () => {
     hideError(loginError);
@@ -708,7 +927,14 @@ kendraModeBtn.addEventListener('click', () => {
   });
 
 micBtn.addEventListener('click', () => {
-    if (!isRecording) {
+    if (STREAM_ENDPOINT) {
+        // Real-time path; falls back to recording and uploading when no endpoint is configured
+        if (!isRecording) {
+            startStreamingTranscription();
+        } else {
+            stopStreamingTranscription();
+        }
+    } else if (!isRecording) {
         startRecording(); // Now calls the modified async version
     } else {
         stopRecording();
@@ -895,36 +1121,29 @@ async function fetchHistory() {
     }
 }
 
-// Helper function to poll for results
-function pollForResult(jobId, type, resultElementId, loadingElementId, statusElementId) {
+// Wait for a job's result. Each /results request long-polls: the server holds
+// it until the job's state changes or RESULT_WAIT_SECONDS pass, so there is
+// only one request in flight and no fixed-interval polling.
+async function waitForResult(jobId, type, resultElementId, loadingElementId, statusElementId) {
     const startTime = Date.now();
-    let intervalId = null;
     const statusDiv = document.getElementById(statusElementId); // Optional element to show status updates
+    // Ensure jobId is URL encoded if it contains special characters (unlikely for UUID/jobName)
+    const encodedJobId = encodeURIComponent(jobId);
+    let knownStatus = '';
 
-    const checkStatus = async () => {
-        const elapsedTime = Date.now() - startTime;
-        if (elapsedTime > POLLING_TIMEOUT_MS) {
-            console.error(`Polling timed out for job ${jobId}`);
-            displayError(`Polling timed out for ${type} job ${jobId}.`, resultElementId); // Or update statusDiv
-            if (loadingElementId) hideLoading(loadingElementId);
-            clearInterval(intervalId);
-            return;
-        }
-
-        console.log(`Polling for job ${jobId} (type: ${type}), elapsed: ${Math.round(elapsedTime / 1000)}s`);
-        if (statusDiv) statusDiv.textContent = `Processing... (checking status)`;
-
+    while (Date.now() - startTime < POLLING_TIMEOUT_MS) {
+        console.log(`Waiting for job ${jobId} (type: ${type}), elapsed: ${Math.round((Date.now() - startTime) / 1000)}s`);
         try {
             const token = await getToken();
             if (!token) {
                 displayError("Authentication error during polling.", resultElementId);
-                clearInterval(intervalId);
+                if (loadingElementId) hideLoading(loadingElementId);
                 return;
             }
-            
-            // Ensure jobId is URL encoded if it contains special characters (unlikely for UUID/jobName)
-            const encodedJobId = encodeURIComponent(jobId); 
-            const response = await fetch(`${API_ENDPOINT}/results/${encodedJobId}?type=${type}`, {
+
+            const statusParam = knownStatus ? `&status=${knownStatus}` : '';
+            const requestStart = Date.now();
+            const response = await fetch(`${API_ENDPOINT}/results/${encodedJobId}?type=${type}&wait=${RESULT_WAIT_SECONDS}${statusParam}`, {
                 method: 'GET',
                 headers: {
                     'Authorization': `Bearer ${token}`,
@@ -932,69 +1151,64 @@ function pollForResult(jobId, type, resultElementId, loadingElementId, statusEle
                 }
             });
 
-            if (!response.ok && response.status !== 202) { // 202 is expected for PENDING
-                throw new Error(`Polling check failed with status ${response.status}`);
+            if (!response.ok && response.status !== 202) { // 202 is expected for PENDING/RUNNING
+                throw new Error(`Status check failed with status ${response.status}`);
             }
 
             const data = await response.json();
-            console.log(`Polling response for ${jobId}:`, data);
+            console.log(`Status response for ${jobId}:`, data);
 
             if (data.status === 'COMPLETED') {
                 console.log(`Job ${jobId} completed.`);
-                clearInterval(intervalId);
                 if (loadingElementId) hideLoading(loadingElementId);
                 if (statusDiv) statusDiv.textContent = 'Completed.';
-
-                const resultElement = document.getElementById(resultElementId);
-                if (resultElement) {
-                     // Assuming result is plain text, adjust if it's JSON, etc.
-                    if (resultElement.tagName === 'TEXTAREA' || resultElement.tagName === 'INPUT') {
-                        resultElement.value = data.result || 'No result content found.';
-                    }
-                    // *** START: Modified logic for chat/other elements ***
-                    else {
-                         // Check if it's a transcribe result meant for the chat
-                         if (type === 'transcribe' && resultElementId === 'chatResponses') { 
-                            // Append transcript as a new message
-                            displayChatMessage('user', data.result || 'Empty Transcript'); 
-                         } else {
-                            // Original behavior for other types (like rekognition) or different elements
-                            resultElement.textContent = data.result || 'No result content found.';
-                         }
-                    }
-                    // *** END: Modified logic for chat/other elements ***
-                } else {
-                    console.error(`Result element with ID ${resultElementId} not found.`);
-                }
-                
-            } else if (data.status === 'FAILED') {
+                showJobResult(type, resultElementId, data.result);
+                return;
+            }
+            if (data.status === 'FAILED') {
                 console.error(`Job ${jobId} failed: ${data.error}`);
-                clearInterval(intervalId);
-                 if (loadingElementId) hideLoading(loadingElementId);
+                if (loadingElementId) hideLoading(loadingElementId);
                 displayError(`Job ${jobId} failed: ${data.error || 'Unknown reason'}`, resultElementId); // Or update statusDiv
-            } else if (data.status === 'PENDING') {
-                // Continue polling
-                 if (statusDiv) statusDiv.textContent = `Processing... (status: PENDING)`;
-            } else {
-                 // Unexpected status
-                console.error(`Unexpected status for job ${jobId}: ${data.status}`);
-                 if (statusDiv) statusDiv.textContent = `Processing... (status: ${data.status || 'Unknown'})`;
-                // Continue polling? Or treat as error? Let's continue for now.
+                return;
+            }
+
+            // PENDING or RUNNING: ask again right away; the server does the waiting
+            if (data.status === knownStatus && Date.now() - requestStart < 1000) {
+                // Answered without waiting (job has no state record): fall back to interval polling
+                await new Promise(resolve => setTimeout(resolve, POLLING_RETRY_MS));
+            } else if (statusDiv) {
+                statusDiv.textContent = `Processing... (status: ${data.status || 'Unknown'})`;
             }
+            knownStatus = data.status || '';
         } catch (error) {
-            console.error(`Error during polling for job ${jobId}: ${error}`);
-            // Optionally stop polling on error, or allow retries? Stopping for now.
-            // displayError(`Polling error: ${error.message}`, resultElementId);
-            // clearInterval(intervalId);
-            // if (loadingElementId) hideLoading(loadingElementId);
-             if (statusDiv) statusDiv.textContent = `Processing... (polling error)`;
+            console.error(`Error while waiting for job ${jobId}: ${error}`);
+            if (statusDiv) statusDiv.textContent = `Processing... (polling error)`;
+            await new Promise(resolve => setTimeout(resolve, POLLING_RETRY_MS));
         }
-    };
+    }
+
+    console.error(`Polling timed out for job ${jobId}`);
+    displayError(`Polling timed out for ${type} job ${jobId}.`, resultElementId); // Or update statusDiv
+    if (loadingElementId) hideLoading(loadingElementId);
+}
 
-    // Initial check
-    checkStatus(); 
-    // Set interval for subsequent checks
-    intervalId = setInterval(checkStatus, POLLING_INTERVAL_MS);
+// Show a completed job's result in its target element
+function showJobResult(type, resultElementId, result) {
+    const resultElement = document.getElementById(resultElementId);
+    if (!resultElement) {
+        console.error(`Result element with ID ${resultElementId} not found.`);
+        return;
+    }
+    // Assuming result is plain text, adjust if it's JSON, etc.
+    if (resultElement.tagName === 'TEXTAREA' || resultElement.tagName === 'INPUT') {
+        resultElement.value = result || 'No result content found.';
+    } else if (type === 'transcribe' && resultElementId === 'chatResponses') {
+        // Append transcript as a new message
+        displayChatMessage('user', result || 'Empty Transcript');
+    } else {
+        // Original behavior for other types (like rekognition) or different elements
+        resultElement.textContent = result || 'No result content found.';
+    }
 }
 
 // --- Helper function to get token (if not already existing) ---
@@ -1031,7 +1245,7 @@ async function handleRekognitionResponse(response) {
                 console.log(`Rekognition job submitted. Job ID: ${jobId}`);
                 rekognitionText.value = 'Processing image...'; // Update feedback
                 if (rekStatusDiv) rekStatusDiv.textContent = 'Processing... (polling)';
-                pollForResult(jobId, 'rekognition', 'rekognitionText', 'rekognitionLoading', 'rekognition-status'); // Use correct resultElementId
+                waitForResult(jobId, 'rekognition', 'rekognitionText', 'rekognitionLoading', 'rekognition-status'); // Use correct resultElementId
             } else {
                 throw new Error("API accepted request but did not return a Job ID.");
             }
@@ -1075,7 +1289,7 @@ async function handleTranscribeResponse(response) {
                 console.log(`Transcribe job submitted. Job Name: ${jobName}`);
                 displayChatMessage('system', 'Audio submitted. Processing transcript...');
                 // Start polling, ADAPT COMPLETION LOGIC for chat
-                pollForResult(jobName, 'transcribe', transcribeResultTargetElementId, 'chatLoading', transcribeStatusElementId);
+                waitForResult(jobName, 'transcribe', transcribeResultTargetElementId, 'chatLoading', transcribeStatusElementId);
             } else {
                 throw new Error("API accepted request but did not return a Job Name.");
             }
@@ -45,11 +45,20 @@ module "lambda" {
   rekognition_lambda_zip_path = "${path.module}/lambda_function_invoke_rekognition.zip"
   transcribe_lambda_zip_path  = "${path.module}/lambda_function_invoke_transcribe.zip"
   get_result_lambda_zip_path = "${path.module}/lambda_function_get_result.zip"
+  ingestion_worker_lambda_zip_path = "${path.module}/lambda_function_ingestion_worker.zip"
+  transcribe_complete_lambda_zip_path = "${path.module}/lambda_function_transcribe_complete.zip"
   kendra_index_id       = module.kendra.kendra_index_id
   dynamodb_table_arn    = module.dynamodb.dynamodb_table_arn
   dynamodb_table_name   = module.dynamodb.dynamodb_table_name
+  metadata_table_arn    = module.dynamodb.metadata_table_arn
+  metadata_table_name   = module.dynamodb.metadata_table_name
+  history_table_arn     = module.dynamodb.history_table_arn
+  history_table_name    = module.dynamodb.history_table_name
+  job_status_table_arn  = module.dynamodb.job_status_table_arn
+  job_status_table_name = module.dynamodb.job_status_table_name
   cognito_user_pool_arn = module.cognito.cognito_user_pool_arn
   cognito_client_id     = module.cognito.cognito_client_id
+  cognito_user_pool_id  = module.cognito.cognito_user_pool_id
   s3_bucket_name        = module.s3.s3_bucket_id
   s3_bucket_arn         = module.s3.s3_bucket_arn
   ecs_cluster_arn               = module.ecs.ecs_cluster_arn
@@ -60,6 +69,10 @@ module "lambda" {
   ecs_rekognition_task_role_arn = module.ecs.rekognition_task_role_arn
   ecs_transcribe_task_role_arn  = module.ecs.transcribe_task_role_arn
   ecs_task_execution_role_arn   = module.ecs.ecs_task_execution_role_arn
+  rekognition_job_queue_url     = module.ecs.rekognition_job_queue_url
+  rekognition_job_queue_arn     = module.ecs.rekognition_job_queue_arn
+  transcribe_job_queue_url      = module.ecs.transcribe_job_queue_url
+  transcribe_job_queue_arn      = module.ecs.transcribe_job_queue_arn
 }
 
 module "api_gateway" {
@@ -144,12 +157,17 @@ module "ecs" {
   aws_region                  = var.aws_region
   vpc_id                      = module.network.vpc_id
   private_subnet_ids          = module.network.private_subnet_ids
+  public_subnet_ids           = module.network.public_subnet_ids
   ecs_tasks_security_group_id = module.network.ecs_tasks_security_group_id
+  cognito_user_pool_id        = module.cognito.cognito_user_pool_id
+  cognito_client_id           = module.cognito.cognito_client_id
   rekognition_image_uri       = var.rekognition_image_uri # Passed from workflow
   transcribe_image_uri        = var.transcribe_image_uri # Passed from workflow
   s3_bucket_arn               = module.s3.s3_bucket_arn
   dynamodb_table_arn          = module.dynamodb.dynamodb_table_arn # Pass if needed
   s3_bucket_name              = module.s3.s3_bucket_id # Add S3 bucket name
+  job_status_table_arn        = module.dynamodb.job_status_table_arn
+  job_status_table_name       = module.dynamodb.job_status_table_name
 
   # Optional: Override CPU/Memory/Scaling defaults if necessary
   # transcribe_service_max_capacity = 5 
@@ -152,6 +152,21 @@ resource "aws_apigatewayv2_route" "get_result_route" {
   target    = "integrations/${aws_apigatewayv2_integration.get_result_integration.id}"
 }
 
+# Status of many jobs in one request
+resource "aws_apigatewayv2_route" "batch_result_route" {
+  api_id    = aws_apigatewayv2_api.api.id
+  route_key = "POST /results/batch"
+  target    = "integrations/${aws_apigatewayv2_integration.get_result_integration.id}"
+}
+
+resource "aws_lambda_permission" "apigw_batch_result_invoke" {
+  statement_id  = "AllowAPIGatewayInvokeBatchResult"
+  action        = "lambda:InvokeFunction"
+  function_name = var.get_result_lambda_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_apigatewayv2_api.api.execution_arn}/*/${aws_apigatewayv2_route.batch_result_route.route_key}"
+}
+
 # Permission for API Gateway to invoke Get Result Lambda
 resource "aws_lambda_permission" "apigw_get_result_invoke" {
   statement_id  = "AllowAPIGatewayInvokeGetResult"
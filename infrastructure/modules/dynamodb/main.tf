@@ -13,3 +13,62 @@ resource "aws_dynamodb_table" "user_data" {
     Name = "${var.project_name}-user-data"
   }
 }
+
+# DynamoDB Table for shared document metadata (visit counters, indexed status)
+resource "aws_dynamodb_table" "document_metadata" {
+  name           = "${var.project_name}-document-metadata"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "url_hash"
+
+  attribute {
+    name = "url_hash"
+    type = "S"
+  }
+
+  tags = {
+    Name = "${var.project_name}-document-metadata"
+  }
+}
+
+# DynamoDB Table for per-user history, one item per summary/chat entry
+resource "aws_dynamodb_table" "user_history" {
+  name           = "${var.project_name}-user-history"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "user_id"
+  range_key      = "sk"
+
+  attribute {
+    name = "user_id"
+    type = "S"
+  }
+
+  attribute {
+    name = "sk"
+    type = "S"
+  }
+
+  tags = {
+    Name = "${var.project_name}-user-history"
+  }
+}
+
+# DynamoDB Table for Rekognition/Transcribe job states, polled by get_result
+resource "aws_dynamodb_table" "job_status" {
+  name           = "${var.project_name}-job-status"
+  billing_mode   = "PAY_PER_REQUEST"
+  hash_key       = "job_id"
+
+  attribute {
+    name = "job_id"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = {
+    Name = "${var.project_name}-job-status"
+  }
+}
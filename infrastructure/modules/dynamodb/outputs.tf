@@ -7,3 +7,33 @@ output "dynamodb_table_name" {
   value = aws_dynamodb_table.user_data.name
   description = "Name of the DynamoDB table"
 }
+
+output "metadata_table_arn" {
+  value = aws_dynamodb_table.document_metadata.arn
+  description = "ARN of the document metadata table"
+}
+
+output "metadata_table_name" {
+  value = aws_dynamodb_table.document_metadata.name
+  description = "Name of the document metadata table"
+}
+
+output "history_table_arn" {
+  value = aws_dynamodb_table.user_history.arn
+  description = "ARN of the per-user history table"
+}
+
+output "history_table_name" {
+  value = aws_dynamodb_table.user_history.name
+  description = "Name of the per-user history table"
+}
+
+output "job_status_table_arn" {
+  value = aws_dynamodb_table.job_status.arn
+  description = "ARN of the job status table"
+}
+
+output "job_status_table_name" {
+  value = aws_dynamodb_table.job_status.name
+  description = "Name of the job status table"
+}
@@ -60,6 +60,18 @@ data "aws_iam_policy_document" "rekognition_task_policy" {
     resources = ["${var.s3_bucket_arn}/*"] # Access to objects in the bucket
     effect    = "Allow"
   }
+  statement {
+    sid       = "SQSRekognitionJobs"
+    actions   = ["sqs:ReceiveMessage", "sqs:DeleteMessage", "sqs:ChangeMessageVisibility"]
+    resources = [aws_sqs_queue.rekognition_jobs.arn]
+    effect    = "Allow"
+  }
+  statement {
+    sid       = "RekognitionJobStatus"
+    actions   = ["dynamodb:UpdateItem"]
+    resources = [var.job_status_table_arn]
+    effect    = "Allow"
+  }
   # NEW: Allow putting results into the designated prefix
   statement {
     sid    = "S3PutRekognitionResults"
@@ -116,7 +128,7 @@ data "aws_iam_policy_document" "transcribe_task_policy" {
     effect    = "Allow"
   }
   statement {
-    actions   = ["transcribe:StartTranscriptionJob", "transcribe:GetTranscriptionJob"]
+    actions   = ["transcribe:StartTranscriptionJob", "transcribe:GetTranscriptionJob", "transcribe:StartStreamTranscription"]
     resources = ["*"] # Transcribe actions often require "*"
     effect    = "Allow"
   }
@@ -125,6 +137,18 @@ data "aws_iam_policy_document" "transcribe_task_policy" {
     resources = ["${var.s3_bucket_arn}/*"] 
     effect    = "Allow"
   }
+  statement {
+    sid       = "SQSTranscribeJobs"
+    actions   = ["sqs:ReceiveMessage", "sqs:DeleteMessage", "sqs:ChangeMessageVisibility"]
+    resources = [aws_sqs_queue.transcribe_jobs.arn]
+    effect    = "Allow"
+  }
+  statement {
+    sid       = "TranscribeJobStatus"
+    actions   = ["dynamodb:UpdateItem"]
+    resources = [var.job_status_table_arn]
+    effect    = "Allow"
+  }
   # CLARIFY: Existing PutObject is for the whole bucket. 
   # Keep it for now, or restrict further if needed, e.g.:
   # statement {
@@ -32,6 +32,48 @@ resource "aws_cloudwatch_log_group" "transcribe_logs" {
   }
 }
 
+# --- Media Job Queues ---
+# The invoker Lambdas enqueue jobs; long-running worker services consume them
+resource "aws_sqs_queue" "transcribe_jobs_dlq" {
+  name                      = "${var.project_name}-${var.environment}-transcribe-jobs-dlq"
+  message_retention_seconds = 1209600 # 14 days
+}
+
+resource "aws_sqs_queue" "transcribe_jobs" {
+  name                       = "${var.project_name}-${var.environment}-transcribe-jobs"
+  visibility_timeout_seconds = 300
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.transcribe_jobs_dlq.arn
+    maxReceiveCount     = 3 # media_worker's JOB_MAX_RECEIVES default; the last attempt records FAILED
+  })
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_sqs_queue" "rekognition_jobs_dlq" {
+  name                      = "${var.project_name}-${var.environment}-rekognition-jobs-dlq"
+  message_retention_seconds = 1209600 # 14 days
+}
+
+resource "aws_sqs_queue" "rekognition_jobs" {
+  name                       = "${var.project_name}-${var.environment}-rekognition-jobs"
+  visibility_timeout_seconds = 300
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.rekognition_jobs_dlq.arn
+    maxReceiveCount     = 3 # media_worker's JOB_MAX_RECEIVES default; the last attempt records FAILED
+  })
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
 # --- Rekognition Task Definition ---
 resource "aws_ecs_task_definition" "rekognition" {
   family                   = "${var.project_name}-${var.environment}-rekognition"
@@ -49,8 +91,11 @@ resource "aws_ecs_task_definition" "rekognition" {
       essential = true
       # Pass S3 bucket needed by the container
       environment = [
-        { name = "S3_BUCKET", value = var.s3_bucket_name } # Get bucket NAME
-        # Other necessary env vars like IMAGE_URL, JOB_ID are passed via RunTask overrides
+        { name = "S3_BUCKET", value = var.s3_bucket_name }, # Get bucket NAME
+        # Worker mode: jobs come from the queue instead of RunTask overrides
+        { name = "JOB_QUEUE_URL", value = aws_sqs_queue.rekognition_jobs.url },
+        { name = "WORKER_CONCURRENCY", value = tostring(var.worker_concurrency) },
+        { name = "JOB_STATUS_TABLE", value = var.job_status_table_name }
       ]
       logConfiguration = {
         logDriver = "awslogs"
@@ -88,8 +133,10 @@ resource "aws_ecs_task_definition" "transcribe" {
       # Pass S3 bucket needed by the container, define others expected by override
       environment = [
         { name = "S3_BUCKET", value = var.s3_bucket_name },
-        { name = "S3_KEY",    value = "" }, # Placeholder, overridden by Lambda
-        { name = "JOB_NAME",  value = "" }  # Placeholder, overridden by Lambda
+        # Worker mode: jobs come from the queue instead of RunTask overrides
+        { name = "JOB_QUEUE_URL", value = aws_sqs_queue.transcribe_jobs.url },
+        { name = "WORKER_CONCURRENCY", value = tostring(var.worker_concurrency) },
+        { name = "JOB_STATUS_TABLE", value = var.job_status_table_name }
       ]
       logConfiguration = {
         logDriver = "awslogs"
@@ -144,6 +191,28 @@ resource "aws_ecs_service" "transcribe" {
   # }
 }
 
+# --- Rekognition Worker Service ---
+resource "aws_ecs_service" "rekognition" {
+  name            = "${var.project_name}-${var.environment}-rekognition-service"
+  cluster         = aws_ecs_cluster.main.id
+  task_definition = aws_ecs_task_definition.rekognition.arn
+  desired_count   = var.rekognition_service_desired_count
+  launch_type     = "FARGATE"
+
+  network_configuration {
+    subnets         = var.private_subnet_ids
+    security_groups = [var.ecs_tasks_security_group_id]
+    assign_public_ip = false
+  }
+
+  wait_for_steady_state = true
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
 # --- Transcribe Service Auto Scaling ---
 resource "aws_appautoscaling_target" "transcribe" {
   max_capacity       = var.transcribe_service_max_capacity
@@ -180,4 +249,169 @@ resource "aws_appautoscaling_policy" "transcribe_cpu" {
 #     target_value = var.transcribe_scaling_memory_target 
 #     ...
 #   }
-# } 
\ No newline at end of file
+# } 
+# --- Streaming Transcription Service ---
+# transcribe_stream.py from the transcribe image: the side panel streams
+# microphone audio over a WebSocket and gets partial/final transcripts back
+resource "aws_security_group" "transcribe_stream_lb" {
+  name        = "${var.project_name}-${var.environment}-transcribe-stream-lb-sg"
+  description = "Public WebSocket access to the streaming transcription service"
+  vpc_id      = var.vpc_id
+
+  ingress {
+    from_port   = 80
+    to_port     = 80
+    protocol    = "tcp"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  ingress {
+    from_port   = 443
+    to_port     = 443
+    protocol    = "tcp"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  egress {
+    from_port   = 0
+    to_port     = 0
+    protocol    = "-1"
+    cidr_blocks = ["0.0.0.0/0"]
+  }
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_security_group_rule" "transcribe_stream_from_lb" {
+  type                     = "ingress"
+  from_port                = var.transcribe_stream_port
+  to_port                  = var.transcribe_stream_port
+  protocol                 = "tcp"
+  security_group_id        = var.ecs_tasks_security_group_id
+  source_security_group_id = aws_security_group.transcribe_stream_lb.id
+}
+
+resource "aws_lb" "transcribe_stream" {
+  name               = "${var.project_name}-${var.environment}-ws" # ALB names are limited to 32 characters
+  load_balancer_type = "application"
+  subnets            = var.public_subnet_ids
+  security_groups    = [aws_security_group.transcribe_stream_lb.id]
+  idle_timeout       = 300 # Keep quiet WebSockets open between utterances
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_lb_target_group" "transcribe_stream" {
+  name        = "${var.project_name}-${var.environment}-ws-tg"
+  port        = var.transcribe_stream_port
+  protocol    = "HTTP"
+  target_type = "ip"
+  vpc_id      = var.vpc_id
+
+  health_check {
+    path    = "/health"
+    matcher = "200"
+  }
+
+  deregistration_delay = 60 # Let in-flight streams finish on scale-in
+}
+
+resource "aws_lb_listener" "transcribe_stream_http" {
+  load_balancer_arn = aws_lb.transcribe_stream.arn
+  port              = 80
+  protocol          = "HTTP"
+
+  default_action {
+    type             = "forward"
+    target_group_arn = aws_lb_target_group.transcribe_stream.arn
+  }
+}
+
+resource "aws_lb_listener" "transcribe_stream_https" {
+  count             = var.transcribe_stream_certificate_arn != "" ? 1 : 0
+  load_balancer_arn = aws_lb.transcribe_stream.arn
+  port              = 443
+  protocol          = "HTTPS"
+  certificate_arn   = var.transcribe_stream_certificate_arn
+
+  default_action {
+    type             = "forward"
+    target_group_arn = aws_lb_target_group.transcribe_stream.arn
+  }
+}
+
+resource "aws_ecs_task_definition" "transcribe_stream" {
+  family                   = "${var.project_name}-${var.environment}-transcribe-stream"
+  requires_compatibilities = ["FARGATE"]
+  network_mode             = "awsvpc"
+  cpu                      = var.transcribe_task_cpu
+  memory                   = var.transcribe_task_memory
+  execution_role_arn       = aws_iam_role.ecs_task_execution_role.arn
+  task_role_arn            = aws_iam_role.transcribe_task_role.arn
+
+  container_definitions = jsonencode([
+    {
+      name      = "transcribe-stream-container"
+      image     = var.transcribe_image_uri
+      essential = true
+      command   = ["python", "transcribe_stream.py"]
+      environment = [
+        { name = "S3_BUCKET", value = var.s3_bucket_name },
+        { name = "STREAM_PORT", value = tostring(var.transcribe_stream_port) },
+        { name = "STREAM_RECOGNIZER", value = "amazon" },
+        { name = "COGNITO_USER_POOL_ID", value = var.cognito_user_pool_id },
+        { name = "COGNITO_CLIENT_ID", value = var.cognito_client_id },
+        { name = "JOB_STATUS_TABLE", value = var.job_status_table_name }
+      ]
+      portMappings = [
+        { containerPort = var.transcribe_stream_port, protocol = "tcp" }
+      ]
+      logConfiguration = {
+        logDriver = "awslogs"
+        options = {
+          "awslogs-group"         = aws_cloudwatch_log_group.transcribe_logs.name
+          "awslogs-region"        = var.aws_region
+          "awslogs-stream-prefix" = "stream"
+        }
+      }
+    }
+  ])
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_ecs_service" "transcribe_stream" {
+  name            = "${var.project_name}-${var.environment}-transcribe-stream-service"
+  cluster         = aws_ecs_cluster.main.id
+  task_definition = aws_ecs_task_definition.transcribe_stream.arn
+  desired_count   = var.transcribe_stream_desired_count
+  launch_type     = "FARGATE"
+
+  network_configuration {
+    subnets          = var.private_subnet_ids
+    security_groups  = [var.ecs_tasks_security_group_id]
+    assign_public_ip = false
+  }
+
+  load_balancer {
+    target_group_arn = aws_lb_target_group.transcribe_stream.arn
+    container_name   = "transcribe-stream-container"
+    container_port   = var.transcribe_stream_port
+  }
+
+  depends_on = [aws_lb_listener.transcribe_stream_http]
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
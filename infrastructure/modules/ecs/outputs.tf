@@ -36,4 +36,29 @@ output "rekognition_task_role_arn" {
 output "transcribe_task_role_arn" {
   description = "The ARN of the Transcribe Task Role"
   value       = aws_iam_role.transcribe_task_role.arn
-} 
\ No newline at end of file
+} 
+
+output "transcribe_job_queue_url" {
+  description = "URL of the queue feeding the Transcribe worker service"
+  value       = aws_sqs_queue.transcribe_jobs.url
+}
+
+output "transcribe_job_queue_arn" {
+  description = "ARN of the queue feeding the Transcribe worker service"
+  value       = aws_sqs_queue.transcribe_jobs.arn
+}
+
+output "rekognition_job_queue_url" {
+  description = "URL of the queue feeding the Rekognition worker service"
+  value       = aws_sqs_queue.rekognition_jobs.url
+}
+
+output "rekognition_job_queue_arn" {
+  description = "ARN of the queue feeding the Rekognition worker service"
+  value       = aws_sqs_queue.rekognition_jobs.arn
+}
+
+output "transcribe_stream_endpoint" {
+  description = "WebSocket URL of the streaming transcription service"
+  value       = var.transcribe_stream_certificate_arn != "" ? "wss://${aws_lb.transcribe_stream.dns_name}" : "ws://${aws_lb.transcribe_stream.dns_name}"
+}
@@ -79,6 +79,18 @@ variable "cloudwatch_log_retention_days" {
   default     = 7
 }
 
+variable "worker_concurrency" {
+  description = "Jobs each Rekognition/Transcribe worker task processes at once"
+  type        = number
+  default     = 4
+}
+
+variable "rekognition_service_desired_count" {
+  description = "Number of Rekognition worker tasks"
+  type        = number
+  default     = 1
+}
+
 variable "transcribe_service_desired_count" {
   description = "Initial desired number of tasks for the Transcribe service"
   type        = number
@@ -109,4 +121,47 @@ variable "transcribe_scaling_cpu_target" {
 variable "s3_bucket_name" {
   description = "Name of the S3 bucket used for inputs/outputs"
   type        = string
-} 
\ No newline at end of file
+}
+
+variable "job_status_table_arn" {
+  description = "ARN of the job status table the workers update"
+  type        = string
+}
+
+variable "job_status_table_name" {
+  description = "Name of the job status table the workers update"
+  type        = string
+}
+
+variable "public_subnet_ids" {
+  description = "List of public subnet IDs for the streaming transcription load balancer"
+  type        = list(string)
+}
+
+variable "cognito_user_pool_id" {
+  description = "Cognito User Pool ID used to verify streaming transcription clients"
+  type        = string
+}
+
+variable "cognito_client_id" {
+  description = "Cognito App Client ID used to verify streaming transcription clients"
+  type        = string
+}
+
+variable "transcribe_stream_port" {
+  description = "Container port of the streaming transcription server"
+  type        = number
+  default     = 8080
+}
+
+variable "transcribe_stream_desired_count" {
+  description = "Number of streaming transcription tasks"
+  type        = number
+  default     = 1
+}
+
+variable "transcribe_stream_certificate_arn" {
+  description = "ACM certificate for a wss:// listener on the streaming load balancer (optional)"
+  type        = string
+  default     = ""
+}
@@ -49,11 +49,124 @@ resource "aws_lambda_function" "summarize_lambda" {
       KENDRA_INDEX_ID  = var.kendra_index_id
       USER_TABLE_NAME  = var.dynamodb_table_name
       COGNITO_CLIENT_ID = var.cognito_client_id
+      COGNITO_USER_POOL_ID = var.cognito_user_pool_id
       S3_BUCKET_NAME    = var.s3_bucket_name
+      INGESTION_QUEUE_URL = aws_sqs_queue.kendra_ingestion.url
+      METADATA_TABLE_NAME = var.metadata_table_name
+      HISTORY_TABLE_NAME  = var.history_table_name
     }
   }
 }
 
+# --- Background Kendra Ingestion ---
+# summarize enqueues (url_hash, chunks) jobs, the worker batches them into Kendra
+resource "aws_sqs_queue" "kendra_ingestion_dlq" {
+  name                      = "${var.project_name}-${var.environment}-kendra-ingestion-dlq"
+  message_retention_seconds = 1209600 # 14 days
+}
+
+resource "aws_sqs_queue" "kendra_ingestion" {
+  name                       = "${var.project_name}-${var.environment}-kendra-ingestion"
+  visibility_timeout_seconds = 360 # Must exceed the worker timeout
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.kendra_ingestion_dlq.arn
+    maxReceiveCount     = 5
+  })
+
+  tags = {
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_function" "ingestion_worker" {
+  function_name    = "${var.project_name}-${var.environment}-ingestion-worker"
+  handler          = "ingestion_worker.lambda_handler"
+  runtime          = "python3.9"
+  role             = aws_iam_role.lambda_role.arn
+  filename         = var.ingestion_worker_lambda_zip_path
+  source_code_hash = filebase64sha256(var.ingestion_worker_lambda_zip_path)
+  timeout          = 300
+  memory_size      = 256
+
+  environment {
+    variables = {
+      KENDRA_INDEX_ID     = var.kendra_index_id
+      S3_BUCKET_NAME      = var.s3_bucket_name
+      METADATA_TABLE_NAME = var.metadata_table_name
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-ingestion-worker-lambda"
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "kendra_ingestion" {
+  event_source_arn                   = aws_sqs_queue.kendra_ingestion.arn
+  function_name                      = aws_lambda_function.ingestion_worker.arn
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 2
+  function_response_types            = ["ReportBatchItemFailures"]
+}
+
+# --- Transcribe Completion ---
+# The transcribe task only submits jobs; this handler writes the result when
+# Transcribe reports the job finished
+resource "aws_lambda_function" "transcribe_complete" {
+  function_name    = "${var.project_name}-${var.environment}-transcribe-complete"
+  handler          = "transcribe_complete.lambda_handler"
+  runtime          = "python3.9"
+  role             = aws_iam_role.lambda_role.arn
+  filename         = var.transcribe_complete_lambda_zip_path
+  source_code_hash = filebase64sha256(var.transcribe_complete_lambda_zip_path)
+  timeout          = 30
+  memory_size      = 128
+
+  environment {
+    variables = {
+      S3_BUCKET        = var.s3_bucket_name
+      JOB_STATUS_TABLE = var.job_status_table_name
+    }
+  }
+
+  tags = {
+    Name        = "${var.project_name}-transcribe-complete-lambda"
+    Project     = var.project_name
+    Environment = var.environment
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "transcribe_job_state" {
+  name        = "${var.project_name}-${var.environment}-transcribe-job-state"
+  description = "Finished Transcribe jobs started by the transcribe task"
+
+  event_pattern = jsonencode({
+    source      = ["aws.transcribe"]
+    detail-type = ["Transcribe Job State Change"]
+    detail = {
+      TranscriptionJobStatus = ["COMPLETED", "FAILED"]
+      TranscriptionJobName   = [{ prefix = "transcribe-" }]
+    }
+  })
+}
+
+resource "aws_cloudwatch_event_target" "transcribe_job_state" {
+  rule = aws_cloudwatch_event_rule.transcribe_job_state.name
+  arn  = aws_lambda_function.transcribe_complete.arn
+}
+
+resource "aws_lambda_permission" "transcribe_job_state" {
+  statement_id  = "AllowEventBridgeInvokeTranscribeComplete"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.transcribe_complete.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.transcribe_job_state.arn
+}
+
 # Lambda function for authentication
 resource "aws_lambda_function" "auth_lambda" {
   filename         = var.auth_lambda_zip_path
@@ -96,34 +209,28 @@ resource "aws_iam_role_policy_attachment" "invoke_lambda_basic" {
   policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
 }
 
-# Policy document for Invoker Lambdas (ECS RunTask, PassRole, S3 Put Temp)
+# Policy document for Invoker Lambdas (enqueue worker jobs, S3 Put Temp)
 data "aws_iam_policy_document" "invoke_lambda_policy_doc" {
-  statement { # S3 Permissions for Temp Audio Upload (Transcribe Invoker)
+  statement { # S3 Permissions for Temp Audio Upload (Transcribe Invoker, also signs the presigned uploads)
       sid = "S3PutTempAudio"
-      actions = ["s3:PutObject"]
+      actions = ["s3:PutObject", "s3:DeleteObject", "s3:AbortMultipartUpload"]
       # Allow putting into the specific temp prefix
       resources = ["${var.s3_bucket_arn}/temp-audio/*"]
       effect = "Allow"
   }
-  statement { # ECS RunTask Permissions
-    sid    = "ECSRunTaskPermissions"
-    effect = "Allow"
-    actions = ["ecs:RunTask"]
-    # Allow running both task definitions
-    resources = [
-      var.rekognition_task_def_arn,
-      var.transcribe_task_def_arn
-    ]
+  statement { # PENDING job states
+    sid       = "DynamoDBJobStatus"
+    effect    = "Allow"
+    actions   = ["dynamodb:UpdateItem"]
+    resources = [var.job_status_table_arn]
   }
-  statement { # ECS PassRole Permissions
-    sid    = "ECSPassRolePermissions"
+  statement { # Jobs for the Rekognition/Transcribe worker services
+    sid    = "SQSSendMediaJobs"
     effect = "Allow"
-    actions = ["iam:PassRole"]
-    # Allow passing the specific task roles and execution role
+    actions = ["sqs:SendMessage"]
     resources = [
-      var.ecs_rekognition_task_role_arn,
-      var.ecs_transcribe_task_role_arn,
-      var.ecs_task_execution_role_arn 
+      var.rekognition_job_queue_arn,
+      var.transcribe_job_queue_arn
     ]
   }
 }
@@ -156,11 +263,9 @@ resource "aws_lambda_function" "invoke_rekognition" {
 
   environment {
     variables = {
-      ECS_CLUSTER_ARN            = var.ecs_cluster_arn
-      REKOGNITION_TASK_DEF_ARN = var.rekognition_task_def_arn
-      PRIVATE_SUBNET_IDS       = join(",", var.private_subnet_ids) # Pass as comma-separated string
-      TASK_SECURITY_GROUP_ID   = var.task_security_group_id
-      # Add any other env vars needed by the invoker
+      JOB_QUEUE_URL    = var.rekognition_job_queue_url
+      S3_BUCKET        = var.s3_bucket_name
+      JOB_STATUS_TABLE = var.job_status_table_name
     }
   }
 
@@ -183,11 +288,9 @@ resource "aws_lambda_function" "invoke_transcribe" {
 
   environment {
     variables = {
-      ECS_CLUSTER_ARN           = var.ecs_cluster_arn
-      TRANSCRIBE_TASK_DEF_ARN = var.transcribe_task_def_arn
-      PRIVATE_SUBNET_IDS      = join(",", var.private_subnet_ids)
-      TASK_SECURITY_GROUP_ID  = var.task_security_group_id
-      # Add any other env vars needed by the invoker
+      JOB_QUEUE_URL     = var.transcribe_job_queue_url
+      TEMP_AUDIO_BUCKET = var.s3_bucket_name
+      JOB_STATUS_TABLE  = var.job_status_table_name
     }
   }
 
@@ -198,6 +301,28 @@ resource "aws_lambda_function" "invoke_transcribe" {
   }
 }
 
+# Recordings uploaded straight to S3 by the extension queue their Transcribe job
+resource "aws_lambda_permission" "temp_audio_upload" {
+  statement_id  = "AllowS3InvokeTranscribe"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.invoke_transcribe.function_name
+  principal     = "s3.amazonaws.com"
+  source_arn    = var.s3_bucket_arn
+}
+
+resource "aws_s3_bucket_notification" "temp_audio_upload" {
+  bucket = var.s3_bucket_name
+
+  lambda_function {
+    lambda_function_arn = aws_lambda_function.invoke_transcribe.arn
+    events              = ["s3:ObjectCreated:*"]
+    filter_prefix       = "temp-audio/"
+    filter_suffix       = ".webm"
+  }
+
+  depends_on = [aws_lambda_permission.temp_audio_upload]
+}
+
 # --- Get Result Lambda ---
 resource "aws_lambda_function" "get_result" {
   function_name    = "${var.project_name}-${var.environment}-get-result" # Added environment
@@ -206,13 +331,15 @@ resource "aws_lambda_function" "get_result" {
   role             = aws_iam_role.lambda_role.arn # Use the ORIGINAL role
   filename         = var.get_result_lambda_zip_path
   source_code_hash = filebase64sha256(var.get_result_lambda_zip_path)
-  timeout          = 15 
+  timeout          = 30 # Long-polls wait up to MAX_WAIT_SECONDS
 
   environment {
     variables = {
       S3_BUCKET          = var.s3_bucket_name 
       REKOGNITION_PREFIX = "rekognition-results" # Standardized prefix
       TRANSCRIBE_PREFIX  = "transcribe-results"  # Standardized prefix
+      JOB_STATUS_TABLE   = var.job_status_table_name
+      MAX_WAIT_SECONDS   = "20"
     }
   }
 
@@ -239,7 +366,17 @@ data "aws_iam_policy_document" "lambda_combined_policy_doc" {
       "dynamodb:UpdateItem",
       "dynamodb:DeleteItem"
     ]
-    resources = [var.dynamodb_table_arn]
+    resources = [var.dynamodb_table_arn, var.metadata_table_arn, var.history_table_arn]
+  }
+  statement { # Job states (get_result reads, transcribe_complete writes)
+    sid    = "DynamoDBJobStatus"
+    effect = "Allow"
+    actions = [
+      "dynamodb:GetItem",
+      "dynamodb:BatchGetItem",
+      "dynamodb:UpdateItem"
+    ]
+    resources = [var.job_status_table_arn]
   }
   statement { # Cognito Permissions
     sid    = "CognitoPermissions"
@@ -264,6 +401,30 @@ data "aws_iam_policy_document" "lambda_combined_policy_doc" {
       "${var.s3_bucket_arn}/*" # General access
     ]
   }
+  statement { # SQS Permissions for the Kendra ingestion queue
+    sid    = "SQSKendraIngestion"
+    effect = "Allow"
+    actions = [
+      "sqs:SendMessage",
+      "sqs:ReceiveMessage",
+      "sqs:DeleteMessage",
+      "sqs:ChangeMessageVisibility",
+      "sqs:GetQueueAttributes"
+    ]
+    resources = [aws_sqs_queue.kendra_ingestion.arn]
+  }
+  statement { # S3 DeleteObject for summary cache invalidation
+    sid    = "S3SummaryCacheInvalidation"
+    effect = "Allow"
+    actions = ["s3:DeleteObject"]
+    resources = ["${var.s3_bucket_arn}/shared/summaries/*"]
+  }
+  statement { # Failure reasons for finished Transcribe jobs (transcribe_complete)
+    sid       = "TranscribeGetJob"
+    effect    = "Allow"
+    actions   = ["transcribe:GetTranscriptionJob"]
+    resources = ["*"]
+  }
   statement { # Add S3 GetObject for result paths (Keep for get_result lambda)
     sid    = "S3GetResults"
     effect = "Allow"
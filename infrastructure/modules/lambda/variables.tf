@@ -39,6 +39,11 @@ variable "cognito_client_id" {
   type        = string
 }
 
+variable "cognito_user_pool_id" {
+  description = "ID of the Cognito user pool, used to verify JWTs locally"
+  type        = string
+}
+
 variable "s3_bucket_name" {
   description = "Name of the S3 bucket for webpage content storage"
   type        = string
@@ -112,4 +117,63 @@ variable "environment" {
 variable "get_result_lambda_zip_path" {
   description = "Path to the get_result Lambda deployment package"
   type        = string
-}
\ No newline at end of file
+}
+variable "ingestion_worker_lambda_zip_path" {
+  description = "Path to the Kendra ingestion worker Lambda deployment package"
+  type        = string
+}
+
+variable "transcribe_complete_lambda_zip_path" {
+  description = "Path to the Transcribe completion handler Lambda deployment package"
+  type        = string
+}
+
+variable "metadata_table_arn" {
+  description = "ARN of the document metadata DynamoDB table"
+  type        = string
+}
+
+variable "metadata_table_name" {
+  description = "Name of the document metadata DynamoDB table"
+  type        = string
+}
+
+variable "history_table_arn" {
+  description = "ARN of the per-user history DynamoDB table"
+  type        = string
+}
+
+variable "history_table_name" {
+  description = "Name of the per-user history DynamoDB table"
+  type        = string
+}
+
+variable "job_status_table_arn" {
+  description = "ARN of the Rekognition/Transcribe job status table"
+  type        = string
+}
+
+variable "job_status_table_name" {
+  description = "Name of the Rekognition/Transcribe job status table"
+  type        = string
+}
+
+variable "rekognition_job_queue_url" {
+  description = "URL of the queue the Rekognition invoker sends jobs to"
+  type        = string
+}
+
+variable "rekognition_job_queue_arn" {
+  description = "ARN of the queue the Rekognition invoker sends jobs to"
+  type        = string
+}
+
+variable "transcribe_job_queue_url" {
+  description = "URL of the queue the Transcribe invoker sends jobs to"
+  type        = string
+}
+
+variable "transcribe_job_queue_arn" {
+  description = "ARN of the queue the Transcribe invoker sends jobs to"
+  type        = string
+}
@@ -25,6 +25,37 @@ resource "aws_s3_bucket_versioning" "webpage_content_versioning" {
   }
 }
 
+# The side panel uploads recordings to temp-audio/ with presigned POSTs and
+# multipart part PUTs; it reads each part's ETag to complete the upload
+resource "aws_s3_bucket_cors_configuration" "webpage_content_cors" {
+  bucket = aws_s3_bucket.webpage_content.id
+
+  cors_rule {
+    allowed_methods = ["POST", "PUT"]
+    allowed_origins = ["*"]
+    allowed_headers = ["*"]
+    expose_headers  = ["ETag"]
+    max_age_seconds = 3000
+  }
+}
+
+resource "aws_s3_bucket_lifecycle_configuration" "webpage_content_lifecycle" {
+  bucket = aws_s3_bucket.webpage_content.id
+
+  rule {
+    id     = "abandoned-audio-uploads"
+    status = "Enabled"
+
+    filter {
+      prefix = "temp-audio/"
+    }
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
+
 resource "aws_s3_bucket_policy" "kendra_access" {
   bucket = aws_s3_bucket.webpage_content.id
   
@@ -3,6 +3,11 @@ output "api_endpoint" {
   description = "API Gateway endpoint URL"
 }
 
+output "transcribe_stream_endpoint" {
+  value       = module.ecs.transcribe_stream_endpoint
+  description = "WebSocket URL for real-time transcription"
+}
+
 output "cognito_user_pool_client_id" {
   value       = module.cognito.cognito_client_id
   description = "Cognito User Pool Client ID"